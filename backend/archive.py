@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Archival of closed bookings.
+
+Bookings that are closed (final outcome, or soft deleted) and have not changed
+for ARCHIVE_AFTER_DAYS are moved to the *_archive tables together with their
+comments and audit rows. The hot tables, which every list, stats and
+duplicate check reads, then only hold open and recently closed bookings.
+Archived bookings stay readable through the detail, comment, audit-log and
+export endpoints.
+
+Each batch of ARCHIVE_BATCH_SIZE bookings is copied and deleted in one short
+transaction. The enhanced API runs a batch loop every
+ARCHIVE_INTERVAL_SECONDS (0 disables it); it can also be run from cron:
+
+    python archive.py              # archive everything eligible now
+    python archive.py --dry-run    # only count eligible bookings
+"""
+
+import argparse
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import timedelta
+
+from sqlalchemy import DateTime, bindparam, exists, func, or_, select
+
+from database import engine, env_int
+from enhanced_models import (
+    Booking,
+    BookingComment,
+    AuditLog,
+    ArchivedBooking,
+    ArchivedBookingComment,
+    ArchivedAuditLog,
+    ICUBed,
+    now_riyadh,
+)
+from hot_queries import FINAL_OR_OUTCOMES
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = env_int("ARCHIVE_AFTER_DAYS", 180)
+ARCHIVE_BATCH_SIZE = env_int("ARCHIVE_BATCH_SIZE", 500)
+ARCHIVE_INTERVAL_SECONDS = env_int("ARCHIVE_INTERVAL_SECONDS", 3600)
+
+# OR bookings close with a final outcome, ICU requests with any outcome
+# ("Admitted", "Back to Ward", ...); soft-deleted bookings are closed as well.
+# The OR outcome endpoint does not touch last_updated_at, so both timestamps
+# must be older than the cutoff. Requests still holding an ICU bed stay.
+ARCHIVABLE_BOOKING_IDS = (
+    select(Booking.id)
+    .where(
+        or_(
+            Booking.is_active == False,
+            (Booking.type_of_booking == "OR") & Booking.outcome.in_(FINAL_OR_OUTCOMES),
+            (Booking.type_of_booking == "ICU") & Booking.outcome.isnot(None),
+        ),
+        func.coalesce(Booking.last_updated_at, Booking.created_at) < bindparam("cutoff"),
+        func.coalesce(Booking.outcome_changed_at, Booking.created_at) < bindparam("cutoff"),
+        ~exists().where(ICUBed.booking_id == Booking.id),
+    )
+    .order_by(Booking.id)
+)
+
+
+
+def _holds_max_id(model, booking_key):
+    newest = select(func.max(model.id)).scalar_subquery()
+    return exists().where(booking_key == Booking.id, model.id == newest)
+
+
+# SQLite tables without AUTOINCREMENT hand out max(id) + 1, so archiving the
+# newest row of a table would let a new row reuse an archived id. On SQLite
+# the rows holding each table's highest id stay in place until newer ones exist.
+SQLITE_ARCHIVABLE_BOOKING_IDS = ARCHIVABLE_BOOKING_IDS.where(
+    Booking.id < select(func.max(Booking.id)).scalar_subquery(),
+    ~_holds_max_id(BookingComment, BookingComment.booking_id),
+    ~_holds_max_id(AuditLog, AuditLog.booking_id),
+)
+
+
+def _move_statements(hot, archive, key):
+    """INSERT ... SELECT into the archive table, then DELETE from the hot one."""
+    matches = hot.c[key].in_(bindparam("ids", expanding=True))
+    columns = [column.name for column in hot.columns]
+    rows = select(*hot.columns, bindparam("archived_at", type_=DateTime)).where(matches)
+    return (
+        archive.insert().from_select(columns + ["archived_at"], rows),
+        hot.delete().where(matches),
+    )
+
+
+# Children first so the foreign keys to bookings hold until the booking goes
+MOVE_STATEMENTS = [
+    _move_statements(BookingComment.__table__, ArchivedBookingComment.__table__, "booking_id"),
+    _move_statements(AuditLog.__table__, ArchivedAuditLog.__table__, "booking_id"),
+    _move_statements(Booking.__table__, ArchivedBooking.__table__, "id"),
+]
+
+
+def _archivable(target_engine):
+    if target_engine.dialect.name == "sqlite":
+        return SQLITE_ARCHIVABLE_BOOKING_IDS
+    return ARCHIVABLE_BOOKING_IDS
+
+
+def archive_batch(target_engine, cutoff, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move one batch of closed bookings; returns how many were archived."""
+    stmt = _archivable(target_engine).limit(batch_size)
+    if target_engine.dialect.name == "postgresql":
+        # Concurrent archivers (one per worker) take disjoint batches
+        stmt = stmt.with_for_update(skip_locked=True)
+
+    with target_engine.begin() as connection:
+        ids = connection.execute(stmt, {"cutoff": cutoff}).scalars().all()
+        if ids:
+            params = {"ids": ids, "archived_at": now_riyadh()}
+            for copy, delete in MOVE_STATEMENTS:
+                connection.execute(copy, params)
+                connection.execute(delete, {"ids": ids})
+    return len(ids)
+
+
+def archive_closed_bookings(
+    target_engine=engine,
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> int:
+    """Archive every eligible booking in batches; returns the total moved."""
+    cutoff = now_riyadh() - timedelta(days=older_than_days)
+    total = 0
+    while True:
+        moved = archive_batch(target_engine, cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+    if total:
+        logger.info("Archived %d closed booking(s)", total)
+    return total
+
+
+def count_archivable(target_engine=engine, older_than_days: int = ARCHIVE_AFTER_DAYS) -> int:
+    cutoff = now_riyadh() - timedelta(days=older_than_days)
+    with target_engine.connect() as connection:
+        return connection.execute(
+            select(func.count()).select_from(_archivable(target_engine).subquery()),
+            {"cutoff": cutoff},
+        ).scalar()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Archive closed bookings")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=ARCHIVE_AFTER_DAYS,
+        help=f"archive bookings closed for at least this many days (default: {ARCHIVE_AFTER_DAYS})",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=ARCHIVE_BATCH_SIZE,
+        help=f"bookings moved per transaction (default: {ARCHIVE_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only count the bookings that would be archived",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.dry_run:
+        print(f"{count_archivable(engine, args.days)} booking(s) eligible for archiving")
+        return 0
+
+    total = archive_closed_bookings(engine, args.days, args.batch_size)
+    print(f"✓ Archived {total} booking(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
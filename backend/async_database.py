@@ -0,0 +1,122 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database import (
+    DATABASE_URL,
+    DATABASE_READ_URL,
+    configure_engine,
+    engine_options,
+    use_sqlite_profile,
+)
+from db_metrics import PoolMetrics, StatementCacheMetrics
+
+# =============================================================================
+# ASYNC DATABASE ENGINE (used by async_main.py)
+# =============================================================================
+# The same DATABASE_URL and DB_POOL_* settings apply. The driver is swapped for
+# its asyncio counterpart:
+#   postgresql://...  ->  postgresql+asyncpg://...
+#   sqlite:///...     ->  sqlite+aiosqlite:///...
+# Other backends must name an async driver explicitly in DATABASE_URL.
+#
+# SQLite has a single writer: database.py's writer pool (one connection with
+# the SQLite profile). A second, aiosqlite, writer engine would contend with
+# it for the write lock, so on SQLite there is no async writer
+# (ASYNC_WRITES is false): async_main serves reads through aiosqlite and
+# leaves the write endpoints on the sync writer.
+# =============================================================================
+
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+ASYNC_WRITES = make_url(DATABASE_URL).get_backend_name() != "sqlite"
+
+
+def to_async_url(url: str) -> str:
+    """Rewrite a sync database URL to use the matching asyncio driver."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None or parsed.get_driver_name() == driver:
+        return parsed.render_as_string(hide_password=False)
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(
+        hide_password=False
+    )
+
+
+def _create_engine(url: str, writer: bool):
+    async_url = to_async_url(url)
+    target_engine = configure_engine(
+        create_async_engine(async_url, **engine_options(async_url, writer=writer)),
+        async_url,
+        writer=writer,
+    )
+    metrics = PoolMetrics()
+    metrics.attach(target_engine.sync_engine)
+    cache_metrics = StatementCacheMetrics()
+    cache_metrics.attach(target_engine.sync_engine)
+    return target_engine, metrics, cache_metrics
+
+
+if ASYNC_WRITES:
+    async_engine, async_pool_metrics, async_statement_cache_metrics = _create_engine(
+        DATABASE_URL, writer=True
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+else:
+    async_engine = async_pool_metrics = async_statement_cache_metrics = None
+    AsyncSessionLocal = None
+
+# Same split as database.py: replica, SQLite reader pool, or the primary
+if not ASYNC_WRITES or DATABASE_READ_URL or use_sqlite_profile(DATABASE_URL):
+    (
+        async_read_engine,
+        async_read_pool_metrics,
+        async_read_statement_cache_metrics,
+    ) = _create_engine(DATABASE_READ_URL or DATABASE_URL, writer=False)
+else:
+    async_read_engine = async_engine
+    async_read_pool_metrics = async_pool_metrics
+    async_read_statement_cache_metrics = async_statement_cache_metrics
+
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, autoflush=False, expire_on_commit=False
+)
+
+
+def async_engines() -> dict:
+    """name -> (engine, PoolMetrics, StatementCacheMetrics) of the async pools."""
+    engines = {}
+    if async_engine is not None:
+        engines["async"] = (async_engine, async_pool_metrics, async_statement_cache_metrics)
+    if async_read_engine is not async_engine:
+        name = "async_replica" if DATABASE_READ_URL else "async_readers"
+        engines[name] = (
+            async_read_engine,
+            async_read_pool_metrics,
+            async_read_statement_cache_metrics,
+        )
+    return engines
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except PoolTimeoutError:
+            async_pool_metrics.record_timeout()
+            raise
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        try:
+            yield db
+        except PoolTimeoutError:
+            async_read_pool_metrics.record_timeout()
+            raise
@@ -0,0 +1,857 @@
+"""
+Async variant of the enhanced API.
+
+Serves the same app as enhanced_main, with the booking, comment, status,
+outcome, ICU confirm/reschedule/discharge, audit log, export and stats
+endpoints replaced by ``async def`` implementations on the SQLAlchemy asyncio
+engine. Those requests no longer hold a threadpool thread while waiting on
+the database, so concurrency is bounded by the DB pool and a slow export
+streams without blocking fast reads.
+
+On SQLite only the read endpoints are swapped: writes stay on database.py's
+single writer connection (see async_database.ASYNC_WRITES), so the async
+reader pool never competes with it for the write lock.
+
+Still served by the sync app: MRN checks, search, typeahead and the OR queue
+(answered from in-process indexes), the ICU bed inventory, allocation and
+forecast, SLA breaches, sessions and the admin endpoints. They are either
+CPU-bound or low-volume and gain nothing from the asyncio engine.
+
+Select it at startup instead of enhanced_main:
+
+    DB_ASYNC=true ./start.sh
+    uvicorn async_main:app --host 0.0.0.0 --port 8000
+"""
+
+import csv
+import io
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute, APIRouter
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from async_database import (
+    ASYNC_WRITES,
+    AsyncReadSessionLocal,
+    async_engines,
+    get_async_db,
+    get_async_read_db,
+)
+from enhanced_main import (
+    app,
+    Booking,
+    BookingComment,
+    ArchivedBooking,
+    ArchivedBookingComment,
+    BookingCreate,
+    BookingUpdate,
+    BookingResponse,
+    CommentCreate,
+    CommentResponse,
+    LegacyStatusUpdate,
+    ICURescheduleUpdate,
+    ICUConfirmUpdate,
+    LegacyORBookingCreate,
+    LegacyORBookingResponse,
+    LegacyICUBookingCreate,
+    LegacyICUBookingResponse,
+    LegacyCommentCreate,
+    LegacyCommentResponse,
+    OR_EXPORT_HEADER,
+    ICU_EXPORT_HEADER,
+    ICU_RELEASE_OUTCOMES,
+    BedTakenError,
+    UnknownBedError,
+    now_riyadh,
+    log_booking_change,
+    duplicate_error,
+    occupy_bed,
+    release_beds,
+    add_health_target,
+    _parse_legacy_booking_id,
+    _booking_to_legacy_or,
+    _booking_to_legacy_icu,
+    _comment_to_legacy,
+    _export_month_bounds,
+    _or_export_row,
+    _icu_export_row,
+)
+from http_metrics import http_metrics
+from query_stats import SQL_STATS_ENABLED, instrument_engine
+from slow_queries import SLOW_QUERY_LOG, slow_query_log
+from hot_queries import (
+    ACTIVE_BY_MRN,
+    ACTIVE_BY_TYPE,
+    EXPORT_BY_TYPE_AND_RANGE,
+    STATS_SUMMARY,
+    audit_statement,
+    booking_statement,
+    comments_statement,
+    stats_summary,
+)
+
+EXPORT_BATCH_SIZE = 500
+
+# Reads are always async; writes only where the database has an async writer
+router = APIRouter()
+write_router = APIRouter()
+
+
+# Query helpers (async counterparts of the enhanced_main helpers)
+async def _get_booking_or_404(
+    db: AsyncSession,
+    booking_id: int,
+    expected_type: Optional[str] = None,
+    include_archived: bool = False,
+) -> Booking:
+    stmt, params = booking_statement(booking_id, expected_type)
+    booking = (await db.execute(stmt, params)).scalars().first()
+    if booking is None and include_archived:
+        stmt, params = booking_statement(booking_id, expected_type, archived=True)
+        booking = (await db.execute(stmt, params)).scalars().first()
+    if booking is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return booking
+
+
+async def has_active_booking(db: AsyncSession, mrn: str, booking_type: str):
+    """Async version of enhanced_main.has_active_booking"""
+    if not mrn:
+        return None
+
+    stmt = ACTIVE_BY_MRN.get(booking_type)
+    if stmt is None:
+        return None
+    return (await db.execute(stmt, {"mrn": mrn})).scalars().first()
+
+
+# Booking endpoints
+@write_router.post("/bookings/", response_model=BookingResponse)
+async def create_booking(
+    booking: BookingCreate, db: AsyncSession = Depends(get_async_db)
+):
+    if booking.mrn and booking.type_of_booking:
+        existing = await has_active_booking(db, booking.mrn, booking.type_of_booking)
+        if existing:
+            raise duplicate_error(
+                f"An active {booking.type_of_booking} booking already exists for this MRN.",
+                existing,
+            )
+
+    db_booking = Booking(**booking.dict())
+    db.add(db_booking)
+    await db.commit()
+    await db.refresh(db_booking)
+
+    log_booking_change(
+        db,
+        db_booking.id,
+        "created",
+        changed_by_name=booking.created_by_name,
+        changed_by_role=booking.created_by_role,
+        notes=f"New {booking.type_of_booking} booking created",
+    )
+    await db.commit()
+
+    return db_booking
+
+
+@router.get("/bookings/", response_model=List[BookingResponse])
+async def get_bookings(
+    skip: int = 0,
+    limit: int = 100,
+    type_filter: Optional[str] = None,
+    status_filter: Optional[str] = None,
+    active_only: bool = True,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    stmt = select(Booking)
+    if active_only:
+        stmt = stmt.where(Booking.is_active == True)
+    if type_filter:
+        stmt = stmt.where(Booking.type_of_booking == type_filter)
+    if status_filter:
+        stmt = stmt.where(Booking.status == status_filter)
+
+    stmt = stmt.order_by(Booking.created_at.desc()).offset(skip).limit(limit)
+    return (await db.execute(stmt)).scalars().all()
+
+
+@router.get("/bookings/{booking_id}", response_model=BookingResponse)
+async def get_booking(booking_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    return await _get_booking_or_404(db, booking_id, include_archived=True)
+
+
+@write_router.put("/bookings/{booking_id}", response_model=BookingResponse)
+async def update_booking(
+    booking_id: int,
+    booking_update: BookingUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    booking = await _get_booking_or_404(db, booking_id)
+
+    changes = []
+    update_data = booking_update.dict(exclude_unset=True)
+
+    for field, new_value in update_data.items():
+        if field in ["updated_by_name", "updated_by_role", "updated_by_uid"]:
+            continue
+
+        old_value = getattr(booking, field, None)
+        if old_value != new_value:
+            changes.append(
+                {
+                    "field": field,
+                    "old_value": str(old_value) if old_value is not None else None,
+                    "new_value": str(new_value) if new_value is not None else None,
+                }
+            )
+
+    for field, value in update_data.items():
+        setattr(booking, field, value)
+
+    booking.last_updated_at = now_riyadh()
+    await db.commit()
+    await db.refresh(booking)
+
+    for change in changes:
+        log_booking_change(
+            db,
+            booking_id,
+            "field_updated",
+            field_changed=change["field"],
+            old_value=change["old_value"],
+            new_value=change["new_value"],
+            changed_by_name=booking_update.updated_by_name,
+            changed_by_role=booking_update.updated_by_role,
+        )
+
+    if changes:
+        await db.commit()
+
+    return booking
+
+
+@write_router.delete("/bookings/{booking_id}")
+async def soft_delete_booking(
+    booking_id: int,
+    deleted_by_name: Optional[str] = None,
+    deleted_by_role: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    booking = await _get_booking_or_404(db, booking_id)
+
+    booking.is_active = False
+    booking.last_updated_at = now_riyadh()
+    if booking.type_of_booking == "ICU":
+        # The bed helpers are shared with the sync app and take a sync Session
+        await db.run_sync(release_beds, booking_id)
+    await db.commit()
+
+    log_booking_change(
+        db,
+        booking_id,
+        "soft_deleted",
+        changed_by_name=deleted_by_name,
+        changed_by_role=deleted_by_role,
+        notes="Booking soft deleted",
+    )
+    await db.commit()
+
+    return {"message": "Booking deleted successfully"}
+
+
+@write_router.post("/bookings/{booking_id}/comments/", response_model=CommentResponse)
+async def add_comment(
+    booking_id: int, comment: CommentCreate, db: AsyncSession = Depends(get_async_db)
+):
+    booking = await _get_booking_or_404(db, booking_id)
+
+    db_comment = BookingComment(
+        booking_id=booking_id,
+        context=(booking.type_of_booking or "").lower() or None,
+        **comment.dict(),
+    )
+    db.add(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
+
+    log_booking_change(
+        db,
+        booking_id,
+        "comment_added",
+        changed_by_name=comment.author_name,
+        changed_by_role=comment.author_role,
+        notes=f"{'Internal' if comment.is_internal else 'Public'} comment added",
+    )
+    await db.commit()
+
+    return db_comment
+
+
+@router.get("/bookings/{booking_id}/comments/", response_model=List[CommentResponse])
+async def get_comments(
+    booking_id: int,
+    include_internal: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    async def thread(model):
+        stmt = select(model).where(model.booking_id == booking_id)
+        if not include_internal:
+            stmt = stmt.where(model.is_internal == False)
+        stmt = stmt.order_by(model.created_at.desc())
+        return (await db.execute(stmt)).scalars().all()
+
+    # Comments of an archived booking live in the archive table
+    return await thread(BookingComment) or await thread(ArchivedBookingComment)
+
+
+async def _update_status(db: AsyncSession, booking: Booking, status: str):
+    old_status = booking.status
+    booking.status = status
+    booking.last_updated_at = now_riyadh()
+    await db.commit()
+
+    log_booking_change(
+        db,
+        booking.id,
+        "status_updated",
+        field_changed="status",
+        old_value=old_status,
+        new_value=booking.status,
+    )
+    await db.commit()
+
+
+# Legacy booking endpoints
+@write_router.post("/api/or-bookings", response_model=LegacyORBookingResponse)
+async def legacy_create_or_booking(
+    booking: LegacyORBookingCreate, db: AsyncSession = Depends(get_async_db)
+):
+    existing = await has_active_booking(db, booking.mrn, "OR")
+    if existing:
+        raise duplicate_error(
+            "An active OR booking already exists for this MRN.",
+            existing,
+        )
+
+    db_booking = Booking(
+        mrn=booking.mrn,
+        patient_name=booking.patient_name,
+        patient_ward=booking.patient_ward,
+        procedure=booking.procedure,
+        type_of_booking="OR",
+        urgency=booking.urgency,
+        status="pending",
+        consultant=booking.consultant,
+        consultant_phone=booking.consultant_phone,
+        requesting_physician=booking.requesting_physician,
+        requesting_physician_phone=booking.requesting_physician_phone,
+        created_by_uid=booking.created_by_uid,
+        created_by_name=booking.created_by_name,
+        created_by_role=booking.created_by_role,
+        last_updated_at=now_riyadh(),
+    )
+    db.add(db_booking)
+    await db.commit()
+    await db.refresh(db_booking)
+
+    log_booking_change(
+        db,
+        db_booking.id,
+        "created",
+        changed_by_name=booking.created_by_name,
+        changed_by_role=booking.created_by_role,
+        notes="Legacy OR booking created",
+    )
+    await db.commit()
+
+    return _booking_to_legacy_or(db_booking)
+
+
+@router.get("/api/or-bookings", response_model=List[LegacyORBookingResponse])
+async def legacy_get_or_bookings(db: AsyncSession = Depends(get_async_read_db)):
+    bookings = (
+        (await db.execute(ACTIVE_BY_TYPE, {"booking_type": "OR"})).scalars().all()
+    )
+    return [_booking_to_legacy_or(b) for b in bookings]
+
+
+@router.get("/api/or-bookings/{booking_id}", response_model=LegacyORBookingResponse)
+async def legacy_get_or_booking(
+    booking_id: str, db: AsyncSession = Depends(get_async_read_db)
+):
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(
+        db, internal_id, expected_type="OR", include_archived=True
+    )
+    return _booking_to_legacy_or(booking)
+
+
+@write_router.put("/api/or-bookings/{booking_id}/status")
+async def legacy_update_or_status(
+    booking_id: str,
+    status_update: LegacyStatusUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(db, internal_id, expected_type="OR")
+    await _update_status(db, booking, status_update.status)
+    return {"message": "Status updated successfully"}
+
+
+@write_router.put("/api/or-bookings/{booking_id}/outcome")
+async def update_or_booking_outcome(
+    booking_id: str, payload: dict, db: AsyncSession = Depends(get_async_db)
+):
+    """Update the outcome of an OR booking."""
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(db, internal_id)
+
+    outcome = payload.get("outcome")
+    if not outcome:
+        raise HTTPException(status_code=400, detail="Outcome is required")
+
+    old_outcome = booking.outcome
+    booking.outcome = outcome
+    booking.outcome_changed_at = now_riyadh()
+
+    log_booking_change(
+        db,
+        booking.id,
+        "outcome_updated",
+        field_changed="outcome",
+        old_value=old_outcome or "",
+        new_value=outcome,
+        notes=f"OR outcome set to: {outcome}",
+    )
+    await db.commit()
+
+    return {"message": "Outcome updated successfully", "outcome": outcome}
+
+
+@write_router.post("/api/icu-requests", response_model=LegacyICUBookingResponse)
+async def legacy_create_icu_request(
+    request: LegacyICUBookingCreate, db: AsyncSession = Depends(get_async_db)
+):
+    existing = await has_active_booking(db, request.mrn, "ICU")
+    if existing:
+        raise duplicate_error(
+            "An active ICU request already exists for this MRN.",
+            existing,
+        )
+
+    db_booking = Booking(
+        mrn=request.mrn,
+        patient_name=request.patient_name,
+        patient_ward=request.patient_ward,
+        indication=request.indication,
+        procedure=request.indication,
+        type_of_booking="ICU",
+        urgency=request.urgency,
+        status="pending",
+        consultant=request.consultant,
+        consultant_phone=request.consultant_phone,
+        requesting_physician=request.requesting_physician,
+        requesting_physician_phone=request.requesting_physician_phone,
+        requested_date=request.requested_date,
+        created_by_uid=request.created_by_uid,
+        created_by_name=request.created_by_name,
+        created_by_role=request.created_by_role,
+        last_updated_at=now_riyadh(),
+    )
+    db.add(db_booking)
+    await db.commit()
+    await db.refresh(db_booking)
+
+    log_booking_change(
+        db,
+        db_booking.id,
+        "created",
+        changed_by_name=request.created_by_name,
+        changed_by_role=request.created_by_role,
+        notes="Legacy ICU request created",
+    )
+    await db.commit()
+
+    return _booking_to_legacy_icu(db_booking)
+
+
+@router.get("/api/icu-requests", response_model=List[LegacyICUBookingResponse])
+async def legacy_get_icu_requests(db: AsyncSession = Depends(get_async_read_db)):
+    bookings = (
+        (await db.execute(ACTIVE_BY_TYPE, {"booking_type": "ICU"})).scalars().all()
+    )
+    return [_booking_to_legacy_icu(b) for b in bookings]
+
+
+@router.get(
+    "/api/icu-requests/{booking_id}", response_model=LegacyICUBookingResponse
+)
+async def legacy_get_icu_request(
+    booking_id: str, db: AsyncSession = Depends(get_async_read_db)
+):
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(
+        db, internal_id, expected_type="ICU", include_archived=True
+    )
+    return _booking_to_legacy_icu(booking)
+
+
+@write_router.put("/api/icu-requests/{booking_id}/status")
+async def legacy_update_icu_status(
+    booking_id: str,
+    status_update: LegacyStatusUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(db, internal_id, expected_type="ICU")
+    await _update_status(db, booking, status_update.status)
+    return {"message": "Status updated successfully"}
+
+
+@write_router.put("/api/icu-requests/{booking_id}")
+async def legacy_reschedule_icu_request(
+    booking_id: str,
+    reschedule: ICURescheduleUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(db, internal_id, expected_type="ICU")
+    old_status = booking.status
+    old_date = booking.requested_date
+
+    booking.status = reschedule.status
+    booking.requested_date = reschedule.requested_date
+    booking.last_updated_at = now_riyadh()
+    await db.commit()
+
+    log_booking_change(
+        db,
+        booking.id,
+        "rescheduled",
+        field_changed="status,requested_date",
+        old_value=f"{old_status},{old_date}",
+        new_value=f"{reschedule.status},{reschedule.requested_date}",
+        notes="ICU request rescheduled",
+    )
+    await db.commit()
+
+    return {"message": "ICU request rescheduled successfully"}
+
+
+@write_router.post("/api/icu-requests/{booking_id}/confirm")
+async def legacy_confirm_icu_request(
+    booking_id: str, confirm: ICUConfirmUpdate, db: AsyncSession = Depends(get_async_db)
+):
+    """Confirm an ICU request and assign unit and room."""
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(db, internal_id, expected_type="ICU")
+
+    old_status = booking.status
+    old_unit = booking.unit
+    old_room = booking.room
+
+    try:
+        await db.run_sync(occupy_bed, confirm.unit, confirm.room, booking.id)
+    except UnknownBedError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except BedTakenError as exc:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": str(exc),
+                "bed": {key: exc.bed[key] for key in ("unit", "room", "state")},
+            },
+        )
+
+    booking.status = "confirmed"
+    booking.unit = confirm.unit
+    booking.room = confirm.room
+    booking.last_updated_at = now_riyadh()
+    await db.commit()
+
+    log_booking_change(
+        db,
+        booking.id,
+        "confirmed",
+        field_changed="status,unit,room",
+        old_value=f"{old_status},{old_unit},{old_room}",
+        new_value=f"confirmed,{confirm.unit},{confirm.room}",
+        notes=f"ICU bed confirmed in {confirm.unit}, {confirm.room}",
+    )
+    await db.commit()
+
+    return _booking_to_legacy_icu(booking)
+
+
+@write_router.put("/api/icu-requests/{booking_id}/outcome")
+async def update_icu_outcome(
+    booking_id: str, outcome_data: dict, db: AsyncSession = Depends(get_async_db)
+):
+    """Update the outcome field for an ICU request."""
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(db, internal_id, expected_type="ICU")
+
+    outcome = outcome_data.get("outcome")
+    if not outcome:
+        raise HTTPException(status_code=400, detail="Outcome is required")
+
+    old_outcome = booking.outcome
+    booking.outcome = outcome
+    booking.outcome_changed_at = now_riyadh()
+    booking.last_updated_at = now_riyadh()
+    if outcome in ICU_RELEASE_OUTCOMES:
+        await db.run_sync(release_beds, booking.id)
+    await db.commit()
+
+    log_booking_change(
+        db,
+        booking.id,
+        "outcome_updated",
+        field_changed="outcome",
+        old_value=old_outcome or "",
+        new_value=outcome,
+        notes=f"ICU outcome set to: {outcome}",
+    )
+    await db.commit()
+
+    return {"message": "Outcome updated successfully", "outcome": outcome}
+
+
+@write_router.post("/api/icu-requests/{booking_id}/discharge")
+async def discharge_icu_request(
+    booking_id: str, db: AsyncSession = Depends(get_async_db)
+):
+    """Free the ICU bed held by the request (patient left the unit)."""
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(db, internal_id, expected_type="ICU")
+
+    released = await db.run_sync(release_beds, booking.id)
+    if not released:
+        raise HTTPException(status_code=409, detail="ICU request does not hold a bed")
+    booking.last_updated_at = now_riyadh()
+    await db.commit()
+
+    log_booking_change(
+        db,
+        booking.id,
+        "discharged",
+        field_changed="unit,room",
+        old_value=f"{booking.unit},{booking.room}",
+        notes=f"ICU bed released in {booking.unit}, {booking.room}",
+    )
+    await db.commit()
+
+    return {"message": "ICU bed released", "unit": booking.unit, "room": booking.room}
+
+
+# Comment endpoints
+@write_router.post("/api/comments", response_model=LegacyCommentResponse)
+async def legacy_create_comment(
+    comment: LegacyCommentCreate, db: AsyncSession = Depends(get_async_db)
+):
+    internal_id = _parse_legacy_booking_id(comment.booking_id)
+    booking = await _get_booking_or_404(db, internal_id)
+
+    db_comment = BookingComment(
+        booking_id=booking.id,
+        message=comment.message,
+        context=comment.context,
+        author_uid=comment.author_uid,
+        author_name=comment.author_name,
+        author_role=comment.author_role,
+        is_internal=False,
+    )
+    db.add(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
+
+    log_booking_change(
+        db,
+        booking.id,
+        "comment_added",
+        changed_by_name=comment.author_name,
+        changed_by_role=comment.author_role,
+        notes="Legacy comment added",
+    )
+    await db.commit()
+
+    return _comment_to_legacy(db_comment)
+
+
+@router.get("/api/comments", response_model=List[LegacyCommentResponse])
+async def legacy_get_comments(
+    booking_id: str = Query(...),
+    context: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = await _get_booking_or_404(db, internal_id, include_archived=True)
+
+    stmt, params = comments_statement(
+        internal_id, context, archived=isinstance(booking, ArchivedBooking)
+    )
+    comments = (await db.execute(stmt, params)).scalars().all()
+    return [_comment_to_legacy(comment) for comment in comments]
+
+
+# Statistics endpoint
+@router.get("/bookings/stats/summary")
+async def get_booking_stats(db: AsyncSession = Depends(get_async_read_db)):
+    return stats_summary((await db.execute(STATS_SUMMARY)).one())
+
+
+@router.get("/bookings/{booking_id}/audit-log")
+async def get_booking_audit_log(
+    booking_id: int, db: AsyncSession = Depends(get_async_read_db)
+):
+    booking = await _get_booking_or_404(db, booking_id, include_archived=True)
+
+    stmt = audit_statement(archived=isinstance(booking, ArchivedBooking))
+    audit_logs = (await db.execute(stmt, {"booking_id": booking_id})).scalars().all()
+
+    return [
+        {
+            "action": log.action,
+            "field_changed": log.field_changed,
+            "old_value": log.old_value,
+            "new_value": log.new_value,
+            "changed_by": f"{log.changed_by_name} ({log.changed_by_role})"
+            if getattr(log, "changed_by_name", None)
+            else None,
+            "timestamp": log.timestamp,
+            "notes": log.notes,
+        }
+        for log in audit_logs
+    ]
+
+
+# Export endpoints
+def _csv_chunk(rows) -> str:
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    return output.getvalue()
+
+
+async def _stream_export(booking_type: str, month: int, year: int, header, row_fn):
+    """Yield the CSV in batches while rows are still being read from the DB.
+
+    The generator owns its session because the response body is produced
+    after the endpoint (and its dependencies) have returned.
+    """
+    first_day, last_day = _export_month_bounds(month, year)
+    stmt = EXPORT_BY_TYPE_AND_RANGE.execution_options(yield_per=EXPORT_BATCH_SIZE)
+    params = {
+        "booking_type": booking_type,
+        "first_day": first_day,
+        "last_day": last_day,
+    }
+
+    yield _csv_chunk([header])
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(stmt, params)
+        async for batch in result.partitions(EXPORT_BATCH_SIZE):
+            yield _csv_chunk(row_fn(b) for b in batch)
+
+
+@router.get("/api/export/or-bookings")
+async def export_or_bookings(
+    month: int = Query(..., ge=1, le=12),
+    year: int = Query(...),
+):
+    """Export OR bookings for a specific month as CSV (streamed)."""
+    filename = f"OR_Registry_{year}_{month:02d}.csv"
+    return StreamingResponse(
+        _stream_export("OR", month, year, OR_EXPORT_HEADER, _or_export_row),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@router.get("/api/export/icu-requests")
+async def export_icu_requests(
+    month: int = Query(..., ge=1, le=12),
+    year: int = Query(...),
+):
+    """Export ICU requests for a specific month as CSV (streamed)."""
+    filename = f"ICU_Registry_{year}_{month:02d}.csv"
+    return StreamingResponse(
+        _stream_export("ICU", month, year, ICU_EXPORT_HEADER, _icu_export_row),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+def install_async_routes(target_app, async_router: APIRouter):
+    """Swap each sync route for the async route with the same path and methods.
+
+    Routes are replaced in place so matching order (e.g. literal paths
+    registered before ``{booking_id}`` paths) is preserved.
+    """
+    replacements = {
+        (route.path, frozenset(route.methods)): route
+        for route in async_router.routes
+        if isinstance(route, APIRoute)
+    }
+    routes = target_app.router.routes
+    for index, route in enumerate(routes):
+        if isinstance(route, APIRoute):
+            key = (route.path, frozenset(route.methods))
+            if key in replacements:
+                routes[index] = replacements.pop(key)
+    # Anything without a sync counterpart is simply added
+    routes.extend(replacements.values())
+    target_app.openapi_schema = None
+
+
+async def _ping_async_database(target_engine) -> float:
+    started = time.perf_counter()
+    async with target_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    return (time.perf_counter() - started) * 1000
+
+
+install_async_routes(app, router)
+if ASYNC_WRITES:
+    install_async_routes(app, write_router)
+for name, (target_engine, metrics, cache_metrics) in async_engines().items():
+    if SQL_STATS_ENABLED:
+        instrument_engine(target_engine.sync_engine)
+    if SLOW_QUERY_LOG:
+        slow_query_log.attach(target_engine.sync_engine)
+    http_metrics.add_pool(name, target_engine.sync_engine, metrics)
+    add_health_target(
+        name,
+        target_engine.sync_engine,
+        metrics,
+        cache_metrics,
+        ping=partial(_ping_async_database, target_engine),
+    )
+
+_enhanced_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def lifespan(target_app):
+    async with _enhanced_lifespan(target_app):
+        yield
+    # Pooled aiosqlite connections each own a worker thread that would
+    # otherwise keep the process alive
+    for target_engine, _, _ in async_engines().values():
+        await target_engine.dispose()
+
+
+app.router.lifespan_context = lifespan
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
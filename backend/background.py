@@ -0,0 +1,55 @@
+"""
+Periodic background jobs run inside the API process.
+
+Jobs are plain blocking functions; each run happens in the threadpool so the
+event loop stays free. Start them from the app lifespan and stop them on
+shutdown. Every worker process runs its own copy, so jobs must be safe to run
+concurrently (e.g. SELECT ... FOR UPDATE SKIP LOCKED).
+"""
+
+import asyncio
+import logging
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Call ``fn()`` every ``interval`` seconds until stopped."""
+
+    def __init__(self, name: str, fn: Callable, interval: float, initial_delay: float = 0):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.runs = 0
+        self.failures = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+        return self
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            try:
+                await run_in_threadpool(self.fn)
+                self.runs += 1
+            except Exception:
+                self.failures += 1
+                logger.exception("Background task %s failed", self.name)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Booking API Load Test
+Starts the enhanced API in this process (uvicorn on a free local port, with
+its full lifespan: caches, queues and background jobs), seeds the database and
+drives a weighted mix of what the clients do from a pool of threads: polling
+the OR/ICU lists and the OR queue, MRN checks before a booking, creates,
+status changes, comments and monthly exports.
+
+Reports requests/s, errors and p50/p95/p99 latency per endpoint. ``--json``
+also writes them, with the commit and run settings, so runs on different
+commits can be compared.
+
+The database is a fresh SQLite file unless --database-url points at another
+one, e.g. a scratch PostgreSQL database (migrated first; the run adds rows).
+
+Usage:
+    python bench_api.py
+    python bench_api.py --concurrency 32 --seconds 30 --bookings 20000
+    python bench_api.py --mix list=50,check-mrn=30,create=20 --json bench/api.json
+    python bench_api.py --async --database-url postgresql://bench@localhost/bench
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = {
+    "list": 35,
+    "queue": 10,
+    "check-mrn": 20,
+    "create": 8,
+    "status": 12,
+    "comment": 12,
+    "export": 3,
+}
+
+OR_STATUSES = ("pending", "seen_accepted", "awaiting_resources")
+ICU_STATUSES = ("pending", "seen_accepted", "no_bed_available")
+NAMES = ("Ahmed Ali", "Sara Hassan", "Omar Khalid", "Fatima Saleh", "Yousef Nasser", "Mona Adel")
+WARDS = ("W1", "W2", "W3", "ER", "CCU")
+PROCEDURES = ("Appendectomy", "Cholecystectomy", "Hernia repair", "ORIF femur", "Laparotomy")
+CONSULTANTS = ("Dr. Haddad", "Dr. Rahman", "Dr. Fahad", "Dr. Nour")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(
+                f"unknown operation '{name}' (choose from {', '.join(DEFAULT_MIX)})"
+            )
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# -- dataset ----------------------------------------------------------------------
+
+
+def seed(engine, bookings: int, comments: float, seed: int) -> dict:
+    """Load ``bookings`` bookings over the last 90 days; live booking ids per type."""
+    from sqlalchemy import select
+
+    import seed_data
+    from enhanced_models import Booking
+
+    seed_data.seed(engine, bookings, years=90 / 365, comments=comments, seed=seed)
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(Booking.id, Booking.type_of_booking).where(Booking.is_active.is_(True))
+        ).all()
+    return {
+        kind: [booking_id for booking_id, booking_kind in rows if booking_kind == kind]
+        for kind in ("OR", "ICU")
+    }
+
+
+# -- workload ---------------------------------------------------------------------
+
+
+class Workload:
+    """The operations of the mix. Each returns (endpoint label, response)."""
+
+    def __init__(self, base_url: str, active_ids: dict, bookings: int):
+        self.base_url = base_url
+        self.ids = active_ids  # appended to by creates; list.append is atomic
+        self.known_mrns = bookings
+        self.serials = itertools.count()
+        today = datetime.now()
+        self.month, self.year = today.month, today.year
+
+    def list(self, http, rng):
+        path = rng.choice(("/api/or-bookings", "/api/icu-requests"))
+        return f"GET {path}", http.get(self.base_url + path)
+
+    def queue(self, http, rng):
+        return "GET /api/or-bookings/queue", http.get(
+            self.base_url + "/api/or-bookings/queue", params={"limit": 50}
+        )
+
+    def check_mrn(self, http, rng):
+        # Mostly MRNs that exist, as when staff open an existing patient
+        if rng.random() < 0.7:
+            mrn = str(1_000_000 + rng.randrange(self.known_mrns))
+        else:
+            mrn = str(9_000_000 + rng.randrange(1_000_000))
+        return "GET /api/check-mrn/{mrn}", http.get(f"{self.base_url}/api/check-mrn/{mrn}")
+
+    def create(self, http, rng):
+        serial = next(self.serials)
+        kind = rng.choice(("OR", "ICU"))
+        body = {
+            "mrn": f"L{serial:08d}",
+            "patient_name": rng.choice(NAMES),
+            "patient_ward": rng.choice(WARDS),
+            "urgency": rng.choice(("E1", "E2", "E3") if kind == "OR" else ("Critical", "Elective")),
+            "consultant": rng.choice(CONSULTANTS),
+            "consultant_phone": "0500000000",
+            "requesting_physician": rng.choice(CONSULTANTS),
+            "requesting_physician_phone": "0500000001",
+            "created_by_uid": "bench",
+            "created_by_name": "Load Test",
+            "created_by_role": "applicant",
+        }
+        if kind == "OR":
+            body["procedure"] = rng.choice(PROCEDURES)
+            path = "/api/or-bookings"
+        else:
+            body["indication"] = "Post-op monitoring"
+            path = "/api/icu-requests"
+        response = http.post(self.base_url + path, json=body)
+        if response.ok:
+            self.ids[kind].append(int(response.json()["id"]))
+        return f"POST {path}", response
+
+    def status(self, http, rng):
+        kind = rng.choice(("OR", "ICU"))
+        path = "/api/or-bookings" if kind == "OR" else "/api/icu-requests"
+        booking_id = rng.choice(self.ids[kind])
+        status = rng.choice(OR_STATUSES if kind == "OR" else ICU_STATUSES)
+        return f"PUT {path}/{{booking_id}}/status", http.put(
+            f"{self.base_url}{path}/{booking_id}/status", json={"status": status}
+        )
+
+    def comment(self, http, rng):
+        kind = rng.choice(("OR", "ICU"))
+        booking_id = str(rng.choice(self.ids[kind]))
+        if rng.random() < 0.5:
+            return "GET /api/comments", http.get(
+                self.base_url + "/api/comments", params={"booking_id": booking_id}
+            )
+        return "POST /api/comments", http.post(
+            self.base_url + "/api/comments",
+            json={
+                "booking_id": booking_id,
+                "context": kind.lower(),
+                "message": "Load test comment",
+                "author_uid": "bench",
+                "author_name": "Load Test",
+                "author_role": "applicant",
+            },
+        )
+
+    def export(self, http, rng):
+        path = rng.choice(("/api/export/or-bookings", "/api/export/icu-requests"))
+        return f"GET {path}", http.get(
+            self.base_url + path, params={"month": self.month, "year": self.year}
+        )
+
+
+def run_load(workload: Workload, mix: dict, args) -> dict:
+    operations = [getattr(workload, name.replace("-", "_")) for name in mix]
+    cum_weights = list(itertools.accumulate(mix.values()))
+    samples = {}  # label -> ([seconds], errors)
+    samples_lock = threading.Lock()
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.seconds
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        local = {}
+        with requests.Session() as http:
+            while True:
+                operation = rng.choices(operations, cum_weights=cum_weights)[0]
+                started = time.perf_counter()
+                if started >= deadline:
+                    break
+                try:
+                    label, response = operation(http, rng)
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    label, ok = operation.__name__, False
+                if started < measure_from:
+                    continue
+                times, errors = local.setdefault(label, ([], [0]))
+                times.append(time.perf_counter() - started)
+                if not ok:
+                    errors[0] += 1
+        with samples_lock:
+            for label, (times, errors) in local.items():
+                total_times, total_errors = samples.setdefault(label, ([], [0]))
+                total_times.extend(times)
+                total_errors[0] += errors[0]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {label: (times, errors[0]) for label, (times, errors) in samples.items()}
+
+
+# -- report -----------------------------------------------------------------------
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0] * 1000
+    return statistics.quantiles(values, n=100)[pct - 1] * 1000
+
+
+def summarize(samples: dict, seconds: float) -> dict:
+    endpoints = {}
+    for label, (times, errors) in sorted(samples.items()):
+        endpoints[label] = {
+            "requests": len(times),
+            "errors": errors,
+            "rps": round(len(times) / seconds, 1),
+            "p50_ms": round(_percentile(times, 50), 2),
+            "p95_ms": round(_percentile(times, 95), 2),
+            "p99_ms": round(_percentile(times, 99), 2),
+            "max_ms": round(max(times) * 1000, 2) if times else 0.0,
+        }
+    requests_total = sum(e["requests"] for e in endpoints.values())
+    every = [t for times, _ in samples.values() for t in times]
+    return {
+        "total": {
+            "requests": requests_total,
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "rps": round(requests_total / seconds, 1),
+            "p50_ms": round(_percentile(every, 50), 2),
+            "p95_ms": round(_percentile(every, 95), 2),
+            "p99_ms": round(_percentile(every, 99), 2),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(summary: dict):
+    print("=" * 86)
+    print(f"{'endpoint':<40}{'req/s':>8}{'errors':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for label, e in summary["endpoints"].items():
+        print(
+            f"{label:<40}{e['rps']:>8.1f}{e['errors']:>8}"
+            f"{e['p50_ms']:>8.1f}ms{e['p95_ms']:>8.1f}ms{e['p99_ms']:>8.1f}ms"
+        )
+    total = summary["total"]
+    print("-" * 86)
+    print(
+        f"{'total':<40}{total['rps']:>8.1f}{total['errors']:>8}"
+        f"{total['p50_ms']:>8.1f}ms{total['p95_ms']:>8.1f}ms{total['p99_ms']:>8.1f}ms"
+    )
+    print("=" * 86)
+    print("errors = HTTP 4xx/5xx or connection failures")
+
+
+# -- main -------------------------------------------------------------------------
+
+
+def _start_server(app):
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Accepted sockets inherit this; without it Nagle plus delayed ACKs add
+    # ~40 ms to every keep-alive request
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(
+        uvicorn.Config(app, log_level="warning", access_log=False, lifespan="on")
+    )
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("the API failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the booking API")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads")
+    parser.add_argument("--seconds", type=float, default=10.0, help="measured duration")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds first")
+    parser.add_argument("--bookings", type=int, default=2000, help="bookings seeded first")
+    parser.add_argument("--comments", type=float, default=2.0, help="mean comments per seeded booking")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. list=40,create=10")
+    parser.add_argument("--database-url", help="database to use instead of a fresh SQLite file")
+    parser.add_argument("--async", dest="async_mode", action="store_true", help="serve async_main")
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--verbose", action="store_true", help="show the API's warnings")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Seeded cases past their deadline log SLA breaches at startup
+        logging.disable(logging.WARNING)
+
+    directory = None
+    url = args.database_url
+    if url is None:
+        directory = tempfile.mkdtemp(prefix="vitalflow_bench_api_")
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    # database.py builds its engines from the environment at import
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SLOW_QUERY_LOG_FILE", "")
+
+    try:
+        from database import engine
+        from migrations import migrate
+
+        migrate(engine, "enhanced")
+        print(f"Seeding {args.bookings} bookings with {args.comments:g} comments each on average...")
+        active_ids = seed(engine, args.bookings, args.comments, args.seed)
+
+        if args.async_mode:
+            from async_main import app
+        else:
+            from enhanced_main import app
+        server, thread, base_url = _start_server(app)
+        try:
+            mix = ", ".join(f"{name}={weight:g}" for name, weight in args.mix.items())
+            print(
+                f"API load test: {'async_main' if args.async_mode else 'enhanced_main'} on "
+                f"{engine.dialect.name}, {args.concurrency} clients, {args.seconds:g}s "
+                f"(+{args.warmup:g}s warm-up), mix {mix}"
+            )
+            samples = run_load(Workload(base_url, active_ids, args.bookings), args.mix, args)
+        finally:
+            server.should_exit = True
+            thread.join()
+
+        summary = summarize(samples, args.seconds)
+        print_report(summary)
+        if args.json:
+            result = {
+                "run": {
+                    "commit": _commit(),
+                    "at": datetime.now().isoformat(timespec="seconds"),
+                    "app": "async_main" if args.async_mode else "enhanced_main",
+                    "database": engine.dialect.name,
+                    "concurrency": args.concurrency,
+                    "seconds": args.seconds,
+                    "bookings": args.bookings,
+                    "comments": args.comments,
+                    "mix": args.mix,
+                },
+                **summary,
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+            with open(args.json, "w") as handle:
+                json.dump(result, handle, indent=2)
+            print(f"Results written to {args.json}")
+        return 0
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
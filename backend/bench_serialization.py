@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Serialization Microbenchmarks
+Times the per-request CPU work after the query, at 1, 100 and 10,000 rows:
+
+  - to-legacy     _booking_to_legacy_or / _booking_to_legacy_icu /
+                  _comment_to_legacy over loaded ORM objects
+  - response      FastAPI's response handling for the list endpoints: the
+                  route's own response field validates and serializes the
+                  models, then JSONResponse renders them
+  - json-encoder  json.dumps with DateTimeEncoder over the dumped models
+  - csv           the registry export rows (_or_export_row / _icu_export_row)
+                  written by _csv_response, from the export query's rows
+
+Rows come from seed_data.py in an in-memory SQLite database, so attributes
+are populated as after a real query. Each case is run for at least --min-time
+per repeat; the median and best time per call are reported.
+
+``--json`` stores the results with the commit; ``--compare`` prints each
+case's change against a stored file in percent, and ``--max-regression``
+makes the run fail when a case got slower than that.
+
+Usage:
+    python bench_serialization.py
+    python bench_serialization.py --json bench/serialization.json
+    python bench_serialization.py --compare bench/serialization.json --max-regression 10
+    python bench_serialization.py --filter response --sizes 100
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# The data set lives in its own engine; enhanced_main only needs a valid URL
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.setdefault("SLOW_QUERY_LOG_FILE", "")
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Startup warnings of the app module (e.g. no STAFF_TOKEN_SECRET) are noise here
+logging.disable(logging.WARNING)
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute, serialize_response
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import enhanced_main as api
+import seed_data
+from enhanced_models import Booking, BookingComment
+from hot_queries import EXPORT_BY_TYPE_AND_RANGE
+from migrations import migrate
+
+DEFAULT_SIZES = (1, 100, 10_000)
+
+
+# -- data -------------------------------------------------------------------------
+
+
+def load_rows(size: int) -> dict:
+    """At least ``size`` OR bookings, ICU bookings, comments and export rows."""
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    migrate(engine, "enhanced")
+    # About 2:1 OR:ICU; the margin covers the random split
+    seed_data.seed(
+        engine, int(size * 3.3) + 10, years=1, comments=1, archive=False,
+        now=datetime(2025, 6, 30, 12),
+    )
+    with Session(engine) as db:
+        rows = {
+            kind: db.execute(
+                select(Booking).where(Booking.type_of_booking == kind).order_by(Booking.id).limit(size)
+            ).scalars().all()
+            for kind in ("OR", "ICU")
+        }
+        rows["comments"] = db.execute(
+            select(BookingComment).order_by(BookingComment.id).limit(size)
+        ).scalars().all()
+        for kind in ("OR", "ICU"):
+            rows[f"{kind}_export"] = db.execute(
+                EXPORT_BY_TYPE_AND_RANGE.limit(size),
+                {"booking_type": kind, "first_day": datetime(2000, 1, 1), "last_day": datetime(2100, 1, 1)},
+            ).all()
+    engine.dispose()
+    for name, values in rows.items():
+        if len(values) < size:
+            raise RuntimeError(f"only {len(values)} {name} rows generated, {size} needed")
+    return rows
+
+
+# -- cases ------------------------------------------------------------------------
+
+
+def _route(path: str) -> APIRoute:
+    return next(
+        route for route in api.app.routes
+        if isinstance(route, APIRoute) and route.path == path and "GET" in route.methods
+    )
+
+
+def _run(coroutine):
+    # serialize_response only awaits a threadpool when is_coroutine is False
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("serialize_response suspended")
+
+
+def _response(route: APIRoute, content) -> bytes:
+    serialized = _run(serialize_response(field=route.response_field, response_content=content))
+    response_class = route.response_class
+    if isinstance(response_class, DefaultPlaceholder):
+        response_class = response_class.value
+    return response_class(serialized).body
+
+
+def build_cases(rows: dict, size: int) -> dict:
+    """Case name -> zero-argument callable over ``size`` rows."""
+    or_rows, icu_rows, comments = rows["OR"][:size], rows["ICU"][:size], rows["comments"][:size]
+    or_models = [api._booking_to_legacy_or(b) for b in or_rows]
+    icu_models = [api._booking_to_legacy_icu(b) for b in icu_rows]
+    comment_models = [api._comment_to_legacy(c) for c in comments]
+    or_route, icu_route = _route("/api/or-bookings"), _route("/api/icu-requests")
+    comment_route = _route("/api/comments")
+    or_payload = [model.model_dump() for model in or_models]
+    icu_payload = [model.model_dump() for model in icu_models]
+    or_export, icu_export = rows["OR_export"][:size], rows["ICU_export"][:size]
+
+    return {
+        "to-legacy/or": lambda: [api._booking_to_legacy_or(b) for b in or_rows],
+        "to-legacy/icu": lambda: [api._booking_to_legacy_icu(b) for b in icu_rows],
+        "to-legacy/comment": lambda: [api._comment_to_legacy(c) for c in comments],
+        "response/or": lambda: _response(or_route, or_models),
+        "response/icu": lambda: _response(icu_route, icu_models),
+        "response/comment": lambda: _response(comment_route, comment_models),
+        "json-encoder/or": lambda: json.dumps(or_payload, cls=api.DateTimeEncoder),
+        "json-encoder/icu": lambda: json.dumps(icu_payload, cls=api.DateTimeEncoder),
+        "csv/or": lambda: api._csv_response(
+            api.OR_EXPORT_HEADER, (api._or_export_row(r) for r in or_export), "or.csv"
+        ),
+        "csv/icu": lambda: api._csv_response(
+            api.ICU_EXPORT_HEADER, (api._icu_export_row(r) for r in icu_export), "icu.csv"
+        ),
+    }
+
+
+# -- timing -----------------------------------------------------------------------
+
+
+def measure(function, min_time: float, repeats: int) -> dict:
+    """Seconds per call: median and best of ``repeats`` runs of >= ``min_time``."""
+    function()  # warm-up
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+
+    timings = [elapsed / number]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number)
+    return {"median": statistics.median(timings), "min": min(timings), "calls": number}
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def _delta(result: dict, baseline: dict):
+    if baseline is None or not baseline.get("median"):
+        return None
+    return (result["median"] / baseline["median"] - 1) * 100
+
+
+def print_report(results: dict, baseline: dict):
+    print("=" * 84)
+    print(f"{'case':<24}{'rows':>8}{'median':>12}{'best':>12}{'per row':>12}{'vs baseline':>14}")
+    for key, result in results.items():
+        delta = _delta(result, baseline.get(key))
+        print(
+            f"{result['case']:<24}{result['rows']:>8,}{_format_time(result['median']):>12}"
+            f"{_format_time(result['min']):>12}{_format_time(result['median'] / result['rows']):>12}"
+            f"{'' if delta is None else f'{delta:+.1f}%':>14}"
+        )
+    print("=" * 84)
+
+
+# -- main -------------------------------------------------------------------------
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _sizes(value: str):
+    return tuple(int(size) for size in value.split(","))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark response serialization helpers")
+    parser.add_argument("--sizes", type=_sizes, default=DEFAULT_SIZES, help="rows per case (default: 1,100,10000)")
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat (default: 0.2)")
+    parser.add_argument("--repeats", type=int, default=5, help="repeats per case (default: 5)")
+    parser.add_argument("--json", metavar="PATH", help="store the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="stored results to show deltas against")
+    parser.add_argument("--max-regression", type=float, metavar="PCT",
+                        help="exit 1 when a case's median is more than PCT%% slower than --compare")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            stored = json.load(handle)
+        baseline = stored["results"]
+        print(f"Baseline: {args.compare} (commit {stored['run'].get('commit')}, {stored['run'].get('at')})")
+
+    print(f"Generating {max(args.sizes):,} rows per kind...")
+    rows = load_rows(max(args.sizes))
+
+    results = {}
+    for size in args.sizes:
+        for case, function in build_cases(rows, size).items():
+            if args.filter in case:
+                result = measure(function, args.min_time, args.repeats)
+                results[f"{case}[{size}]"] = {"case": case, "rows": size, **result}
+    print_report(results, baseline)
+
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "run": {
+                        "commit": _commit(),
+                        "at": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "machine": platform.machine(),
+                        "min_time": args.min_time,
+                        "repeats": args.repeats,
+                    },
+                    "results": results,
+                },
+                handle,
+                indent=2,
+            )
+        print(f"Results written to {args.json}")
+
+    if args.max_regression is not None and baseline:
+        regressed = [
+            f"{key} {delta:+.1f}%"
+            for key, result in results.items()
+            if (delta := _delta(result, baseline.get(key))) is not None and delta > args.max_regression
+        ]
+        if regressed:
+            print(f"Slower than the baseline by more than {args.max_regression:g}%: " + ", ".join(regressed))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
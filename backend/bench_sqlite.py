@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+SQLite Profile Benchmark
+Runs the same mixed read/write workload from a pool of threads against a
+fresh SQLite file twice: once with SQLite's defaults (one engine, rollback
+journal, deferred transactions) and once with the SQLite profile (WAL and
+pragmas, single writer connection, pooled query_only readers).
+
+Usage:
+    python bench_sqlite.py
+    python bench_sqlite.py --threads 32 --seconds 10 --write-ratio 0.3
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# The benchmark builds its own engines; database.py only needs a valid URL
+os.environ["DATABASE_URL"] = "sqlite://"
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import SQLITE_PRAGMAS, DB_POOL_TIMEOUT
+from enhanced_models import AuditLog, Booking, now_riyadh
+from hot_queries import ACTIVE_BY_TYPE, BOOKING_BY_ID
+from migrations import migrate
+from sqlite_profile import apply_sqlite_profile, sqlite_pool_options
+
+ACTIVE_PAGE = ACTIVE_BY_TYPE.limit(50)
+
+
+def build_default(url, threads):
+    """One engine for reads and writes, as before the profile."""
+    engine = create_engine(url, pool_size=threads, max_overflow=0)
+    return engine, engine
+
+
+def build_profile(url, threads):
+    writer = create_engine(
+        url, **sqlite_pool_options(url, True, threads, 0, DB_POOL_TIMEOUT)
+    )
+    apply_sqlite_profile(writer, SQLITE_PRAGMAS, writer=True)
+    reader = create_engine(
+        url, **sqlite_pool_options(url, False, threads, 0, DB_POOL_TIMEOUT)
+    )
+    apply_sqlite_profile(reader, SQLITE_PRAGMAS, writer=False)
+    return writer, reader
+
+
+MODES = {
+    "default": build_default,
+    "profile": build_profile,
+}
+
+
+def seed(engine, rows):
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        for i in range(rows):
+            db.add(
+                Booking(
+                    mrn=f"B{i:06d}",
+                    procedure="benchmark",
+                    type_of_booking="OR" if i % 2 else "ICU",
+                    urgency="E2",
+                    status="pending",
+                    is_active=True,
+                    last_updated_at=now_riyadh(),
+                )
+            )
+        db.commit()
+
+
+def write_once(WriterSession, serial):
+    with WriterSession() as db:
+        booking = Booking(
+            mrn=f"W{serial:08d}",
+            procedure="benchmark",
+            type_of_booking="OR",
+            urgency="E1",
+            status="pending",
+            is_active=True,
+            last_updated_at=now_riyadh(),
+        )
+        db.add(booking)
+        db.flush()
+        db.add(AuditLog(booking_id=booking.id, action="created"))
+        db.commit()
+
+
+def read_once(ReaderSession, max_id):
+    with ReaderSession() as db:
+        if random.random() < 0.5:
+            db.execute(ACTIVE_PAGE, {"booking_type": "OR"}).scalars().all()
+        else:
+            booking_id = random.randint(1, max_id)
+            db.execute(BOOKING_BY_ID, {"booking_id": booking_id}).scalars().first()
+
+
+def run_mode(mode, args):
+    directory = tempfile.mkdtemp(prefix="vitalflow_bench_")
+    url = f"sqlite:///{os.path.join(directory, f'{mode}.db')}"
+    writer, reader = MODES[mode](url, args.threads)
+    try:
+        migrate(writer, "enhanced")
+        seed(writer, args.rows)
+
+        WriterSession = sessionmaker(bind=writer, autoflush=False)
+        ReaderSession = sessionmaker(bind=reader, autoflush=False)
+        # itertools.count is atomic under the GIL
+        serials = itertools.count()
+
+        results = {"read": [], "write": [], "errors": 0}
+        results_lock = threading.Lock()
+        deadline = time.perf_counter() + args.seconds
+
+        def worker():
+            reads, writes, errors = [], [], 0
+            while time.perf_counter() < deadline:
+                is_write = random.random() < args.write_ratio
+                started = time.perf_counter()
+                try:
+                    if is_write:
+                        write_once(WriterSession, next(serials))
+                    else:
+                        read_once(ReaderSession, args.rows)
+                except OperationalError:
+                    # "database is locked" / busy
+                    errors += 1
+                    continue
+                elapsed = time.perf_counter() - started
+                (writes if is_write else reads).append(elapsed)
+            with results_lock:
+                results["read"].extend(reads)
+                results["write"].extend(writes)
+                results["errors"] += errors
+
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    finally:
+        writer.dispose()
+        if reader is not writer:
+            reader.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0] * 1000
+    return statistics.quantiles(values, n=100)[pct - 1] * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite profile")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--rows", type=int, default=2000, help="bookings seeded first")
+    args = parser.parse_args()
+
+    print(
+        f"SQLite benchmark: {args.threads} threads, {args.seconds:g}s per mode, "
+        f"{args.write_ratio:.0%} writes, {args.rows} seeded bookings"
+    )
+    print("=" * 78)
+    print(
+        f"{'mode':<9}{'reads/s':>10}{'writes/s':>10}{'errors':>8}"
+        f"{'read p50':>11}{'read p95':>11}{'write p50':>11}{'write p95':>11}"
+    )
+    for mode in MODES:
+        results = run_mode(mode, args)
+        print(
+            f"{mode:<9}"
+            f"{len(results['read']) / args.seconds:>10.0f}"
+            f"{len(results['write']) / args.seconds:>10.0f}"
+            f"{results['errors']:>8}"
+            f"{_percentile(results['read'], 50):>9.1f}ms"
+            f"{_percentile(results['read'], 95):>9.1f}ms"
+            f"{_percentile(results['write'], 50):>9.1f}ms"
+            f"{_percentile(results['write'], 95):>9.1f}ms"
+        )
+    print("=" * 78)
+    print("errors = OperationalError such as 'database is locked'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+In-process notifications for committed booking changes.
+
+In-memory indexes (typeahead, active MRNs, ...) subscribe with
+``@on_booking_committed`` instead of every write endpoint calling them. ORM
+flushes of Booking rows are recorded on the session and delivered after the
+transaction commits; a rollback discards them. This covers the sync and the
+async endpoints, since AsyncSession runs on a regular Session.
+
+Core-level statements (archive.py, bulk UPDATEs) bypass the ORM and are not
+reported, so subscribers must also be able to rebuild from the database.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from enhanced_models import Booking
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "booking_changes"
+
+_listeners: List[Callable] = []
+
+
+@dataclass(frozen=True)
+class BookingChange:
+    action: str  # "insert", "update" or "delete"
+    values: Dict = field(default_factory=dict)  # column values after the change
+    previous: Dict = field(default_factory=dict)  # old values of changed columns
+
+
+def on_booking_committed(fn: Callable) -> Callable:
+    """Register ``fn(change)`` to run after each committed Booking change."""
+    _listeners.append(fn)
+    return fn
+
+
+def _column_values(target) -> Dict:
+    return {column.key: getattr(target, column.key) for column in inspect(target).mapper.column_attrs}
+
+
+def _record(session, change):
+    session.info.setdefault(_PENDING_KEY, []).append(change)
+
+
+@event.listens_for(Booking, "after_insert")
+def _after_insert(mapper, connection, target):
+    _record(inspect(target).session, BookingChange("insert", _column_values(target)))
+
+
+@event.listens_for(Booking, "after_update")
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    previous = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if history.has_changes():
+            # Nothing is deleted when the old value was None
+            previous[attr.key] = history.deleted[0] if history.deleted else None
+    _record(state.session, BookingChange("update", _column_values(target), previous))
+
+
+@event.listens_for(Booking, "after_delete")
+def _after_delete(mapper, connection, target):
+    _record(inspect(target).session, BookingChange("delete", _column_values(target)))
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    for change in changes:
+        for listener in _listeners:
+            try:
+                listener(change)
+            except Exception:
+                logger.exception("Booking change listener %s failed", listener.__name__)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
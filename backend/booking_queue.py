@@ -0,0 +1,199 @@
+"""
+In-memory priority queues of bookings.
+
+A BookingQueue holds the bookings matching a predicate in a heap ordered by a
+key function. It is loaded from a statement at startup, follows committed
+booking changes (booking_events) with O(log n) pushes and lazy removals, and
+is reloaded periodically so changes made by other workers show up.
+
+``ordered()`` returns the whole queue in order. The sorted list is cached per
+``version`` and rebuilt only after the queue changed, so polling it costs
+nothing extra between writes. ``on_change`` listeners run after pushes,
+removals, applied changes and reloads (not pops), outside the queue's lock.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class BookingQueue:
+    def __init__(self, statement, accepts: Callable, key: Callable, summary: Callable):
+        """
+        statement: SELECT returning the rows to load (mappings with an "id")
+        accepts:   values -> bool, whether a booking belongs in the queue
+        key:       values -> sort key, lowest first; must be unique per booking
+        summary:   values -> dict kept for the booking
+        """
+        self.statement = statement
+        self.accepts = accepts
+        self.key = key
+        self.summary = summary
+        self._lock = threading.Lock()
+        self._heap: List[list] = []
+        # booking id -> [key, seq, summary, live]. seq breaks ties between a
+        # booking's live entry and its removed one, so dicts are never compared
+        self._entries: Dict[int, list] = {}
+        self._seq = itertools.count()
+        self._loading = False
+        self._pending = []
+        self._ordered: Optional[List[dict]] = None
+        self._listeners: List[Callable] = []
+        self.version = 0
+        self.ready = False
+
+    def on_change(self, fn):
+        """Register ``fn()`` to run after the queue changed."""
+        self._listeners.append(fn)
+        return fn
+
+    def _notify(self):
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception("Queue listener %s failed", listener.__name__)
+
+    def _entry(self, values):
+        return [self.key(values), next(self._seq), self.summary(values), True]
+
+    def _push(self, heap, entries, values):
+        self._remove(entries, values["id"])
+        entry = self._entry(values)
+        entries[values["id"]] = entry
+        heapq.heappush(heap, entry)
+
+    @staticmethod
+    def _remove(entries, booking_id) -> bool:
+        entry = entries.pop(booking_id, None)
+        if entry is None:
+            return False
+        entry[3] = False
+        return True
+
+    def _changed(self):
+        self.version += 1
+        self._ordered = None
+
+    def _prune(self):
+        while self._heap and not self._heap[0][3]:
+            heapq.heappop(self._heap)
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            # Mostly removed entries: rebuild instead of letting the heap grow
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+
+    def push(self, values):
+        with self._lock:
+            self._push(self._heap, self._entries, values)
+            self._changed()
+        self._notify()
+
+    def remove(self, booking_id: int):
+        with self._lock:
+            removed = self._remove(self._entries, booking_id)
+            if removed:
+                self._changed()
+        if removed:
+            self._notify()
+
+    def peek(self) -> Optional[dict]:
+        with self._lock:
+            self._prune()
+            return self._heap[0][2] if self._heap else None
+
+    def pop(self) -> Optional[dict]:
+        with self._lock:
+            self._prune()
+            if not self._heap:
+                return None
+            entry = heapq.heappop(self._heap)
+            del self._entries[entry[2]["id"]]
+            self._changed()
+            return entry[2]
+
+    def pop_before(self, bound) -> List[dict]:
+        """Pop every booking whose key sorts before ``bound``, in order."""
+        popped = []
+        with self._lock:
+            while True:
+                self._prune()
+                if not self._heap or not self._heap[0][0] < bound:
+                    break
+                entry = heapq.heappop(self._heap)
+                del self._entries[entry[2]["id"]]
+                popped.append(entry[2])
+            if popped:
+                self._changed()
+        return popped
+
+    def top(self, count: int) -> List[dict]:
+        """The first ``count`` bookings in order."""
+        with self._lock:
+            if self._ordered is not None:
+                return self._ordered[:count]
+            self._prune()
+            live = (entry for entry in self._heap if entry[3])
+            return [entry[2] for entry in heapq.nsmallest(count, live, key=lambda e: e[0])]
+
+    def ordered(self) -> List[dict]:
+        """All bookings in order; cached until the queue changes."""
+        with self._lock:
+            if self._ordered is None:
+                self._ordered = [
+                    entry[2] for entry in sorted(self._entries.values(), key=lambda e: e[0])
+                ]
+            return self._ordered
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _apply(self, heap, entries, change) -> bool:
+        if change.action != "delete" and self.accepts(change.values):
+            self._push(heap, entries, change.values)
+            return True
+        return self._remove(entries, change.values["id"])
+
+    def apply(self, change):
+        """Follow a committed BookingChange."""
+        if change.values.get("id") is None:
+            return
+        with self._lock:
+            if self._loading:
+                self._pending.append(change)
+            changed = self._apply(self._heap, self._entries, change)
+            if changed:
+                self._changed()
+        if changed:
+            self._notify()
+
+    def load(self, session_factory):
+        """Rebuild from the database."""
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            with session_factory() as db:
+                rows = db.execute(self.statement).mappings().all()
+        except Exception:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+            raise
+
+        entries = {row["id"]: self._entry(row) for row in rows if self.accepts(row)}
+        heap = list(entries.values())
+        heapq.heapify(heap)
+        with self._lock:
+            # Changes committed while the snapshot was read win over it
+            for change in self._pending:
+                self._apply(heap, entries, change)
+            self._heap, self._entries = heap, entries
+            self._loading = False
+            self._pending = []
+            self._changed()
+            self.ready = True
+        self._notify()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Index Verification Script
+Runs EXPLAIN on each hot query of the enhanced API and fails if any of them
+falls back to a sequential/full table scan.
+
+Usage:
+    DATABASE_URL=... python check_indexes.py
+
+Exit codes: 0 all queries use an index, 1 at least one table scan,
+2 unsupported database backend.
+"""
+
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime
+
+from database import engine
+from icu_beds import BED_BY_LOCATION, BEDS_HELD_BY
+from sessions import ACTIVE_SESSION_BY_USER, ACTIVE_SESSIONS_PAGE, STALE_SESSION_IDS
+from sla import BREACHES
+from enhanced_models import SLABreach
+from hot_queries import (
+    ARCHIVED_AUDIT_BY_BOOKING,
+    ARCHIVED_COMMENTS_BY_BOOKING,
+    ACTIVE_BY_TYPE,
+    ACTIVE_ICU_BY_MRN,
+    ACTIVE_OR_BY_MRN,
+    AUDIT_BY_BOOKING,
+    BOOKING_BY_ID_AND_TYPE,
+    COMMENTS_BY_BOOKING,
+    EXPORT_BY_TYPE_AND_RANGE,
+    OPEN_OR_BY_MRN,
+)
+
+# (name, statement, parameters) for every query on a hot path
+HOT_QUERIES = [
+    ("has_active_booking OR", ACTIVE_OR_BY_MRN, {"mrn": "000000"}),
+    ("has_active_booking ICU", ACTIVE_ICU_BY_MRN, {"mrn": "000000"}),
+    ("check-mrn OR", OPEN_OR_BY_MRN, {"mrn": "000000"}),
+    ("legacy OR list", ACTIVE_BY_TYPE, {"booking_type": "OR"}),
+    ("legacy ICU list", ACTIVE_BY_TYPE, {"booking_type": "ICU"}),
+    (
+        "OR export range",
+        EXPORT_BY_TYPE_AND_RANGE,
+        {
+            "booking_type": "OR",
+            "first_day": datetime(2025, 1, 1),
+            "last_day": datetime(2025, 1, 31, 23, 59, 59),
+        },
+    ),
+    ("booking by id", BOOKING_BY_ID_AND_TYPE, {"booking_id": 1, "booking_type": "OR"}),
+    ("comments by booking", COMMENTS_BY_BOOKING, {"booking_id": 1}),
+    ("audit log by booking", AUDIT_BY_BOOKING, {"booking_id": 1}),
+    ("archived comments by booking", ARCHIVED_COMMENTS_BY_BOOKING, {"booking_id": 1}),
+    ("archived audit log by booking", ARCHIVED_AUDIT_BY_BOOKING, {"booking_id": 1}),
+    ("session by user", ACTIVE_SESSION_BY_USER, {"user_name": "nobody"}),
+    ("active sessions page", ACTIVE_SESSIONS_PAGE, {"limit": 100, "offset": 0}),
+    ("idle session sweep", STALE_SESSION_IDS.limit(500), {"cutoff": datetime(2025, 1, 1)}),
+    ("ICU bed by unit and room", BED_BY_LOCATION, {"unit": "MICU", "room": "1"}),
+    ("ICU beds held by request", BEDS_HELD_BY, {"occupant": 1}),
+    ("SLA breaches by type", BREACHES.where(SLABreach.booking_type == "OR").limit(100), {}),
+]
+
+
+def _driver_sql(connection, stmt, params):
+    """Render a statement to driver SQL plus parameters in the driver's style."""
+    compiled = stmt.params(**params).compile(
+        dialect=connection.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    values = compiled.params
+    if compiled.positiontup:
+        return str(compiled), tuple(values[key] for key in compiled.positiontup)
+    return str(compiled), values
+
+
+def _sqlite_scans(connection, sql, args):
+    """Scans reported by EXPLAIN QUERY PLAN, plus the full plan text.
+
+    SQLite reports index seeks as SEARCH; SCAN means every row of the table
+    (or of an index, which is no better) is visited.
+    """
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, args).fetchall()
+    plan = [row[-1] for row in rows]
+    scans = [detail for detail in plan if detail.startswith("SCAN ")]
+    return scans, plan
+
+
+def _postgres_plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _postgres_plan_nodes(child)
+
+
+def _postgres_scans(connection, sql, args):
+    # Small dev tables make seq scans the cheapest plan even when an index
+    # applies; disabling them shows whether the planner *can* use an index.
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    raw = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql, args).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    nodes = list(_postgres_plan_nodes(plan[0]["Plan"]))
+    scans = [
+        f"Seq Scan on {node.get('Relation Name')}"
+        for node in nodes
+        if node["Node Type"] == "Seq Scan"
+    ]
+    summary = [
+        f"{node['Node Type']}"
+        + (f" using {node['Index Name']}" if "Index Name" in node else "")
+        + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+        for node in nodes
+    ]
+    return scans, summary
+
+
+EXPLAINERS = {
+    "sqlite": _sqlite_scans,
+    "postgresql": _postgres_scans,
+}
+
+
+def check_indexes() -> int:
+    explain = EXPLAINERS.get(engine.dialect.name)
+    if explain is None:
+        print(f"✗ EXPLAIN checks are not implemented for '{engine.dialect.name}'")
+        return 2
+
+    print(f"Checking hot query plans on {engine.dialect.name}...")
+    print("=" * 60)
+
+    failures = 0
+    with engine.connect() as connection:
+        for name, stmt, params in HOT_QUERIES:
+            sql, args = _driver_sql(connection, stmt, params)
+            with connection.begin():
+                scans, plan = explain(connection, sql, args)
+            if scans:
+                failures += 1
+                print(f"✗ {name}")
+            else:
+                print(f"✓ {name}")
+            for line in plan:
+                print(f"    {line}")
+
+    print("=" * 60)
+    if failures:
+        print(f"✗ {failures} hot query(ies) fall back to a table scan")
+        print("  Apply the model indexes (see enhanced_models.py) and re-run.")
+        return 1
+    print("✓ All hot queries use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(check_indexes())
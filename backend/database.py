@@ -1,8 +1,18 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
+from db_metrics import PoolMetrics, StatementCacheMetrics
+from sqlite_profile import (
+    apply_sqlite_profile,
+    is_file_sqlite,
+    sqlite_pool_options,
+    sqlite_pragmas,
+)
+
 # =============================================================================
 # DATABASE CONFIGURATION - TO BE CONFIGURED BY IT DEPARTMENT
 # =============================================================================
@@ -31,14 +41,161 @@ if not DATABASE_URL:
         + "="*70
     )
 
-engine = create_engine(DATABASE_URL)
+# =============================================================================
+# CONNECTION POOL CONFIGURATION (Optional)
+# =============================================================================
+#   DB_POOL_SIZE      Connections kept open per worker process (default: 10)
+#   DB_MAX_OVERFLOW   Extra connections allowed during bursts (default: 20)
+#   DB_POOL_TIMEOUT   Seconds a request waits for a free connection (default: 30)
+#   DB_POOL_RECYCLE   Seconds before a connection is replaced; keep this below
+#                     the server/firewall idle timeout, -1 disables (default: 1800)
+#   DB_POOL_PRE_PING  Test each connection on checkout (default: true)
+#   DB_POOL_WARMUP    Connections opened at startup (default: DB_POOL_SIZE)
+#   DB_QUERY_CACHE_SIZE  Compiled SQL statements cached per engine (default: 500)
+#
+# Sync endpoints run on the FastAPI threadpool (40 threads by default) and each
+# in-flight request holds one connection, so DB_POOL_SIZE + DB_MAX_OVERFLOW
+# should be at least the threadpool size. Multiply by the number of workers
+# when checking against the database's max_connections.
+# =============================================================================
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+DB_POOL_WARMUP = env_int("DB_POOL_WARMUP", DB_POOL_SIZE)
+DB_QUERY_CACHE_SIZE = env_int("DB_QUERY_CACHE_SIZE", 500)
+
+# =============================================================================
+# SQLITE PROFILE (file databases only, see sqlite_profile.py)
+# =============================================================================
+#   SQLITE_PROFILE           Single writer + pooled readers + pragmas (default: true)
+#   SQLITE_BUSY_TIMEOUT_MS   Wait for a lock held by another process (default: 5000)
+#   SQLITE_SYNCHRONOUS       NORMAL is durable in WAL mode except on power loss
+#                            (default: NORMAL)
+#   SQLITE_MMAP_SIZE         Bytes of the file memory-mapped for reads (default: 256 MiB)
+#   SQLITE_CACHE_SIZE        Page cache per connection; negative = KiB (default: -16384)
+# =============================================================================
+
+SQLITE_PROFILE = env_bool("SQLITE_PROFILE", True)
+SQLITE_PRAGMAS = sqlite_pragmas(
+    busy_timeout_ms=env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+    synchronous=os.getenv("SQLITE_SYNCHRONOUS") or "NORMAL",
+    mmap_size=env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+    cache_size=env_int("SQLITE_CACHE_SIZE", -16384),
+)
+
+
+def use_sqlite_profile(url: str) -> bool:
+    return SQLITE_PROFILE and is_file_sqlite(url)
+
+
+def engine_options(url: str, writer: bool = True) -> dict:
+    options = {
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "query_cache_size": DB_QUERY_CACHE_SIZE,
+    }
+    if use_sqlite_profile(url):
+        options.update(
+            sqlite_pool_options(
+                url, writer, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+            )
+        )
+    # Otherwise SQLite uses a file or in-memory pool where sizing does not apply
+    elif make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def configure_engine(target_engine, url: str, writer: bool = True):
+    """Apply per-connection settings (the SQLite profile) to a new engine."""
+    if use_sqlite_profile(url):
+        apply_sqlite_profile(target_engine, SQLITE_PRAGMAS, writer=writer)
+    return target_engine
+
+
+engine = configure_engine(
+    create_engine(DATABASE_URL, **engine_options(DATABASE_URL)), DATABASE_URL
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+pool_metrics = PoolMetrics()
+pool_metrics.attach(engine)
+statement_cache_metrics = StatementCacheMetrics()
+statement_cache_metrics.attach(engine)
+
+# =============================================================================
+# READ REPLICA (Optional)
+# =============================================================================
+# DATABASE_READ_URL points list/detail/stats/export/audit GET endpoints at a
+# read replica. Writes and read-your-writes checks (duplicate MRN checks,
+# post-write refresh) always use DATABASE_URL. When unset, reads share the
+# primary engine, except with the SQLite profile where reads get their own
+# pool of query_only connections to the same file.
+# =============================================================================
+
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+_read_url = DATABASE_READ_URL or (
+    DATABASE_URL if use_sqlite_profile(DATABASE_URL) else None
+)
+
+if _read_url:
+    read_engine = configure_engine(
+        create_engine(_read_url, **engine_options(_read_url, writer=False)),
+        _read_url,
+        writer=False,
+    )
+    read_pool_metrics = PoolMetrics()
+    read_pool_metrics.attach(read_engine)
+    read_statement_cache_metrics = StatementCacheMetrics()
+    read_statement_cache_metrics.attach(read_engine)
+else:
+    read_engine = engine
+    read_pool_metrics = pool_metrics
+    read_statement_cache_metrics = statement_cache_metrics
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 def get_db():
+    # The connection is checked out on first use, not here: with the SQLite
+    # profile a writer session holds the write lock while it has one
     db = SessionLocal()
     try:
         yield db
+    except PoolTimeoutError:
+        pool_metrics.record_timeout()
+        raise
+    finally:
+        db.close()
+
+# Read-only dependency for GET endpoints; bound to DATABASE_READ_URL when set
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    except PoolTimeoutError:
+        read_pool_metrics.record_timeout()
+        raise
     finally:
         db.close()
\ No newline at end of file
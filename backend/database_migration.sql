@@ -256,6 +256,14 @@ CREATE INDEX IF NOT EXISTS idx_bookings_room ON bookings(room) WHERE room IS NOT
 CREATE INDEX IF NOT EXISTS idx_comments_booking_id ON booking_comments(booking_id);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_booking_id ON audit_logs(booking_id);
 
+-- Hot query indexes (mirrors the Index() declarations in enhanced_models.py)
+-- Verify with: python check_indexes.py
+CREATE INDEX IF NOT EXISTS ix_bookings_active_mrn_type ON bookings(mrn, type_of_booking) WHERE is_active = true;
+CREATE INDEX IF NOT EXISTS ix_bookings_active_type_created ON bookings(type_of_booking, created_at) WHERE is_active = true;
+CREATE INDEX IF NOT EXISTS ix_bookings_type_created ON bookings(type_of_booking, created_at);
+CREATE INDEX IF NOT EXISTS ix_booking_comments_booking_created ON booking_comments(booking_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_audit_logs_booking_timestamp ON audit_logs(booking_id, timestamp);
+
 -- SECTION 6: Insert sample data (optional - only for testing)
 -- ============================================================================
 
@@ -0,0 +1,235 @@
+import threading
+import time
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.orm import Session
+
+_CHECKOUT_STARTED = "pool_checkout_started"
+
+# Engine -> its PoolMetrics, for the session events below
+_metrics_by_engine = weakref.WeakKeyDictionary()
+
+
+class PoolMetrics:
+    """Connection pool counters collected from SQLAlchemy engine/pool events.
+
+    Counters are updated under a single lock; every operation is a handful of
+    integer/float additions so the overhead per checkout is negligible.
+
+    Nothing checks a connection out early: the wait of a session is timed from
+    its first statement (autobegin) until its connection has begun, which
+    covers queueing on an exhausted pool plus any new connection, pre-ping and
+    BEGIN work. Checkout/checkin pool events time how long connections are
+    held. Timeouts are counted by the request dependencies (``record_timeout``).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.holds = 0
+        self.hold_time_total = 0.0
+        self.hold_time_max = 0.0
+        self.connects = 0
+        self.connect_time_total = 0.0
+        self.connect_time_max = 0.0
+        self.invalidations = 0
+
+    def attach(self, engine):
+        """Register the event listeners on an engine (sync, or an AsyncEngine.sync_engine)."""
+        _metrics_by_engine[engine] = self
+        event.listen(engine, "do_connect", self._on_do_connect)
+        event.listen(engine.pool, "connect", self._on_connect)
+        event.listen(engine.pool, "checkout", self._on_checkout)
+        event.listen(engine.pool, "checkin", self._on_checkin)
+        event.listen(engine.pool, "invalidate", self._on_invalidate)
+
+    def _on_do_connect(self, dialect, conn_rec, cargs, cparams):
+        self._local.connect_started = time.perf_counter()
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        started = getattr(self._local, "connect_started", None)
+        if started is None:
+            return
+        self._local.connect_started = None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.connects += 1
+            self.connect_time_total += elapsed
+            if elapsed > self.connect_time_max:
+                self.connect_time_max = elapsed
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None) if connection_record else None
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.holds += 1
+            self.hold_time_total += elapsed
+            if elapsed > self.hold_time_max:
+                self.hold_time_max = elapsed
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_checkout(self, elapsed: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time_total += elapsed
+            if elapsed > self.wait_time_max:
+                self.wait_time_max = elapsed
+
+    def record_timeout(self):
+        with self._lock:
+            self.checkout_timeouts += 1
+
+
+    def snapshot(self, engine):
+        """Current pool gauges plus the accumulated counters."""
+        pool = engine.pool
+        gauges = {"pool_class": type(pool).__name__}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, name, None)
+            gauges[name] = method() if callable(method) else None
+        gauges["max_overflow"] = getattr(pool, "_max_overflow", None)
+        gauges["timeout"] = getattr(pool, "_timeout", None)
+
+        with self._lock:
+            checkouts = self.checkouts
+            connects = self.connects
+            return {
+                **gauges,
+                "checkouts": checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "wait_ms_avg": round(self.wait_time_total / checkouts * 1000, 3)
+                if checkouts
+                else 0.0,
+                "wait_ms_max": round(self.wait_time_max * 1000, 3),
+                "hold_ms_avg": round(self.hold_time_total / self.holds * 1000, 3)
+                if self.holds
+                else 0.0,
+                "hold_ms_max": round(self.hold_time_max * 1000, 3),
+                "connects": connects,
+                "connect_ms_avg": round(self.connect_time_total / connects * 1000, 3)
+                if connects
+                else 0.0,
+                "connect_ms_max": round(self.connect_time_max * 1000, 3),
+                "invalidations": self.invalidations,
+            }
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _session_checkout_started(session, transaction):
+    if transaction.parent is None:
+        session.info[_CHECKOUT_STARTED] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_begin")
+def _session_checked_out(session, transaction, connection):
+    started = session.info.pop(_CHECKOUT_STARTED, None)
+    metrics = _metrics_by_engine.get(connection.engine)
+    if started is not None and metrics is not None:
+        metrics.record_checkout(time.perf_counter() - started)
+
+
+def statement_key(statement: str, length: int = 160) -> str:
+    """Short, readable identifier for a SQL statement shape.
+
+    Column lists make every SELECT on a table look alike, so SELECTs are keyed
+    on their FROM clause onwards.
+    """
+    sql = " ".join(statement.split())
+    head, sep, tail = sql.partition(" FROM ")
+    if sep and head.upper().startswith("SELECT"):
+        sql = "SELECT ... FROM " + tail
+    return sql[:length]
+
+
+class StatementCacheMetrics:
+    """Hit/miss counts for the engine's compiled statement cache.
+
+    A miss means SQLAlchemy compiled the statement to SQL for that execution.
+    Misses are also counted per statement shape so a hot path that keeps
+    compiling is easy to spot.
+    """
+
+    MAX_TRACKED_STATEMENTS = 200
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self.misses_by_statement = {}
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        cache_hit = getattr(context, "cache_hit", None)
+        with self._lock:
+            if cache_hit is CACHE_HIT:
+                self.hits += 1
+            elif cache_hit is CACHE_MISS:
+                self.misses += 1
+                key = statement_key(statement)
+                if (
+                    key in self.misses_by_statement
+                    or len(self.misses_by_statement) < self.MAX_TRACKED_STATEMENTS
+                ):
+                    self.misses_by_statement[key] = (
+                        self.misses_by_statement.get(key, 0) + 1
+                    )
+            else:
+                # Driver-level SQL, DDL and other statements without a cache key
+                self.uncached += 1
+
+    def snapshot(self, engine):
+        cache = getattr(engine, "_compiled_cache", None)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "uncached": self.uncached,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "cache_entries": len(cache) if cache is not None else None,
+                "cache_capacity": getattr(cache, "capacity", None),
+                "top_misses": dict(
+                    sorted(
+                        self.misses_by_statement.items(),
+                        key=lambda item: item[1],
+                        reverse=True,
+                    )[:10]
+                ),
+            }
+
+
+def warm_up_pool(engine, connections: int) -> int:
+    """Open up to ``connections`` connections so the first requests skip connect cost.
+
+    All connections are held at once before being returned, otherwise the pool
+    would keep handing back the same one. Never opens more than the pool keeps
+    (e.g. the single SQLite writer connection). Returns the number opened.
+    """
+    pool_size = getattr(engine.pool, "size", None)
+    if callable(pool_size):
+        connections = min(connections, pool_size())
+    opened = []
+    try:
+        for _ in range(max(connections, 0)):
+            opened.append(engine.connect())
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
@@ -1,20 +1,138 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import text
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import logging
-import bcrypt
 import json
 import csv
 import io
+import time
 from calendar import monthrange
+from contextlib import asynccontextmanager
+from functools import partial
+
+from anyio import to_thread
+
+from database import (
+    SessionLocal,
+    ReadSessionLocal,
+    engine,
+    read_engine,
+    DATABASE_READ_URL,
+    pool_metrics,
+    read_pool_metrics,
+    statement_cache_metrics,
+    read_statement_cache_metrics,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_WARMUP,
+    get_db,
+    get_read_db,
+)
+from archive import ARCHIVE_INTERVAL_SECONDS, archive_closed_bookings
+from background import PeriodicTask
+from db_metrics import warm_up_pool
+from forecast import MAX_HORIZON_HOURS, forecast_cache
+from http_metrics import METRICS_ENABLED, MetricsMiddleware, http_metrics
+from icu_allocation import (
+    ICU_ALLOCATION_INTERVAL_SECONDS,
+    ICU_AUTO_ALLOCATE,
+    allocate_free_beds,
+    pending_queue,
+    proposals,
+)
+from icu_beds import (
+    ALL_BEDS,
+    BED_BY_LOCATION,
+    FREE_BEDS,
+    ICU_BED_RECONCILE_SECONDS,
+    ICU_RELEASE_OUTCOMES,
+    BedTakenError,
+    UnknownBedError,
+    add_bed,
+    bed_occupancy,
+    occupy_bed,
+    release_beds,
+    set_service_state,
+)
+from migrations import ensure_schema_current
+from or_queue import OR_QUEUE_RECONCILE_SECONDS, or_queue
+from mrn_index import (
+    MRN_INDEX_RECONCILE_SECONDS,
+    SUMMARY_COLUMNS,
+    active_mrn_index,
+    icu_summary,
+    or_summary,
+)
+from query_stats import SQL_STATS_ENABLED, QueryStatsMiddleware, instrument_engine
+from search import search_bookings
+from sla import (
+    BREACH_COUNT,
+    BREACHES,
+    SLA_DETECTION,
+    SLA_RECONCILE_SECONDS,
+    sla_detector,
+)
+from slow_queries import SLOW_QUERY_LOG, SlowQueryMiddleware, slow_query_log
+from sessions import (
+    ACTIVE_SESSIONS_COUNT,
+    ACTIVE_SESSIONS_PAGE,
+    SESSION_SWEEP_INTERVAL_SECONDS,
+    expire_idle_sessions,
+    touch_session,
+)
+from staff_auth import (
+    STAFF_PASSWORD_KEY,
+    LegacyPasswordError,
+    StaffAuthRejected,
+    admit,
+    check_password,
+    check_token,
+    client_address,
+    hash_password,
+    issue_token,
+    metrics as staff_auth_metrics,
+    settings_cache,
+)
+from typeahead import (
+    TYPEAHEAD_CACHE_PREFIX_LEN,
+    TYPEAHEAD_CACHE_SECONDS,
+    TYPEAHEAD_REFRESH_SECONDS,
+    TypeaheadField,
+    typeahead,
+)
+from enhanced_models import (
+    Base,
+    Booking,
+    BookingComment,
+    AuditLog,
+    SystemSetting,
+    ICUBed,
+    ICUBedState,
+    SLABreach,
+    ArchivedBooking,
+    ArchivedBookingComment,
+)
+from hot_queries import (
+    ACTIVE_BY_MRN,
+    ACTIVE_BY_TYPE,
+    ACTIVE_ICU_BY_MRN,
+    EXPORT_BY_TYPE_AND_RANGE,
+    OPEN_OR_BY_MRN,
+    STATS_SUMMARY,
+    audit_statement,
+    booking_statement,
+    comments_statement,
+    stats_summary,
+)
 
-from database import SessionLocal, engine
-from enhanced_models import Base, Booking, BookingComment, UserSession, AuditLog, SystemSetting
+logger = logging.getLogger(__name__)
 
 # Riyadh timezone (GMT+3)
 RIYADH_TZ = ZoneInfo("Asia/Riyadh")
@@ -37,10 +155,124 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One schema_version read; schema changes are applied by `python migrate.py`
+    await run_in_threadpool(ensure_schema_current, engine, "enhanced")
+
+    # Open pooled connections up front so the first requests skip connect cost
+    opened = await run_in_threadpool(warm_up_pool, engine, DB_POOL_WARMUP)
+    logger.info("Database pool warmed up with %d connection(s)", opened)
+    if read_engine is not engine:
+        opened = await run_in_threadpool(warm_up_pool, read_engine, DB_POOL_WARMUP)
+        logger.info("Read pool warmed up with %d connection(s)", opened)
+
+    threadpool_size = to_thread.current_default_thread_limiter().total_tokens
+    if engine.dialect.name != "sqlite":
+        if DB_POOL_SIZE + DB_MAX_OVERFLOW < threadpool_size:
+            logger.warning(
+                "DB pool capacity (%d + %d overflow) is below the threadpool size (%d); "
+                "requests may stall waiting for a connection",
+                DB_POOL_SIZE,
+                DB_MAX_OVERFLOW,
+                threadpool_size,
+            )
+
+    # Active-MRN index for the check-mrn endpoints, read from the primary
+    await run_in_threadpool(active_mrn_index.load, SessionLocal)
+    logger.info(
+        "Active MRN index loaded with %d booking(s)",
+        active_mrn_index.snapshot()["active_bookings"],
+    )
+
+    await run_in_threadpool(bed_occupancy.load, SessionLocal)
+    await run_in_threadpool(pending_queue.load, SessionLocal)
+    await run_in_threadpool(or_queue.load, SessionLocal)
+
+    tasks = []
+    if ICU_BED_RECONCILE_SECONDS > 0:
+        for name, index in (
+            ("icu_bed_reconcile", bed_occupancy),
+            ("icu_queue_reconcile", pending_queue),
+        ):
+            tasks.append(
+                PeriodicTask(
+                    name,
+                    partial(index.load, SessionLocal),
+                    ICU_BED_RECONCILE_SECONDS,
+                    initial_delay=ICU_BED_RECONCILE_SECONDS,
+                )
+            )
+    if ICU_AUTO_ALLOCATE and ICU_ALLOCATION_INTERVAL_SECONDS > 0:
+        tasks.append(
+            PeriodicTask(
+                "icu_auto_allocate",
+                partial(allocate_free_beds, SessionLocal),
+                ICU_ALLOCATION_INTERVAL_SECONDS,
+            )
+        )
+    if OR_QUEUE_RECONCILE_SECONDS > 0:
+        tasks.append(
+            PeriodicTask(
+                "or_queue_reconcile",
+                partial(or_queue.load, SessionLocal),
+                OR_QUEUE_RECONCILE_SECONDS,
+                initial_delay=OR_QUEUE_RECONCILE_SECONDS,
+            )
+        )
+    if SLA_DETECTION:
+        await run_in_threadpool(sla_detector.load, SessionLocal)
+        sla_detector.start(SessionLocal)
+        if SLA_RECONCILE_SECONDS > 0:
+            tasks.append(
+                PeriodicTask(
+                    "sla_reconcile",
+                    partial(sla_detector.load, SessionLocal),
+                    SLA_RECONCILE_SECONDS,
+                    initial_delay=SLA_RECONCILE_SECONDS,
+                )
+            )
+    if MRN_INDEX_RECONCILE_SECONDS > 0:
+        tasks.append(
+            PeriodicTask(
+                "mrn_index_reconcile",
+                partial(active_mrn_index.load, SessionLocal),
+                MRN_INDEX_RECONCILE_SECONDS,
+                initial_delay=MRN_INDEX_RECONCILE_SECONDS,
+            )
+        )
+    if ARCHIVE_INTERVAL_SECONDS > 0:
+        tasks.append(
+            PeriodicTask(
+                "archive_closed_bookings", archive_closed_bookings, ARCHIVE_INTERVAL_SECONDS
+            )
+        )
+    if SESSION_SWEEP_INTERVAL_SECONDS > 0:
+        tasks.append(
+            PeriodicTask(
+                "expire_idle_sessions", expire_idle_sessions, SESSION_SWEEP_INTERVAL_SECONDS
+            )
+        )
+    if read_engine.dialect.name != "postgresql" and TYPEAHEAD_REFRESH_SECONDS > 0:
+        # In-memory typeahead index: built now, then refreshed periodically
+        tasks.append(
+            PeriodicTask(
+                "typeahead_refresh",
+                partial(typeahead.rebuild, ReadSessionLocal),
+                TYPEAHEAD_REFRESH_SECONDS,
+            )
+        )
+    for task in tasks:
+        task.start()
+    yield
+    for task in tasks:
+        await task.stop()
+    await sla_detector.stop()
+
 
-app = FastAPI(title="Enhanced OR/ICU Booking System", version="2.0.0")
+app = FastAPI(
+    title="Enhanced OR/ICU Booking System", version="2.0.0", lifespan=lifespan
+)
 
 # CORS middleware
 app.add_middleware(
@@ -49,16 +281,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable by browser clients (Flutter web)
+    expose_headers=["X-Total-Count"],
 )
 
-
-# Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Per-request SQL counts in a Server-Timing header (query_stats.py)
+if SQL_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+    instrument_engine(engine)
+    if read_engine is not engine:
+        instrument_engine(read_engine)
+
+# Slow statements with redacted parameters and plans (slow_queries.py)
+if SLOW_QUERY_LOG:
+    app.add_middleware(SlowQueryMiddleware)
+    slow_query_log.attach(engine)
+    if read_engine is not engine:
+        slow_query_log.attach(read_engine)
+
+# Request metrics for /metrics; added last so it is outermost and also sees
+# CORS preflights and error responses
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, metrics=http_metrics)
+http_metrics.add_pool("primary", engine, pool_metrics)
+if read_engine is not engine:
+    http_metrics.add_pool(
+        "replica" if DATABASE_READ_URL else "readers", read_engine, read_pool_metrics
+    )
 
 
 # Pydantic models for API
@@ -157,6 +406,40 @@ class UserSessionCreate(BaseModel):
     user_role: str
 
 
+class SearchHit(BaseModel):
+    id: int
+    type_of_booking: Optional[str] = None
+    mrn: Optional[str] = None
+    patient_name: Optional[str] = None
+    procedure: Optional[str] = None
+    indication: Optional[str] = None
+    urgency: Optional[str] = None
+    status: Optional[str] = None
+    outcome: Optional[str] = None
+    created_at: Optional[datetime] = None
+    rank: float
+    matched_in: List[str]  # "booking" and/or "comments"
+
+
+class TypeaheadSuggestion(BaseModel):
+    value: str
+    count: int  # bookings using this value
+
+
+class TypeaheadResponse(BaseModel):
+    field: str
+    query: str
+    suggestions: List[TypeaheadSuggestion]
+
+
+class SearchResponse(BaseModel):
+    query: str
+    limit: int
+    offset: int
+    has_more: bool
+    results: List[SearchHit]
+
+
 # Legacy compatibility schemas (v1 mobile client)
 class LegacyORBookingCreate(BaseModel):
     mrn: str
@@ -235,6 +518,12 @@ class MRNCheckResponse(BaseModel):
     active_booking: Optional[dict] = None
 
 
+class CombinedMRNCheckResponse(BaseModel):
+    mrn: str
+    OR: MRNCheckResponse
+    ICU: MRNCheckResponse
+
+
 class LegacyStatusUpdate(BaseModel):
     status: str
 
@@ -249,6 +538,128 @@ class ICUConfirmUpdate(BaseModel):
     room: str
 
 
+class ICUBedCreate(BaseModel):
+    unit: str
+    room: str
+
+
+class ICUBedStateUpdate(BaseModel):
+    state: ICUBedState
+
+
+class ICUBedResponse(BaseModel):
+    id: int
+    unit: str
+    room: str
+    state: str
+    booking_id: Optional[int] = None
+
+
+class ICUFreeBed(BaseModel):
+    id: int
+    unit: str
+    room: str
+
+
+class ICUFreeBedsResponse(BaseModel):
+    unit: Optional[str] = None
+    count: int
+    beds: List[ICUFreeBed]
+
+
+class AllocationRequest(BaseModel):
+    id: int
+    mrn: Optional[str] = None
+    patient_name: Optional[str] = None
+    urgency: Optional[str] = None
+    requested_date: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    waiting_minutes: Optional[int] = None
+
+
+class AllocationProposal(BaseModel):
+    bed: ICUFreeBed
+    request: AllocationRequest
+
+
+class AllocationPreviewResponse(BaseModel):
+    auto_allocate: bool
+    queue_length: int
+    free_beds: int
+    proposals: List[AllocationProposal]
+    queue: List[AllocationRequest]
+
+
+class ForecastPoint(BaseModel):
+    hour: int
+    mean: float
+    p10: float
+    p50: float
+    p90: float
+    p_full: Optional[float] = None
+
+
+class UnitForecast(BaseModel):
+    unit: str
+    beds: Optional[int] = None
+    occupied_now: int
+    arrivals_per_day: float
+    expected_arrivals: float
+    mean_stay_hours: float
+    stay_source: str
+    peak_p90: float
+    p_full_any: Optional[float] = None
+    points: List[ForecastPoint]
+
+
+class ICUForecastResponse(BaseModel):
+    generated_at: datetime
+    horizon_hours: int
+    runs: int
+    history_days: float
+    pending_requests: Optional[int] = None
+    query_ms: float
+    simulation_ms: float
+    units: List[UnitForecast]
+
+
+class ORQueueEntry(BaseModel):
+    position: int
+    id: int
+    mrn: Optional[str] = None
+    patient_name: Optional[str] = None
+    procedure: Optional[str] = None
+    urgency: Optional[str] = None
+    status: Optional[str] = None
+    consultant: Optional[str] = None
+    created_at: Optional[datetime] = None
+    deadline: datetime
+    slack_minutes: int
+    overdue: bool
+
+
+class ORQueueResponse(BaseModel):
+    version: int
+    total: int
+    offset: int
+    cases: List[ORQueueEntry]
+
+
+class SLABreachResponse(BaseModel):
+    id: int
+    booking_id: int
+    booking_type: str
+    mrn: Optional[str] = None
+    urgency: Optional[str] = None
+    status: Optional[str] = None
+    booking_created_at: Optional[datetime] = None
+    deadline: datetime
+    detected_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Helper function to log changes
 def log_booking_change(
     db: Session,
@@ -342,12 +753,18 @@ def _comment_to_legacy(comment: BookingComment) -> LegacyCommentResponse:
 
 
 def _get_booking_or_404(
-    db: Session, booking_id: int, expected_type: Optional[str] = None
+    db: Session,
+    booking_id: int,
+    expected_type: Optional[str] = None,
+    include_archived: bool = False,
 ) -> Booking:
-    query = db.query(Booking).filter(Booking.id == booking_id)
-    if expected_type:
-        query = query.filter(Booking.type_of_booking == expected_type)
-    booking = query.first()
+    """Booking by id; read endpoints pass include_archived to also find
+    bookings moved to the archive (returned as read-only ArchivedBooking)."""
+    stmt, params = booking_statement(booking_id, expected_type)
+    booking = db.execute(stmt, params).scalars().first()
+    if booking is None and include_archived:
+        stmt, params = booking_statement(booking_id, expected_type, archived=True)
+        booking = db.execute(stmt, params).scalars().first()
     if booking is None:
         raise HTTPException(status_code=404, detail="Booking not found")
     return booking
@@ -365,31 +782,10 @@ def has_active_booking(db: Session, mrn: str, booking_type: str):
     if not mrn:
         return None  # cannot check duplicates without MRN
 
-    if booking_type == "OR":
-        return (
-            db.query(Booking)
-            .filter(
-                Booking.mrn == mrn,
-                Booking.type_of_booking == "OR",
-                Booking.is_active == True,
-                Booking.outcome.is_(None),
-            )
-            .first()
-        )
-
-    if booking_type == "ICU":
-        return (
-            db.query(Booking)
-            .filter(
-                Booking.mrn == mrn,
-                Booking.type_of_booking == "ICU",
-                Booking.is_active == True,
-                Booking.status.in_(["pending", "no_bed_available"]),
-            )
-            .first()
-        )
-
-    return None
+    stmt = ACTIVE_BY_MRN.get(booking_type)
+    if stmt is None:
+        return None
+    return db.execute(stmt, {"mrn": mrn}).scalars().first()
 
 
 # NEW: Standardized duplicate error builder
@@ -418,6 +814,77 @@ async def root():
     return {"message": "Enhanced OR/ICU Booking System API", "version": "2.0.0"}
 
 
+def _ping_database(target_engine) -> float:
+    started = time.perf_counter()
+    with target_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    return (time.perf_counter() - started) * 1000
+
+
+# Engines reported by /health/db: name -> (engine, PoolMetrics,
+# StatementCacheMetrics, async ping returning ms). async_main adds its own.
+database_health_targets = {}
+
+
+def add_health_target(name, target_engine, metrics, cache_metrics, ping=None):
+    if ping is None:
+        ping = partial(run_in_threadpool, _ping_database, target_engine)
+    database_health_targets[name] = (target_engine, metrics, cache_metrics, ping)
+
+
+add_health_target("primary", engine, pool_metrics, statement_cache_metrics)
+if read_engine is not engine:
+    # A separate read engine is either a replica or the SQLite reader pool
+    add_health_target(
+        "replica" if DATABASE_READ_URL else "readers",
+        read_engine,
+        read_pool_metrics,
+        read_statement_cache_metrics,
+    )
+
+
+@app.get("/health/db")
+async def database_health():
+    """Database round trip check plus connection pool metrics"""
+    limiter = to_thread.current_default_thread_limiter()
+    status_code = 200
+    databases = {}
+    for name, (target_engine, metrics, cache_metrics, ping) in database_health_targets.items():
+        try:
+            latency_ms = await ping()
+            databases[name] = {"status": "ok", "latency_ms": round(latency_ms, 3)}
+        except Exception as exc:
+            logger.exception("Database health check failed for %s", name)
+            databases[name] = {"status": "unavailable", "error": exc.__class__.__name__}
+            status_code = 503
+        databases[name]["pool"] = metrics.snapshot(target_engine)
+        databases[name]["statement_cache"] = cache_metrics.snapshot(target_engine)
+
+    return JSONResponse(
+        status_code=status_code,
+        content={
+            "status": "ok" if status_code == 200 else "unavailable",
+            **databases,
+            "threadpool": {
+                "total": limiter.total_tokens,
+                "borrowed": limiter.borrowed_tokens,
+            },
+        },
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Request counters, latency/size histograms and pool gauges (Prometheus text)"""
+    return Response(http_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/auth")
+async def staff_auth_health():
+    """Staff password admission control: rejections and bcrypt queue times"""
+    return staff_auth_metrics.snapshot()
+
+
 # Booking endpoints
 @app.post("/bookings/", response_model=BookingResponse)
 def create_booking(booking: BookingCreate, db: Session = Depends(get_db)):
@@ -456,7 +923,7 @@ def get_bookings(
     type_filter: Optional[str] = None,
     status_filter: Optional[str] = None,
     active_only: bool = True,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     query = db.query(Booking)
 
@@ -474,10 +941,8 @@ def get_bookings(
 
 
 @app.get("/bookings/{booking_id}", response_model=BookingResponse)
-def get_booking(booking_id: int, db: Session = Depends(get_db)):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if booking is None:
-        raise HTTPException(status_code=404, detail="Booking not found")
+def get_booking(booking_id: int, db: Session = Depends(get_read_db)):
+    booking = _get_booking_or_404(db, booking_id, include_archived=True)
     return booking
 
 
@@ -485,9 +950,7 @@ def get_booking(booking_id: int, db: Session = Depends(get_db)):
 def update_booking(
     booking_id: int, booking_update: BookingUpdate, db: Session = Depends(get_db)
 ):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if booking is None:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    booking = _get_booking_or_404(db, booking_id)
 
     # Track changes for audit log
     changes = []
@@ -541,12 +1004,12 @@ def soft_delete_booking(
     deleted_by_role: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if booking is None:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    booking = _get_booking_or_404(db, booking_id)
 
     setattr(booking, "is_active", False)
     setattr(booking, "last_updated_at", now_riyadh())
+    if booking.type_of_booking == "ICU":
+        release_beds(db, booking_id)
     db.commit()
 
     # Log deletion
@@ -569,9 +1032,7 @@ def add_comment(
     booking_id: int, comment: CommentCreate, db: Session = Depends(get_db)
 ):
     # Verify booking exists
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if booking is None:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    booking = _get_booking_or_404(db, booking_id)
 
     db_comment = BookingComment(
         booking_id=booking_id,
@@ -598,81 +1059,125 @@ def add_comment(
 
 @app.get("/bookings/{booking_id}/comments/", response_model=List[CommentResponse])
 def get_comments(
-    booking_id: int, include_internal: bool = False, db: Session = Depends(get_db)
+    booking_id: int, include_internal: bool = False, db: Session = Depends(get_read_db)
 ):
-    query = db.query(BookingComment).filter(BookingComment.booking_id == booking_id)
+    def thread(model):
+        query = db.query(model).filter(model.booking_id == booking_id)
+        if not include_internal:
+            query = query.filter(model.is_internal == False)
+        return query.order_by(model.created_at.desc()).all()
 
-    if not include_internal:
-        query = query.filter(BookingComment.is_internal == False)
-
-    comments = query.order_by(BookingComment.created_at.desc()).all()
-    return comments
+    # Comments of an archived booking live in the archive table
+    return thread(BookingComment) or thread(ArchivedBookingComment)
 
 
 # Legacy compatibility endpoints (/api/*) used by the Flutter v1 client
 
 # MRN Validation Endpoints
+# Answered from the in-process active-MRN index (mrn_index.py); the database
+# is only read until the index has loaded. Creates still check the database.
+MRN_CHECKS = {
+    "OR": (OPEN_OR_BY_MRN, or_summary),
+    "ICU": (ACTIVE_ICU_BY_MRN, icu_summary),
+}
+
+
+def _check_mrn_in_db(mrn: str, booking_type: str) -> MRNCheckResponse:
+    stmt, summary = MRN_CHECKS[booking_type]
+    with SessionLocal() as db:
+        # Just the summarised columns, as the same mapping rows the index loads
+        stmt = stmt.with_only_columns(*SUMMARY_COLUMNS)
+        booking = db.execute(stmt, {"mrn": mrn}).mappings().first()
+        if booking:
+            return MRNCheckResponse(has_active=True, active_booking=summary(booking))
+    return MRNCheckResponse(has_active=False)
+
+
+async def _check_mrn(mrn: str, booking_type: str) -> MRNCheckResponse:
+    if not active_mrn_index.ready:
+        return await run_in_threadpool(_check_mrn_in_db, mrn, booking_type)
+    summary = active_mrn_index.lookup(mrn, booking_type)
+    return MRNCheckResponse(has_active=summary is not None, active_booking=summary)
+
+
 @app.get("/api/check-mrn/or/{mrn}", response_model=MRNCheckResponse)
-def check_or_mrn(mrn: str, db: Session = Depends(get_db)):
+async def check_or_mrn(mrn: str):
     """Check if MRN has an active OR booking"""
-    active_booking = (
-        db.query(Booking)
-        .filter(
-            Booking.mrn == mrn,
-            Booking.type_of_booking == "OR",
-            Booking.is_active == True,
-            # Active if outcome is NULL or NOT in completed/cancelled states
-            ~Booking.outcome.in_(['cancelled', 'executed', 'OR Done', 'completed']) | (Booking.outcome == None)
-        )
-        .first()
-    )
-    
-    if active_booking:
-        return MRNCheckResponse(
-            has_active=True,
-            active_booking={
-                "id": active_booking.id,
-                "patient_name": active_booking.patient_name,
-                "procedure": active_booking.procedure,
-                "status": active_booking.status,
-                "outcome": active_booking.outcome,
-                "urgency": active_booking.urgency,
-                "created_at": active_booking.created_at.isoformat() if active_booking.created_at else None,
-                "requested_date": active_booking.requested_date.isoformat() if active_booking.requested_date else None
-            }
-        )
-    return MRNCheckResponse(has_active=False)
+    # Active if outcome is NULL or NOT in completed/cancelled states
+    return await _check_mrn(mrn, "OR")
 
 
 @app.get("/api/check-mrn/icu/{mrn}", response_model=MRNCheckResponse)
-def check_icu_mrn(mrn: str, db: Session = Depends(get_db)):
+async def check_icu_mrn(mrn: str):
     """Check if MRN has an active ICU request"""
-    active_request = (
-        db.query(Booking)
-        .filter(
-            Booking.mrn == mrn,
-            Booking.type_of_booking == "ICU",
-            Booking.is_active == True,
-            # Active if status is 'pending' or 'no_bed_available'
-            Booking.status.in_(['pending', 'no_bed_available'])
-        )
-        .first()
+    # Active if status is 'pending' or 'no_bed_available'
+    return await _check_mrn(mrn, "ICU")
+
+
+@app.get("/api/check-mrn/{mrn}", response_model=CombinedMRNCheckResponse)
+async def check_mrn(mrn: str):
+    """Check an MRN for an active OR booking and an active ICU request at once"""
+    return CombinedMRNCheckResponse(
+        mrn=mrn, OR=await _check_mrn(mrn, "OR"), ICU=await _check_mrn(mrn, "ICU")
+    )
+
+
+# Search
+@app.get("/api/search", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[str] = Query(None, pattern="^(OR|ICU)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+):
+    """Full-text search of active bookings and their comments, best match first."""
+    # One extra row tells whether another page exists without a COUNT(*)
+    hits = search_bookings(db, q, type, limit + 1, offset)
+    return SearchResponse(
+        query=q,
+        limit=limit,
+        offset=offset,
+        has_more=len(hits) > limit,
+        results=[
+            SearchHit(
+                id=booking.id,
+                type_of_booking=booking.type_of_booking,
+                mrn=booking.mrn,
+                patient_name=booking.patient_name,
+                procedure=booking.procedure,
+                indication=booking.indication,
+                urgency=booking.urgency,
+                status=booking.status,
+                outcome=booking.outcome,
+                created_at=booking.created_at,
+                rank=round(rank, 6),
+                matched_in=matched_in,
+            )
+            for booking, rank, matched_in in hits[:limit]
+        ],
+    )
+
+
+@app.get("/api/typeahead/{field}", response_model=TypeaheadResponse)
+def typeahead_suggestions(
+    field: TypeaheadField,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=25),
+    db: Session = Depends(get_read_db),
+):
+    """Most used values of a booking field starting with ``q``."""
+    suggestions = typeahead.suggest(db, ReadSessionLocal, field, q, limit)
+    if len(q.strip()) <= TYPEAHEAD_CACHE_PREFIX_LEN:
+        response.headers["Cache-Control"] = f"private, max-age={TYPEAHEAD_CACHE_SECONDS}"
+    return TypeaheadResponse(
+        field=field.value,
+        query=q,
+        suggestions=[
+            TypeaheadSuggestion(value=value, count=count) for value, count in suggestions
+        ],
     )
-    
-    if active_request:
-        return MRNCheckResponse(
-            has_active=True,
-            active_booking={
-                "id": active_request.id,
-                "patient_name": active_request.patient_name,
-                "indication": active_request.indication,
-                "status": active_request.status,
-                "urgency": active_request.urgency,
-                "created_at": active_request.created_at.isoformat() if active_request.created_at else None,
-                "requested_date": active_request.requested_date.isoformat() if active_request.requested_date else None
-            }
-        )
-    return MRNCheckResponse(has_active=False)
 
 
 @app.post("/api/or-bookings", response_model=LegacyORBookingResponse)
@@ -722,20 +1227,45 @@ def legacy_create_or_booking(
 
 
 @app.get("/api/or-bookings", response_model=List[LegacyORBookingResponse])
-def legacy_get_or_bookings(db: Session = Depends(get_db)):
-    bookings = (
-        db.query(Booking)
-        .filter(Booking.type_of_booking == "OR", Booking.is_active == True)
-        .order_by(Booking.created_at.desc())
-        .all()
-    )
+def legacy_get_or_bookings(db: Session = Depends(get_read_db)):
+    bookings = db.execute(ACTIVE_BY_TYPE, {"booking_type": "OR"}).scalars().all()
     return [_booking_to_legacy_or(b) for b in bookings]
 
 
+# Open OR cases by deadline (or_queue.py). The order is cached between writes,
+# so a poll only formats the requested page. The ETag is the queue version:
+# an unchanged queue answers 304 and the client recomputes slack locally.
+@app.get("/api/or-bookings/queue", response_model=ORQueueResponse)
+async def get_or_queue(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    if not or_queue.ready:
+        await run_in_threadpool(or_queue.load, SessionLocal)
+
+    cases = or_queue.ordered()
+    version = or_queue.version
+    etag = f'W/"or-queue-{version}-{offset}-{limit}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    now = now_riyadh().replace(tzinfo=None)
+    page = []
+    for position, case in enumerate(cases[offset : offset + limit], start=offset + 1):
+        slack = int((case["deadline"] - now).total_seconds() // 60)
+        page.append(ORQueueEntry(position=position, **case, slack_minutes=slack, overdue=slack < 0))
+    return ORQueueResponse(version=version, total=len(cases), offset=offset, cases=page)
+
+
 @app.get("/api/or-bookings/{booking_id}", response_model=LegacyORBookingResponse)
-def legacy_get_or_booking(booking_id: str, db: Session = Depends(get_db)):
+def legacy_get_or_booking(booking_id: str, db: Session = Depends(get_read_db)):
     internal_id = _parse_legacy_booking_id(booking_id)
-    booking = _get_booking_or_404(db, internal_id, expected_type="OR")
+    booking = _get_booking_or_404(
+        db, internal_id, expected_type="OR", include_archived=True
+    )
     return _booking_to_legacy_or(booking)
 
 
@@ -812,20 +1342,17 @@ def legacy_create_icu_request(
 
 
 @app.get("/api/icu-requests", response_model=List[LegacyICUBookingResponse])
-def legacy_get_icu_requests(db: Session = Depends(get_db)):
-    bookings = (
-        db.query(Booking)
-        .filter(Booking.type_of_booking == "ICU", Booking.is_active == True)
-        .order_by(Booking.created_at.desc())
-        .all()
-    )
+def legacy_get_icu_requests(db: Session = Depends(get_read_db)):
+    bookings = db.execute(ACTIVE_BY_TYPE, {"booking_type": "ICU"}).scalars().all()
     return [_booking_to_legacy_icu(b) for b in bookings]
 
 
 @app.get("/api/icu-requests/{booking_id}", response_model=LegacyICUBookingResponse)
-def legacy_get_icu_request(booking_id: str, db: Session = Depends(get_db)):
+def legacy_get_icu_request(booking_id: str, db: Session = Depends(get_read_db)):
     internal_id = _parse_legacy_booking_id(booking_id)
-    booking = _get_booking_or_404(db, internal_id, expected_type="ICU")
+    booking = _get_booking_or_404(
+        db, internal_id, expected_type="ICU", include_archived=True
+    )
     return _booking_to_legacy_icu(booking)
 
 
@@ -896,6 +1423,20 @@ def legacy_confirm_icu_request(
     old_unit = booking.unit
     old_room = booking.room
 
+    # Reserve the bed in this transaction; fails if another request holds it
+    try:
+        occupy_bed(db, confirm.unit, confirm.room, booking.id)
+    except UnknownBedError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except BedTakenError as exc:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": str(exc),
+                "bed": {key: exc.bed[key] for key in ("unit", "room", "state")},
+            },
+        )
+
     # Update booking with confirmation details
     booking.status = "confirmed"
     booking.unit = confirm.unit
@@ -937,6 +1478,8 @@ def update_icu_outcome(
     booking.outcome = outcome
     booking.outcome_changed_at = now_riyadh()
     booking.last_updated_at = now_riyadh()
+    if outcome in ICU_RELEASE_OUTCOMES:
+        release_beds(db, booking.id)
     db.commit()
 
     # Log the outcome update
@@ -954,6 +1497,149 @@ def update_icu_outcome(
     return {"message": "Outcome updated successfully", "outcome": outcome}
 
 
+@app.post("/api/icu-requests/{booking_id}/discharge")
+def discharge_icu_request(booking_id: str, db: Session = Depends(get_db)):
+    """Free the ICU bed held by the request (patient left the unit)."""
+    internal_id = _parse_legacy_booking_id(booking_id)
+    booking = _get_booking_or_404(db, internal_id, expected_type="ICU")
+
+    released = release_beds(db, booking.id)
+    if not released:
+        raise HTTPException(status_code=409, detail="ICU request does not hold a bed")
+    booking.last_updated_at = now_riyadh()
+    db.commit()
+
+    log_booking_change(
+        db,
+        booking.id,
+        "discharged",
+        field_changed="unit,room",
+        old_value=f"{booking.unit},{booking.room}",
+        notes=f"ICU bed released in {booking.unit}, {booking.room}",
+    )
+    db.commit()
+
+    return {"message": "ICU bed released", "unit": booking.unit, "room": booking.room}
+
+
+# ICU bed inventory
+# Free beds come from the in-process occupancy index (icu_beds.py)
+@app.get("/api/icu/beds/free", response_model=ICUFreeBedsResponse)
+async def get_free_icu_beds(unit: Optional[str] = None):
+    if bed_occupancy.ready:
+        beds = bed_occupancy.free_beds(unit)
+    else:
+        beds = await run_in_threadpool(_free_beds_from_db, unit)
+    return ICUFreeBedsResponse(unit=unit, count=len(beds), beds=beds)
+
+
+def _free_beds_from_db(unit: Optional[str]):
+    stmt = FREE_BEDS if unit is None else FREE_BEDS.where(ICUBed.unit == unit)
+    with SessionLocal() as db:
+        return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def _allocation_request(request: dict, now: datetime) -> AllocationRequest:
+    created_at = request["created_at"]
+    waiting = int((now - created_at).total_seconds() // 60) if created_at else None
+    return AllocationRequest(**request, waiting_minutes=waiting)
+
+
+@app.get("/api/icu/allocation/preview", response_model=AllocationPreviewResponse)
+async def preview_icu_allocation(
+    unit: Optional[str] = None, limit: int = Query(10, ge=0, le=100)
+):
+    """Proposed bed for each free bed, plus the head of the pending queue"""
+    if not bed_occupancy.ready:
+        await run_in_threadpool(bed_occupancy.load, SessionLocal)
+    if not pending_queue.ready:
+        await run_in_threadpool(pending_queue.load, SessionLocal)
+
+    now = now_riyadh().replace(tzinfo=None)
+    free_beds = bed_occupancy.free_beds(unit)
+    return AllocationPreviewResponse(
+        auto_allocate=ICU_AUTO_ALLOCATE,
+        queue_length=len(pending_queue),
+        free_beds=len(free_beds),
+        proposals=[
+            AllocationProposal(bed=bed, request=_allocation_request(request, now))
+            for bed, request in proposals(free_beds)
+        ],
+        queue=[_allocation_request(request, now) for request in pending_queue.top(limit)],
+    )
+
+
+# Monte Carlo occupancy forecast (forecast.py), cached per clock hour
+@app.get("/api/icu/forecast", response_model=ICUForecastResponse)
+async def get_icu_forecast(
+    hours: int = Query(72, ge=1, le=MAX_HORIZON_HOURS), unit: Optional[str] = None
+):
+    result = await run_in_threadpool(forecast_cache.get, ReadSessionLocal, hours)
+    units = result["units"]
+    if unit is not None:
+        units = [forecast for forecast in units if forecast["unit"] == unit]
+    return ICUForecastResponse(
+        **{**result, "units": units},
+        pending_requests=len(pending_queue) if pending_queue.ready else None,
+    )
+
+
+@app.get("/api/icu/beds", response_model=List[ICUBedResponse])
+def get_icu_beds(unit: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """Bed inventory with current state and occupying request"""
+    stmt = ALL_BEDS if unit is None else ALL_BEDS.where(ICUBed.unit == unit)
+    return [ICUBedResponse(**row) for row in db.execute(stmt).mappings()]
+
+
+@app.post("/api/icu/beds", response_model=ICUBedResponse)
+def create_icu_bed(bed: ICUBedCreate, db: Session = Depends(get_db)):
+    if db.execute(BED_BY_LOCATION, {"unit": bed.unit, "room": bed.room}).first():
+        raise HTTPException(status_code=409, detail="Bed already exists")
+    db_bed = add_bed(db, bed.unit, bed.room)
+    db.commit()
+    return ICUBedResponse(
+        id=db_bed.id, unit=db_bed.unit, room=db_bed.room, state=db_bed.state, booking_id=None
+    )
+
+
+@app.put("/api/icu/beds/{bed_id}/state", response_model=dict)
+def update_icu_bed_state(
+    bed_id: int, state_update: ICUBedStateUpdate, db: Session = Depends(get_db)
+):
+    """Take a bed out of service or return it; occupied beds are refused"""
+    if state_update.state not in (ICUBedState.FREE, ICUBedState.OUT_OF_SERVICE):
+        raise HTTPException(status_code=400, detail="State must be free or out_of_service")
+    if db.get(ICUBed, bed_id) is None:
+        raise HTTPException(status_code=404, detail="Bed not found")
+    if not set_service_state(db, bed_id, state_update.state.value):
+        raise HTTPException(status_code=409, detail="Bed is occupied")
+    db.commit()
+    return {"message": "Bed state updated", "id": bed_id, "state": state_update.state.value}
+
+
+@app.get("/api/sla/breaches", response_model=List[SLABreachResponse])
+def get_sla_breaches(
+    response: Response,
+    booking_type: Optional[str] = Query(None, pattern="^(OR|ICU)$"),
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+):
+    """Recorded SLA breaches, newest first; X-Total-Count has the total"""
+    stmt, count = BREACHES, BREACH_COUNT
+    if booking_type is not None:
+        stmt = stmt.where(SLABreach.booking_type == booking_type)
+        count = count.where(SLABreach.booking_type == booking_type)
+    if since is not None:
+        if since.tzinfo is not None:
+            since = since.astimezone(RIYADH_TZ).replace(tzinfo=None)
+        stmt = stmt.where(SLABreach.detected_at >= since)
+        count = count.where(SLABreach.detected_at >= since)
+    response.headers["X-Total-Count"] = str(db.execute(count).scalar())
+    return db.execute(stmt.limit(limit).offset(offset)).scalars().all()
+
+
 @app.put("/api/or-bookings/{booking_id}/outcome")
 def update_or_booking_outcome(
     booking_id: str, payload: dict, db: Session = Depends(get_db)
@@ -1020,56 +1706,53 @@ def legacy_create_comment(comment: LegacyCommentCreate, db: Session = Depends(ge
 def legacy_get_comments(
     booking_id: str = Query(...),
     context: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     internal_id = _parse_legacy_booking_id(booking_id)
-    _get_booking_or_404(db, internal_id)
-
-    query = db.query(BookingComment).filter(BookingComment.booking_id == internal_id)
-    if context:
-        query = query.filter(BookingComment.context == context)
+    booking = _get_booking_or_404(db, internal_id, include_archived=True)
 
-    comments = query.order_by(BookingComment.created_at.asc()).all()
+    stmt, params = comments_statement(
+        internal_id, context, archived=isinstance(booking, ArchivedBooking)
+    )
+    comments = db.execute(stmt, params).scalars().all()
     return [_comment_to_legacy(comment) for comment in comments]
 
 
 # User session endpoints
 @app.post("/sessions/", response_model=dict)
 def create_session(user_session: UserSessionCreate, db: Session = Depends(get_db)):
-    # Check if user already has an active session
-    existing_session = (
-        db.query(UserSession)
-        .filter(
-            UserSession.user_name == user_session.user_name,
-            UserSession.is_active == True,
-        )
-        .first()
-    )
+    # Refresh the user's active session, or create one
+    existed = touch_session(db, user_session.user_name, user_session.user_role)
+    db.commit()
+    return {
+        "message": "Session updated" if existed else "Session created",
+        "user": user_session.user_name,
+        "role": user_session.user_role,
+    }
 
-    if existing_session:
-        setattr(existing_session, "last_login", now_riyadh())
-        db.commit()
-        return {
-            "message": "Session updated",
-            "user": user_session.user_name,
-            "role": user_session.user_role,
-        }
 
-    # Create new session
-    db_session = UserSession(**user_session.dict())
-    db.add(db_session)
+@app.post("/sessions/heartbeat", response_model=dict)
+def session_heartbeat(user_session: UserSessionCreate, db: Session = Depends(get_db)):
+    """Keep the session active; sessions idle for SESSION_IDLE_SECONDS expire"""
+    existed = touch_session(db, user_session.user_name, user_session.user_role)
     db.commit()
-
     return {
-        "message": "Session created",
+        "message": "Session refreshed" if existed else "Session created",
         "user": user_session.user_name,
         "role": user_session.user_role,
     }
 
 
 @app.get("/sessions/active")
-def get_active_sessions(db: Session = Depends(get_db)):
-    sessions = db.query(UserSession).filter(UserSession.is_active == True).all()
+def get_active_sessions(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+):
+    """Active sessions, most recently seen first; X-Total-Count has the total"""
+    response.headers["X-Total-Count"] = str(db.execute(ACTIVE_SESSIONS_COUNT).scalar())
+    sessions = db.execute(ACTIVE_SESSIONS_PAGE, {"limit": limit, "offset": offset}).all()
     return [
         {"user_name": s.user_name, "user_role": s.user_role, "last_login": s.last_login}
         for s in sessions
@@ -1078,46 +1761,17 @@ def get_active_sessions(db: Session = Depends(get_db)):
 
 # Statistics and reporting endpoints
 @app.get("/bookings/stats/summary")
-def get_booking_stats(db: Session = Depends(get_db)):
-    total_bookings = db.query(Booking).filter(Booking.is_active == True).count()
-    or_bookings = (
-        db.query(Booking)
-        .filter(Booking.type_of_booking == "OR", Booking.is_active == True)
-        .count()
-    )
-    icu_bookings = (
-        db.query(Booking)
-        .filter(Booking.type_of_booking == "ICU", Booking.is_active == True)
-        .count()
-    )
-
-    pending_bookings = (
-        db.query(Booking)
-        .filter(Booking.status == "pending", Booking.is_active == True)
-        .count()
-    )
-
-    return {
-        "total_active_bookings": total_bookings,
-        "or_bookings": or_bookings,
-        "icu_bookings": icu_bookings,
-        "pending_bookings": pending_bookings,
-    }
+def get_booking_stats(db: Session = Depends(get_read_db)):
+    return stats_summary(db.execute(STATS_SUMMARY).one())
 
 
 @app.get("/bookings/{booking_id}/audit-log")
-def get_booking_audit_log(booking_id: int, db: Session = Depends(get_db)):
+def get_booking_audit_log(booking_id: int, db: Session = Depends(get_read_db)):
     # Verify booking exists
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if booking is None:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    booking = _get_booking_or_404(db, booking_id, include_archived=True)
 
-    audit_logs = (
-        db.query(AuditLog)
-        .filter(AuditLog.booking_id == booking_id)
-        .order_by(AuditLog.timestamp.desc())
-        .all()
-    )
+    stmt = audit_statement(archived=isinstance(booking, ArchivedBooking))
+    audit_logs = db.execute(stmt, {"booking_id": booking_id}).scalars().all()
 
     return [
         {
@@ -1136,87 +1790,102 @@ def get_booking_audit_log(booking_id: int, db: Session = Depends(get_db)):
 
 
 # Export endpoints for admin
-@app.get("/api/export/or-bookings")
-def export_or_bookings(
-    month: int = Query(..., ge=1, le=12),
-    year: int = Query(...),
-    db: Session = Depends(get_db),
-):
-    """
-    Export OR bookings for a specific month as CSV.
-    Query params: month (1-12), year (e.g., 2025)
-    """
-    # Get first and last day of the month
+OR_EXPORT_HEADER = [
+    "ID",
+    "MRN",
+    "Patient Name",
+    "Patient Ward",
+    "Procedure",
+    "Urgency",
+    "Status",
+    "Consultant",
+    "Consultant Phone",
+    "Requesting Physician",
+    "Requesting Physician Phone",
+    "Anesthesia Contact",
+    "Requested Date",
+    "Created At",
+    "Created By",
+    "Outcome",
+]
+
+ICU_EXPORT_HEADER = [
+    "ID",
+    "MRN",
+    "Patient Name",
+    "Patient Ward",
+    "Indication",
+    "Urgency",
+    "Status",
+    "Unit",
+    "Room",
+    "Outcome",
+    "Consultant",
+    "Consultant Phone",
+    "Requesting Physician",
+    "Requesting Physician Phone",
+    "Requested Date",
+    "Created At",
+    "Created By",
+]
+
+
+def _export_month_bounds(month: int, year: int):
+    """First and last instant of the month used by the registry exports"""
     first_day = datetime(year, month, 1)
     last_day_num = monthrange(year, month)[1]
     last_day = datetime(year, month, last_day_num, 23, 59, 59)
+    return first_day, last_day
 
-    # Query OR bookings for the month
-    bookings = (
-        db.query(Booking)
-        .filter(
-            Booking.type_of_booking == "OR",
-            Booking.created_at >= first_day,
-            Booking.created_at <= last_day,
-        )
-        .order_by(Booking.created_at.asc())
-        .all()
-    )
 
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
+def _or_export_row(b: Booking) -> list:
+    return [
+        b.id,
+        b.mrn or "",
+        b.patient_name or "",
+        b.patient_ward or "",
+        b.procedure or "",
+        b.urgency or "",
+        b.status,
+        b.consultant or "",
+        b.consultant_phone or "",
+        b.requesting_physician or "",
+        b.requesting_physician_phone or "",
+        b.anesthesia_team_contact or "",
+        b.requested_date.strftime("%Y-%m-%d") if b.requested_date else "",
+        b.created_at.strftime("%Y-%m-%d %H:%M:%S") if b.created_at else "",
+        f"{b.created_by_name} ({b.created_by_role})" if b.created_by_name else "",
+        b.outcome or "",
+    ]
 
-    # Write header
-    writer.writerow(
-        [
-            "ID",
-            "MRN",
-            "Patient Name",
-            "Patient Ward",
-            "Procedure",
-            "Urgency",
-            "Status",
-            "Consultant",
-            "Consultant Phone",
-            "Requesting Physician",
-            "Requesting Physician Phone",
-            "Anesthesia Contact",
-            "Requested Date",
-            "Created At",
-            "Created By",
-            "Outcome",
-        ]
-    )
 
-    # Write data rows
-    for b in bookings:
-        writer.writerow(
-            [
-                b.id,
-                b.mrn or "",
-                b.patient_name or "",
-                b.patient_ward or "",
-                b.procedure or "",
-                b.urgency or "",
-                b.status,
-                b.consultant or "",
-                b.consultant_phone or "",
-                b.requesting_physician or "",
-                b.requesting_physician_phone or "",
-                b.anesthesia_team_contact or "",
-                b.requested_date.strftime("%Y-%m-%d")
-                if b.requested_date
-                else "",
-                b.created_at.strftime("%Y-%m-%d %H:%M:%S") if b.created_at else "",
-                f"{b.created_by_name} ({b.created_by_role})" if b.created_by_name else "",
-                b.outcome or "",
-            ]
-        )
+def _icu_export_row(b: Booking) -> list:
+    return [
+        b.id,
+        b.mrn or "",
+        b.patient_name or "",
+        b.patient_ward or "",
+        b.indication or "",
+        b.urgency or "",
+        b.status,
+        b.unit or "",
+        b.room or "",
+        b.outcome or "",
+        b.consultant or "",
+        b.consultant_phone or "",
+        b.requesting_physician or "",
+        b.requesting_physician_phone or "",
+        b.requested_date.strftime("%Y-%m-%d") if b.requested_date else "",
+        b.created_at.strftime("%Y-%m-%d %H:%M:%S") if b.created_at else "",
+        f"{b.created_by_name} ({b.created_by_role})" if b.created_by_name else "",
+    ]
+
 
-    # Prepare response
-    output.seek(0)
-    filename = f"OR_Registry_{year}_{month:02d}.csv"
+def _csv_response(header: list, rows, filename: str) -> StreamingResponse:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+    writer.writerows(rows)
 
     return StreamingResponse(
         iter([output.getvalue()]),
@@ -1225,165 +1894,179 @@ def export_or_bookings(
     )
 
 
+@app.get("/api/export/or-bookings")
+def export_or_bookings(
+    month: int = Query(..., ge=1, le=12),
+    year: int = Query(...),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Export OR bookings for a specific month as CSV.
+    Query params: month (1-12), year (e.g., 2025)
+    """
+    first_day, last_day = _export_month_bounds(month, year)
+
+    # OR bookings for the month, including archived ones
+    bookings = db.execute(
+        EXPORT_BY_TYPE_AND_RANGE,
+        {"booking_type": "OR", "first_day": first_day, "last_day": last_day},
+    ).all()
+
+    return _csv_response(
+        OR_EXPORT_HEADER,
+        (_or_export_row(b) for b in bookings),
+        f"OR_Registry_{year}_{month:02d}.csv",
+    )
+
+
 @app.get("/api/export/icu-requests")
 def export_icu_requests(
     month: int = Query(..., ge=1, le=12),
     year: int = Query(...),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """
     Export ICU requests for a specific month as CSV.
     Query params: month (1-12), year (e.g., 2025)
     """
-    # Get first and last day of the month
-    first_day = datetime(year, month, 1)
-    last_day_num = monthrange(year, month)[1]
-    last_day = datetime(year, month, last_day_num, 23, 59, 59)
+    first_day, last_day = _export_month_bounds(month, year)
+
+    # ICU bookings for the month, including archived ones
+    bookings = db.execute(
+        EXPORT_BY_TYPE_AND_RANGE,
+        {"booking_type": "ICU", "first_day": first_day, "last_day": last_day},
+    ).all()
+
+    return _csv_response(
+        ICU_EXPORT_HEADER,
+        (_icu_export_row(b) for b in bookings),
+        f"ICU_Registry_{year}_{month:02d}.csv",
+    )
 
-    # Query ICU bookings for the month
-    bookings = (
-        db.query(Booking)
-        .filter(
-            Booking.type_of_booking == "ICU",
-            Booking.created_at >= first_day,
-            Booking.created_at <= last_day,
+
+# Admin - Password Management
+# bcrypt runs on the bounded pool in staff_auth.py; a verified login returns a
+# staff token that later verifications accept with a single HMAC check.
+def _get_staff_password_hash() -> Optional[str]:
+    hashed = settings_cache.get(STAFF_PASSWORD_KEY)
+    if hashed is None:
+        with SessionLocal() as db:
+            setting = (
+                db.query(SystemSetting)
+                .filter(SystemSetting.setting_key == STAFF_PASSWORD_KEY)
+                .first()
+            )
+            if not setting:
+                return None
+            hashed = setting.setting_value
+        settings_cache.set(STAFF_PASSWORD_KEY, hashed)
+    return hashed
+
+
+def _store_staff_password_hash(hashed: str):
+    with SessionLocal() as db:
+        setting = (
+            db.query(SystemSetting)
+            .filter(SystemSetting.setting_key == STAFF_PASSWORD_KEY)
+            .first()
         )
-        .order_by(Booking.created_at.asc())
-        .all()
-    )
+        if not setting:
+            db.add(SystemSetting(setting_key=STAFF_PASSWORD_KEY, setting_value=hashed))
+        else:
+            setting.setting_value = hashed
+            setting.updated_at = now_riyadh()
+        db.commit()
+    settings_cache.set(STAFF_PASSWORD_KEY, hashed)
 
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
 
-    # Write header
-    writer.writerow(
-        [
-            "ID",
-            "MRN",
-            "Patient Name",
-            "Patient Ward",
-            "Indication",
-            "Urgency",
-            "Status",
-            "Unit",
-            "Room",
-            "Outcome",
-            "Consultant",
-            "Consultant Phone",
-            "Requesting Physician",
-            "Requesting Physician Phone",
-            "Requested Date",
-            "Created At",
-            "Created By",
-        ]
+def _client_key(request: Request) -> str:
+    return client_address(
+        request.client.host if request.client else None,
+        request.headers.get("x-forwarded-for"),
     )
 
-    # Write data rows
-    for b in bookings:
-        writer.writerow(
-            [
-                b.id,
-                b.mrn or "",
-                b.patient_name or "",
-                b.patient_ward or "",
-                b.indication or "",
-                b.urgency or "",
-                b.status,
-                b.unit or "",
-                b.room or "",
-                b.outcome or "",
-                b.consultant or "",
-                b.consultant_phone or "",
-                b.requesting_physician or "",
-                b.requesting_physician_phone or "",
-                b.requested_date.strftime("%Y-%m-%d")
-                if b.requested_date
-                else "",
-                b.created_at.strftime("%Y-%m-%d %H:%M:%S") if b.created_at else "",
-                f"{b.created_by_name} ({b.created_by_role})" if b.created_by_name else "",
-            ]
-        )
-
-    # Prepare response
-    output.seek(0)
-    filename = f"ICU_Registry_{year}_{month:02d}.csv"
 
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+@app.exception_handler(StaffAuthRejected)
+async def staff_auth_rejected_handler(request: Request, exc: StaffAuthRejected):
+    detail = (
+        "Too many password attempts, try again later"
+        if exc.reason == "rate_limited"
+        else "Server busy, try again shortly"
+    )
+    return JSONResponse(
+        status_code=429,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
     )
 
 
-# Admin - Password Management
 @app.post("/api/admin/verify-staff-password")
-def verify_staff_password(credentials: dict, db: Session = Depends(get_db)):
-    """Verify staff password (returns true/false instead of exposing password)"""
+async def verify_staff_password(credentials: dict, request: Request):
+    """Verify staff password (returns true/false instead of exposing password)
+
+    Accepts ``password`` or a ``token`` from an earlier successful verification.
+    """
     password = credentials.get("password")
-    if not password:
+    token = credentials.get("token")
+    if not password and not token:
         raise HTTPException(status_code=400, detail="Password is required")
 
-    setting = (
-        db.query(SystemSetting)
-        .filter(SystemSetting.setting_key == "staff_password")
-        .first()
-    )
-    if not setting:
+    stored = await run_in_threadpool(_get_staff_password_hash)
+    if stored is None:
         # Create default hashed password if not exists
-        hashed = bcrypt.hashpw("123".encode("utf-8"), bcrypt.gensalt())
-        setting = SystemSetting(
-            setting_key="staff_password", setting_value=hashed.decode("utf-8")
-        )
-        db.add(setting)
-        db.commit()
+        stored = await hash_password("123")
+        await run_in_threadpool(_store_staff_password_hash, stored)
+
+    if token and check_token(token, stored):
+        return {"valid": True}
+    if not password:
+        return {"valid": False}
 
-    # Verify password
+    # Verify password; token checks above are cheap and not rate limited
+    admit(_client_key(request))
     try:
-        is_valid = bcrypt.checkpw(
-            password.encode("utf-8"), setting.setting_value.encode("utf-8")
-        )
-        return {"valid": is_valid}
-    except Exception:
+        is_valid = await check_password(password, stored)
+    except LegacyPasswordError:
         # If stored password is not hashed (legacy), do direct comparison and then hash it
-        if password == setting.setting_value:
-            # Migrate to hashed password
-            hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-            setting.setting_value = hashed.decode("utf-8")
-            setting.updated_at = now_riyadh()
-            db.commit()
-            return {"valid": True}
+        if password != stored:
+            return {"valid": False}
+        # Migrate to hashed password
+        stored = await hash_password(password)
+        await run_in_threadpool(_store_staff_password_hash, stored)
+        is_valid = True
+
+    if not is_valid:
         return {"valid": False}
+    return {"valid": True, **issue_token(stored)}
 
 
 @app.put("/api/admin/staff-password")
-def update_staff_password(password_update: dict, db: Session = Depends(get_db)):
+async def update_staff_password(password_update: dict, request: Request):
     """Update the staff password (admin only) - stores hashed password"""
     new_password = password_update.get("password")
     if not new_password or len(new_password) < 3:
         raise HTTPException(
             status_code=400, detail="Password must be at least 3 characters"
         )
+    admit(_client_key(request))
 
-    # Hash the new password with bcrypt
-    hashed_password = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt())
+    # Hash the new password with bcrypt; outstanding staff tokens stop working
+    hashed_password = await hash_password(new_password)
+    await run_in_threadpool(_store_staff_password_hash, hashed_password)
+    return {"message": "Staff password updated successfully"}
 
-    setting = (
-        db.query(SystemSetting)
-        .filter(SystemSetting.setting_key == "staff_password")
-        .first()
-    )
-    if not setting:
-        setting = SystemSetting(
-            setting_key="staff_password", setting_value=hashed_password.decode("utf-8")
-        )
-        db.add(setting)
-    else:
-        setting.setting_value = hashed_password.decode("utf-8")
-        setting.updated_at = now_riyadh()
 
-    db.commit()
-    return {"message": "Staff password updated successfully"}
+async def require_staff_token(x_staff_token: Optional[str] = Header(None)):
+    """Dependency for admin reads: a token from /api/admin/verify-staff-password"""
+    stored = await run_in_threadpool(_get_staff_password_hash)
+    if stored is None or not check_token(x_staff_token, stored):
+        raise HTTPException(status_code=401, detail="Staff token required")
+
+
+@app.get("/api/admin/slow-queries", dependencies=[Depends(require_staff_token)])
+async def get_slow_queries(limit: int = Query(50, ge=1, le=500)):
+    """Recent slow statements with redacted parameters and plans, newest first"""
+    return slow_query_log.snapshot(limit)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index, Table, UniqueConstraint, true
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -13,6 +13,17 @@ def now_riyadh():
     """Get current time in Riyadh timezone"""
     return datetime.now(RIYADH_TZ)
 
+def naive_riyadh(value):
+    """Naive Riyadh wall time for a column value (None stays None).
+
+    TIMESTAMPTZ columns on PostgreSQL come back in the session's zone and
+    in-flight ORM values carry Riyadh's; both are converted, not relabelled.
+    Naive values are already Riyadh time.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(RIYADH_TZ).replace(tzinfo=None)
+    return value
+
 # Enums for better data integrity (optional - can also use strings)
 class BookingType(str, enum.Enum):
     OR = "OR"
@@ -48,6 +59,11 @@ class BookingOutcome(str, enum.Enum):
     POSTPONED = "postponed"
     COMPLETED = "completed"
 
+class ICUBedState(str, enum.Enum):
+    FREE = "free"
+    OCCUPIED = "occupied"
+    OUT_OF_SERVICE = "out_of_service"
+
 # Main Bookings Table (Your Design + Enhancements)
 class Booking(Base):
     __tablename__ = "bookings"
@@ -147,3 +163,129 @@ class SystemSetting(Base):
     setting_key = Column(String(100), unique=True, nullable=False)
     setting_value = Column(Text, nullable=False)
     updated_at = Column(DateTime, default=now_riyadh)
+
+# ICU Bed Inventory (one row per bed; a room is a single-bed ICU room)
+class ICUBed(Base):
+    __tablename__ = "icu_beds"
+    __table_args__ = (UniqueConstraint("unit", "room", name="uq_icu_beds_unit_room"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    unit = Column(String(100), nullable=False)
+    room = Column(String(100), nullable=False)
+    state = Column(String(20), nullable=False, default=ICUBedState.FREE.value)
+    booking_id = Column(Integer, ForeignKey('bookings.id'))  # Occupying ICU request
+    occupied_since = Column(DateTime)
+    updated_at = Column(DateTime, default=now_riyadh)
+
+
+# SLA breaches found by sla.py: a watched case still pending at its deadline.
+# No foreign key, so breaches stay after their booking is archived.
+class SLABreach(Base):
+    __tablename__ = "sla_breaches"
+    __table_args__ = (UniqueConstraint("booking_id", name="uq_sla_breaches_booking"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    booking_id = Column(Integer, nullable=False)
+    booking_type = Column(String(20), nullable=False)
+    mrn = Column(String(50))
+    urgency = Column(String(10))
+    status = Column(String(50))  # Booking status when the breach was detected
+    booking_created_at = Column(DateTime)
+    deadline = Column(DateTime, nullable=False)
+    detected_at = Column(DateTime, default=now_riyadh)
+
+
+# =============================================================================
+# ARCHIVE TABLES
+# =============================================================================
+# archive.py moves closed bookings here together with their comments and audit
+# rows, so the hot tables and their indexes only hold recent data. Columns
+# mirror the hot tables (rows keep their ids) plus the time of archiving.
+
+def _archive_table(name, source):
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False)
+        for column in source.columns
+    ]
+    return Table(name, Base.metadata, *columns, Column("archived_at", DateTime))
+
+
+class ArchivedBooking(Base):
+    __table__ = _archive_table("bookings_archive", Booking.__table__)
+
+
+class ArchivedBookingComment(Base):
+    __table__ = _archive_table("booking_comments_archive", BookingComment.__table__)
+
+
+class ArchivedAuditLog(Base):
+    __table__ = _archive_table("audit_logs_archive", AuditLog.__table__)
+
+
+# =============================================================================
+# INDEXES
+# =============================================================================
+# Declared on the models so every database built from them (including SQLite
+# dev setups) gets the same set. Each index matches a hot query shape; run
+# `python check_indexes.py` to confirm none of them falls back to a table scan.
+
+# has_active_booking / check-mrn: mrn + type among active bookings
+Index(
+    "ix_bookings_active_mrn_type",
+    Booking.mrn,
+    Booking.type_of_booking,
+    postgresql_where=Booking.is_active == true(),
+    sqlite_where=Booking.is_active == true(),
+)
+
+# Legacy OR/ICU lists: type + is_active, newest first
+Index(
+    "ix_bookings_active_type_created",
+    Booking.type_of_booking,
+    Booking.created_at,
+    postgresql_where=Booking.is_active == true(),
+    sqlite_where=Booking.is_active == true(),
+)
+
+# Monthly registry exports: type + created_at range (includes inactive rows)
+Index("ix_bookings_type_created", Booking.type_of_booking, Booking.created_at)
+
+# Comment threads in chronological order
+Index(
+    "ix_booking_comments_booking_created",
+    BookingComment.booking_id,
+    BookingComment.created_at,
+)
+
+# Audit history per booking
+Index("ix_audit_logs_booking_timestamp", AuditLog.booking_id, AuditLog.timestamp)
+
+# Bed held by an ICU request (release on outcome, discharge and delete)
+Index("ix_icu_beds_booking", ICUBed.booking_id)
+
+# Session login/heartbeat: the user's active session
+Index("ix_user_sessions_user_active", UserSession.user_name, UserSession.is_active)
+
+# /sessions/active and the idle-session sweeper: active sessions by last activity
+Index("ix_user_sessions_active_last_login", UserSession.is_active, UserSession.last_login)
+
+# /api/sla/breaches: newest first, optionally per booking type
+Index("ix_sla_breaches_detected", SLABreach.detected_at)
+Index("ix_sla_breaches_type_detected", SLABreach.booking_type, SLABreach.detected_at)
+
+# Archive lookups: exports by month, comment threads and audit history
+Index(
+    "ix_bookings_archive_type_created",
+    ArchivedBooking.type_of_booking,
+    ArchivedBooking.created_at,
+)
+Index(
+    "ix_booking_comments_archive_booking_created",
+    ArchivedBookingComment.booking_id,
+    ArchivedBookingComment.created_at,
+)
+Index(
+    "ix_audit_logs_archive_booking_timestamp",
+    ArchivedAuditLog.booking_id,
+    ArchivedAuditLog.timestamp,
+)
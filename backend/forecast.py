@@ -0,0 +1,345 @@
+"""
+ICU capacity forecast.
+
+``GET /api/icu/forecast`` estimates, per ICU unit, how many beds will be
+occupied over the next hours. It runs a Monte Carlo simulation in NumPy,
+vectorised over all runs at once.
+
+History (hot and archive tables, the last FORECAST_HISTORY_DAYS):
+
+- arrivals: ICU confirmations (``confirmed`` audit rows) per unit and hour of
+  day, simulated as Poisson arrivals with those hourly rates (smoothed
+  towards the unit's flat rate while there is little history);
+- length of stay: confirmation to discharge (``discharged`` audit row), or to
+  ``outcome_changed_at`` for a releasing outcome (ICU_RELEASE_OUTCOMES).
+  Stays are drawn from the unit's observed stays. With fewer than
+  FORECAST_MIN_STAYS of them the pooled stays of all units are used, and
+  with no history at all an exponential stay of FORECAST_DEFAULT_STAY_HOURS.
+
+Patients in a unit now (confirmed, not discharged or released) stay for the
+rest of a stay drawn from the observed stays longer than their current one.
+
+Results are cached per clock hour, and the random seed is the hour too, so
+every worker returns the same forecast until the hour changes.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import bindparam, case, func, or_, select
+
+from cache import TTLCache
+from database import env_int
+from enhanced_models import (
+    ArchivedAuditLog,
+    ArchivedBooking,
+    AuditLog,
+    Booking,
+    ICUBed,
+    ICUBedState,
+    RIYADH_TZ,
+    naive_riyadh,
+    now_riyadh,
+)
+from icu_beds import ICU_RELEASE_OUTCOMES
+
+FORECAST_RUNS = env_int("FORECAST_RUNS", 2000)
+FORECAST_HISTORY_DAYS = env_int("FORECAST_HISTORY_DAYS", 90)
+FORECAST_MIN_STAYS = env_int("FORECAST_MIN_STAYS", 20)
+FORECAST_DEFAULT_STAY_HOURS = env_int("FORECAST_DEFAULT_STAY_HOURS", 72)
+MAX_HORIZON_HOURS = 72
+POINT_STEP_HOURS = 6
+# Pseudo-arrivals per hour of day: sparse history leans towards a flat rate
+HOUR_OF_DAY_PRIOR = 5
+
+
+def _stays(bookings, audit, since: bool):
+    """One row per ICU request with its last confirmation and discharge."""
+    confirmed_at = func.max(case((audit.c.action == "confirmed", audit.c.timestamp)))
+    discharged_at = func.max(case((audit.c.action == "discharged", audit.c.timestamp)))
+    stmt = (
+        select(
+            bookings.c.id,
+            bookings.c.unit,
+            bookings.c.outcome,
+            bookings.c.outcome_changed_at,
+            confirmed_at.label("confirmed_at"),
+            discharged_at.label("discharged_at"),
+        )
+        .join(audit, audit.c.booking_id == bookings.c.id)
+        .where(
+            bookings.c.type_of_booking == "ICU",
+            audit.c.action.in_(("confirmed", "discharged")),
+        )
+        .group_by(
+            bookings.c.id, bookings.c.unit, bookings.c.outcome, bookings.c.outcome_changed_at
+        )
+    )
+    if since:
+        stmt = stmt.where(audit.c.timestamp >= bindparam("since"))
+    return stmt
+
+
+HISTORY_STAYS = [
+    _stays(Booking.__table__, AuditLog.__table__, since=True),
+    _stays(ArchivedBooking.__table__, ArchivedAuditLog.__table__, since=True),
+]
+
+# Confirmed requests that may still be in their bed, however long ago confirmed
+CURRENT_STAYS = _stays(Booking.__table__, AuditLog.__table__, since=False).where(
+    Booking.is_active == True,
+    Booking.status == "confirmed",
+    or_(Booking.outcome.is_(None), ~Booking.outcome.in_(ICU_RELEASE_OUTCOMES)),
+)
+
+BED_CAPACITY = (
+    select(ICUBed.unit, func.count())
+    .where(ICUBed.state != ICUBedState.OUT_OF_SERVICE.value)
+    .group_by(ICUBed.unit)
+)
+
+
+def _stay_row(row) -> dict:
+    return {
+        "unit": row["unit"],
+        "outcome": row["outcome"],
+        "confirmed_at": naive_riyadh(row["confirmed_at"]),
+        "discharged_at": naive_riyadh(row["discharged_at"]),
+        "outcome_changed_at": naive_riyadh(row["outcome_changed_at"]),
+    }
+
+
+def _stay_end(row) -> Optional[datetime]:
+    confirmed_at = row["confirmed_at"]
+    if confirmed_at is None:
+        return None
+    if row["discharged_at"] is not None and row["discharged_at"] >= confirmed_at:
+        return row["discharged_at"]
+    changed_at = row["outcome_changed_at"]
+    if row["outcome"] in ICU_RELEASE_OUTCOMES and changed_at is not None and changed_at >= confirmed_at:
+        return changed_at
+    return None
+
+
+def load_history(session_factory, now: datetime, days: int = FORECAST_HISTORY_DAYS) -> dict:
+    """Per-unit arrival counts by hour of day, observed stays and current patients."""
+    since = now - timedelta(days=days)
+    arrivals = defaultdict(lambda: np.zeros(24))
+    stays = defaultdict(list)
+    current = defaultdict(list)
+    first_arrival = now
+    with session_factory() as db:
+        for stmt in HISTORY_STAYS:
+            # Zoned, so a TIMESTAMPTZ column does not read it in the session's zone
+            params = {"since": since.replace(tzinfo=RIYADH_TZ)}
+            for row in map(_stay_row, db.execute(stmt, params).mappings()):
+                confirmed_at = row["confirmed_at"]
+                if confirmed_at is None or row["unit"] is None:
+                    continue
+                if confirmed_at >= since:
+                    arrivals[row["unit"]][confirmed_at.hour] += 1
+                    first_arrival = min(first_arrival, confirmed_at)
+                end = _stay_end(row)
+                if end is not None:
+                    stays[row["unit"]].append((end - confirmed_at).total_seconds() / 3600)
+        for row in map(_stay_row, db.execute(CURRENT_STAYS).mappings()):
+            if row["confirmed_at"] is not None and row["unit"] is not None and _stay_end(row) is None:
+                elapsed = (now - row["confirmed_at"]).total_seconds() / 3600
+                current[row["unit"]].append(max(elapsed, 0.0))
+        capacity = {unit: count for unit, count in db.execute(BED_CAPACITY)}
+
+    # A younger deployment has less than the full window of history
+    observed_days = min(days, max((now - first_arrival).total_seconds() / 86400, 1.0))
+    return {
+        "arrivals": dict(arrivals),
+        "observed_days": observed_days,
+        "stays": dict(stays),
+        "current": dict(current),
+        "capacity": capacity,
+    }
+
+
+def _residual_stays(rng, stays: np.ndarray, elapsed: np.ndarray, runs: int) -> np.ndarray:
+    """Remaining hours for patients already in a bed, shape (runs, patients).
+
+    Draws from the observed stays longer than the elapsed time; past the
+    longest observed stay a fresh stay is drawn.
+    """
+    n = stays.size
+    lower = np.searchsorted(stays, elapsed, side="right")
+    span = n - lower
+    u = rng.random((runs, elapsed.size))
+    longer = lower + (u * span).astype(np.int64)
+    fresh = (u * n).astype(np.int64)
+    drawn = stays[np.where(span > 0, longer, fresh)]
+    return np.where(span > 0, drawn - elapsed, drawn)
+
+
+def simulate_unit(
+    rng,
+    runs: int,
+    hours: int,
+    hourly_rates: np.ndarray,
+    stays: np.ndarray,
+    elapsed: np.ndarray,
+) -> dict:
+    """Occupancy at each hour mark 0..hours for ``runs`` simulated futures.
+
+    hourly_rates: expected arrivals in each forecast hour, shape (hours,)
+    stays:        sorted observed stays in hours
+    elapsed:      hours already spent by the current patients
+    """
+    width = hours + 2  # marks 0..hours plus one slot for "after the horizon"
+    enter, leave = [], []
+
+    if elapsed.size:
+        remaining = _residual_stays(rng, stays, elapsed, runs)
+        # Present at mark m while m < remaining
+        marks = np.minimum(np.ceil(remaining), hours + 1).astype(np.int64)
+        enter.append(np.repeat(np.arange(runs) * width, elapsed.size))
+        leave.append((np.arange(runs)[:, None] * width + marks).ravel())
+
+    counts = rng.poisson(hourly_rates, size=(runs, hours))
+    total = int(counts.sum())
+    if total:
+        slot = np.repeat(np.arange(runs * hours), counts.ravel())
+        run, hour = np.divmod(slot, hours)
+        arrive = hour + rng.random(total)
+        stay = stays[rng.integers(0, stays.size, total)]
+        # Present at the marks after arrival, while before departure
+        first = hour + 1
+        last = np.minimum(np.ceil(arrive + stay), hours + 1).astype(np.int64)
+        enter.append(run * width + first)
+        leave.append(run * width + np.maximum(last, first))
+
+    size = runs * width
+    delta = np.zeros(size, dtype=np.int64)
+    for index in enter:
+        delta += np.bincount(index, minlength=size)
+    for index in leave:
+        delta -= np.bincount(index, minlength=size)
+    occupancy = np.cumsum(delta.reshape(runs, width), axis=1)[:, : hours + 1]
+    return {"occupancy": occupancy, "arrivals": counts.sum(axis=1)}
+
+
+def _summarise(unit, result, hours, beds, occupied_now, arrivals_per_day, stays, source) -> dict:
+    occupancy = result["occupancy"]
+    peaks = occupancy[:, 1:].max(axis=1)
+    marks = list(range(POINT_STEP_HOURS, hours, POINT_STEP_HOURS)) + [hours]
+    at_marks = occupancy[:, marks]
+    p10, p50, p90 = np.percentile(at_marks, [10, 50, 90], axis=0)
+    means = at_marks.mean(axis=0)
+    full = (at_marks >= beds).mean(axis=0) if beds else None
+    points = [
+        {
+            "hour": mark,
+            "mean": round(float(means[i]), 2),
+            "p10": float(p10[i]),
+            "p50": float(p50[i]),
+            "p90": float(p90[i]),
+            "p_full": round(float(full[i]), 4) if full is not None else None,
+        }
+        for i, mark in enumerate(marks)
+    ]
+    return {
+        "unit": unit,
+        "beds": beds,
+        "occupied_now": occupied_now,
+        "arrivals_per_day": round(arrivals_per_day, 2),
+        "expected_arrivals": round(float(result["arrivals"].mean()), 2),
+        "mean_stay_hours": round(float(stays.mean()), 1),
+        "stay_source": source,
+        "peak_p90": float(np.percentile(peaks, 90)),
+        "p_full_any": round(float((peaks >= beds).mean()), 4) if beds else None,
+        "points": points,
+    }
+
+
+def _hourly_rates(counts: np.ndarray, days: float) -> np.ndarray:
+    """Expected arrivals per hour of day."""
+    total = counts.sum()
+    if not total:
+        return np.zeros(24)
+    profile = (counts + HOUR_OF_DAY_PRIOR) / (total + 24 * HOUR_OF_DAY_PRIOR)
+    return profile * total / days
+
+
+def forecast(history: dict, now: datetime, hours: int, runs: int = FORECAST_RUNS, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    units = sorted(set(history["arrivals"]) | set(history["current"]) | set(history["capacity"]))
+    all_stays = sorted(stay for unit_stays in history["stays"].values() for stay in unit_stays)
+    if all_stays:
+        pooled_stays = np.array(all_stays)
+    else:
+        pooled_stays = np.sort(rng.exponential(FORECAST_DEFAULT_STAY_HOURS, 1000))
+    # Arrival rate for each forecast hour, by its hour of day
+    hour_of_day = (now.hour + np.arange(hours)) % 24
+
+    results = []
+    for unit in units:
+        unit_stays = history["stays"].get(unit, [])
+        if len(unit_stays) >= FORECAST_MIN_STAYS:
+            stays, source = np.sort(np.array(unit_stays)), "unit"
+        else:
+            stays, source = pooled_stays, "pooled" if all_stays else "default"
+        by_hour = _hourly_rates(history["arrivals"].get(unit, np.zeros(24)), history["observed_days"])
+        elapsed = np.array(history["current"].get(unit, []), dtype=float)
+        result = simulate_unit(rng, runs, hours, by_hour[hour_of_day], stays, elapsed)
+        results.append(
+            _summarise(
+                unit,
+                result,
+                hours,
+                history["capacity"].get(unit),
+                int(elapsed.size),
+                float(by_hour.sum()),
+                stays,
+                source,
+            )
+        )
+    return {"units": results}
+
+
+class ForecastCache:
+    """Forecasts per horizon, computed at most once per clock hour."""
+
+    def __init__(self):
+        self._cache = TTLCache(3600, max_entries=MAX_HORIZON_HOURS + 1)
+        self._lock = threading.Lock()
+
+    def get(self, session_factory, hours: int) -> dict:
+        now = now_riyadh().replace(tzinfo=None)
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        key = (hours, hour)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            # Another request may have computed it while we waited
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+            started = time.perf_counter()
+            history = load_history(session_factory, now)
+            loaded = time.perf_counter()
+            result = forecast(history, now, hours, seed=int(hour.timestamp()))
+            result.update(
+                generated_at=now,
+                horizon_hours=hours,
+                runs=FORECAST_RUNS,
+                history_days=round(history["observed_days"], 1),
+                query_ms=round((loaded - started) * 1000, 1),
+                simulation_ms=round((time.perf_counter() - loaded) * 1000, 1),
+            )
+            self._cache.set(key, result)
+            return result
+
+    def snapshot(self) -> dict:
+        return self._cache.snapshot()
+
+
+forecast_cache = ForecastCache()
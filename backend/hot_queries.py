@@ -0,0 +1,209 @@
+"""
+Pre-built statements for the hot query paths.
+
+Each statement is constructed once at import time with named bound
+parameters, so a request only supplies parameter values. SQLAlchemy then
+reuses the same statement object (and its memoized cache key) and finds the
+compiled SQL in the engine's compiled cache instead of rebuilding and
+recompiling the query. The statements work with both Session and
+AsyncSession ``execute()``.
+
+Cache hit/miss counts are reported under ``statement_cache`` in /health/db.
+
+Read paths that must also find archived bookings (detail, comments, audit
+log, export) have ARCHIVED_* counterparts on the archive tables.
+"""
+
+from sqlalchemy import bindparam, case, func, select, union_all
+
+from enhanced_models import (
+    Booking,
+    BookingComment,
+    AuditLog,
+    ArchivedBooking,
+    ArchivedBookingComment,
+    ArchivedAuditLog,
+)
+
+ACTIVE_ICU_STATUSES = ("pending", "no_bed_available")
+# Outcomes after which an OR booking no longer blocks a new one for the MRN
+FINAL_OR_OUTCOMES = ("cancelled", "executed", "OR Done", "completed")
+
+BOOKING_BY_ID = select(Booking).where(Booking.id == bindparam("booking_id")).limit(1)
+
+BOOKING_BY_ID_AND_TYPE = (
+    select(Booking)
+    .where(
+        Booking.id == bindparam("booking_id"),
+        Booking.type_of_booking == bindparam("booking_type"),
+    )
+    .limit(1)
+)
+
+# has_active_booking("OR"): any active booking without an outcome
+ACTIVE_OR_BY_MRN = (
+    select(Booking)
+    .where(
+        Booking.mrn == bindparam("mrn"),
+        Booking.type_of_booking == "OR",
+        Booking.is_active == True,
+        Booking.outcome.is_(None),
+    )
+    .limit(1)
+)
+
+# has_active_booking("ICU") and check-mrn/icu: request still waiting for a bed
+ACTIVE_ICU_BY_MRN = (
+    select(Booking)
+    .where(
+        Booking.mrn == bindparam("mrn"),
+        Booking.type_of_booking == "ICU",
+        Booking.is_active == True,
+        Booking.status.in_(ACTIVE_ICU_STATUSES),
+    )
+    .limit(1)
+)
+
+# check-mrn/or: outcome missing or not yet final
+OPEN_OR_BY_MRN = (
+    select(Booking)
+    .where(
+        Booking.mrn == bindparam("mrn"),
+        Booking.type_of_booking == "OR",
+        Booking.is_active == True,
+        ~Booking.outcome.in_(FINAL_OR_OUTCOMES) | (Booking.outcome == None),
+    )
+    .limit(1)
+)
+
+ACTIVE_BY_TYPE = (
+    select(Booking)
+    .where(
+        Booking.type_of_booking == bindparam("booking_type"),
+        Booking.is_active == True,
+    )
+    .order_by(Booking.created_at.desc())
+)
+
+COMMENTS_BY_BOOKING = (
+    select(BookingComment)
+    .where(BookingComment.booking_id == bindparam("booking_id"))
+    .order_by(BookingComment.created_at.asc())
+)
+
+COMMENTS_BY_BOOKING_AND_CONTEXT = (
+    select(BookingComment)
+    .where(
+        BookingComment.booking_id == bindparam("booking_id"),
+        BookingComment.context == bindparam("context"),
+    )
+    .order_by(BookingComment.created_at.asc())
+)
+
+AUDIT_BY_BOOKING = (
+    select(AuditLog)
+    .where(AuditLog.booking_id == bindparam("booking_id"))
+    .order_by(AuditLog.timestamp.desc())
+)
+
+ARCHIVED_BOOKING_BY_ID = (
+    select(ArchivedBooking).where(ArchivedBooking.id == bindparam("booking_id")).limit(1)
+)
+
+ARCHIVED_BOOKING_BY_ID_AND_TYPE = (
+    select(ArchivedBooking)
+    .where(
+        ArchivedBooking.id == bindparam("booking_id"),
+        ArchivedBooking.type_of_booking == bindparam("booking_type"),
+    )
+    .limit(1)
+)
+
+ARCHIVED_COMMENTS_BY_BOOKING = (
+    select(ArchivedBookingComment)
+    .where(ArchivedBookingComment.booking_id == bindparam("booking_id"))
+    .order_by(ArchivedBookingComment.created_at.asc())
+)
+
+ARCHIVED_COMMENTS_BY_BOOKING_AND_CONTEXT = (
+    select(ArchivedBookingComment)
+    .where(
+        ArchivedBookingComment.booking_id == bindparam("booking_id"),
+        ArchivedBookingComment.context == bindparam("context"),
+    )
+    .order_by(ArchivedBookingComment.created_at.asc())
+)
+
+ARCHIVED_AUDIT_BY_BOOKING = (
+    select(ArchivedAuditLog)
+    .where(ArchivedAuditLog.booking_id == bindparam("booking_id"))
+    .order_by(ArchivedAuditLog.timestamp.desc())
+)
+
+
+def _export_range(table):
+    # Same column list for the hot and archive table so the two can be unioned
+    columns = [table.c[column.name] for column in Booking.__table__.columns]
+    return select(*columns).where(
+        table.c.type_of_booking == bindparam("booking_type"),
+        table.c.created_at >= bindparam("first_day"),
+        table.c.created_at <= bindparam("last_day"),
+    )
+
+
+# Registry exports cover archived bookings too. Returns rows (not Booking
+# objects) with the same attribute names.
+EXPORT_BY_TYPE_AND_RANGE = union_all(
+    _export_range(Booking.__table__),
+    _export_range(ArchivedBooking.__table__),
+).order_by("created_at")
+
+# Dashboard summary in one aggregate round trip
+STATS_SUMMARY = select(
+    func.count(),
+    func.sum(case((Booking.type_of_booking == "OR", 1), else_=0)),
+    func.sum(case((Booking.type_of_booking == "ICU", 1), else_=0)),
+    func.sum(case((Booking.status == "pending", 1), else_=0)),
+).where(Booking.is_active == True)
+
+ACTIVE_BY_MRN = {
+    "OR": ACTIVE_OR_BY_MRN,
+    "ICU": ACTIVE_ICU_BY_MRN,
+}
+
+
+def booking_statement(booking_id: int, expected_type=None, archived=False):
+    """Statement and parameters for a booking lookup by id (and type)."""
+    if expected_type:
+        stmt = ARCHIVED_BOOKING_BY_ID_AND_TYPE if archived else BOOKING_BY_ID_AND_TYPE
+        return stmt, {"booking_id": booking_id, "booking_type": expected_type}
+    stmt = ARCHIVED_BOOKING_BY_ID if archived else BOOKING_BY_ID
+    return stmt, {"booking_id": booking_id}
+
+
+def comments_statement(booking_id: int, context=None, archived=False):
+    """Statement and parameters for a booking's comments, oldest first."""
+    if context:
+        stmt = (
+            ARCHIVED_COMMENTS_BY_BOOKING_AND_CONTEXT
+            if archived
+            else COMMENTS_BY_BOOKING_AND_CONTEXT
+        )
+        return stmt, {"booking_id": booking_id, "context": context}
+    stmt = ARCHIVED_COMMENTS_BY_BOOKING if archived else COMMENTS_BY_BOOKING
+    return stmt, {"booking_id": booking_id}
+
+
+def audit_statement(archived=False):
+    return ARCHIVED_AUDIT_BY_BOOKING if archived else AUDIT_BY_BOOKING
+
+
+def stats_summary(row) -> dict:
+    """Shape a STATS_SUMMARY result row as the /bookings/stats/summary body."""
+    total, or_count, icu_count, pending = row
+    return {
+        "total_active_bookings": total or 0,
+        "or_bookings": or_count or 0,
+        "icu_bookings": icu_count or 0,
+        "pending_bookings": pending or 0,
+    }
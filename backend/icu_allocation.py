@@ -0,0 +1,161 @@
+"""
+ICU bed allocation.
+
+Pending ICU requests (status in ACTIVE_ICU_STATUSES) wait in a priority queue
+ordered by
+
+1. urgency: critical before elective,
+2. requested date, or the creation time for requests without one,
+3. creation time, so the longest waiting request wins ties.
+
+The queue (booking_queue.BookingQueue) is loaded at startup, follows committed
+booking changes and is reloaded with the bed index every
+ICU_BED_RECONCILE_SECONDS. The best request for a bed is the head of the heap:
+finding it costs O(log n), amortised over the lazy removal of requests that
+left the queue.
+
+``GET /api/icu/allocation/preview`` pairs the free beds with the requests at
+the head of the queue. With ICU_AUTO_ALLOCATE=true the API also applies these
+pairings every ICU_ALLOCATION_INTERVAL_SECONDS. It reserves the bed and
+confirms the request the same way ``POST /api/icu-requests/{id}/confirm``
+does. ``simulate_allocation.py`` replays historical requests through the same
+queue.
+"""
+
+import logging
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import select
+
+from booking_events import on_booking_committed
+from booking_queue import BookingQueue
+from database import env_bool, env_int
+from enhanced_models import AuditLog, Booking, naive_riyadh, now_riyadh
+from hot_queries import ACTIVE_ICU_STATUSES
+from icu_beds import BedTakenError, UnknownBedError, bed_occupancy, occupy_bed
+from mrn_index import is_active_icu
+
+logger = logging.getLogger(__name__)
+
+ICU_AUTO_ALLOCATE = env_bool("ICU_AUTO_ALLOCATE", False)
+ICU_ALLOCATION_INTERVAL_SECONDS = env_int("ICU_ALLOCATION_INTERVAL_SECONDS", 15)
+
+URGENCY_RANK = {"critical": 0, "elective": 1}
+
+QUEUE_COLUMNS = [
+    Booking.id,
+    Booking.type_of_booking,
+    Booking.is_active,
+    Booking.status,
+    Booking.mrn,
+    Booking.patient_name,
+    Booking.urgency,
+    Booking.requested_date,
+    Booking.created_at,
+]
+
+PENDING_ICU_REQUESTS = select(*QUEUE_COLUMNS).where(
+    Booking.type_of_booking == "ICU",
+    Booking.is_active == True,
+    Booking.status.in_(ACTIVE_ICU_STATUSES),
+)
+
+
+def priority(values) -> Tuple:
+    """Sort key of a pending request: lower is allocated first."""
+    created_at = naive_riyadh(values.get("created_at")) or datetime.max
+    due = naive_riyadh(values.get("requested_date")) or created_at
+    rank = URGENCY_RANK.get((values.get("urgency") or "").lower(), len(URGENCY_RANK))
+    return (rank, due, created_at, values["id"])
+
+
+def request_summary(values) -> dict:
+    return {
+        "id": values["id"],
+        "mrn": values.get("mrn"),
+        "patient_name": values.get("patient_name"),
+        "urgency": values.get("urgency"),
+        "requested_date": naive_riyadh(values.get("requested_date")),
+        "created_at": naive_riyadh(values.get("created_at")),
+    }
+
+
+pending_queue = BookingQueue(PENDING_ICU_REQUESTS, is_active_icu, priority, request_summary)
+
+
+@on_booking_committed
+def _track_request(change):
+    pending_queue.apply(change)
+
+
+@bed_occupancy.on_bed_freed
+def _propose_for_freed_bed(bed):
+    request = pending_queue.peek()
+    if request is not None:
+        logger.info(
+            "ICU bed %s %s is free; next request in queue: #%s (%s)",
+            bed["unit"],
+            bed["room"],
+            request["id"],
+            request["urgency"],
+        )
+
+
+def proposals(free_beds: Iterable[dict]) -> List[Tuple[dict, dict]]:
+    """Pair free beds, in order, with the requests at the head of the queue."""
+    free_beds = list(free_beds)
+    return list(zip(free_beds, pending_queue.top(len(free_beds))))
+
+
+def confirm_allocation(db, booking_id: int, bed: dict) -> bool:
+    """Reserve ``bed`` for the request and confirm it; the caller's session commits.
+
+    Returns False if the request is no longer pending. Raises BedTakenError
+    if the bed was taken in the meantime.
+    """
+    booking = db.get(Booking, booking_id)
+    if booking is None or not (
+        booking.type_of_booking == "ICU"
+        and booking.is_active
+        and booking.status in ACTIVE_ICU_STATUSES
+    ):
+        pending_queue.remove(booking_id)
+        return False
+
+    occupy_bed(db, bed["unit"], bed["room"], booking.id)
+    old_value = f"{booking.status},{booking.unit},{booking.room}"
+    booking.status = "confirmed"
+    booking.unit = bed["unit"]
+    booking.room = bed["room"]
+    booking.last_updated_at = now_riyadh()
+    db.add(
+        AuditLog(
+            booking_id=booking.id,
+            action="confirmed",
+            field_changed="status,unit,room",
+            old_value=old_value,
+            new_value=f"confirmed,{bed['unit']},{bed['room']}",
+            changed_by_name="ICU allocation",
+            changed_by_role="system",
+            notes=f"ICU bed allocated in {bed['unit']}, {bed['room']}",
+        )
+    )
+    return True
+
+
+def allocate_free_beds(session_factory) -> int:
+    """Apply every current proposal; returns the number of confirmed requests."""
+    confirmed = 0
+    for bed, request in proposals(bed_occupancy.free_beds()):
+        with session_factory() as db:
+            try:
+                if confirm_allocation(db, request["id"], bed):
+                    db.commit()
+                    confirmed += 1
+            except (BedTakenError, UnknownBedError):
+                # Taken by a manual confirm or another worker; next round
+                db.rollback()
+    if confirmed:
+        logger.info("Allocated %d ICU bed(s)", confirmed)
+    return confirmed
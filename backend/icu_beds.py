@@ -0,0 +1,274 @@
+"""
+ICU bed inventory and occupancy.
+
+Beds live in ``icu_beds`` (unit, room, state, occupying booking). Confirming an
+ICU request reserves its bed with a conditional UPDATE in the confirm
+transaction, so two concurrent confirms for the same bed cannot both succeed:
+the loser gets BedTakenError (409). The bed is released again when the request
+gets a releasing outcome (ICU_RELEASE_OUTCOMES), is discharged or deleted, or
+is confirmed to another bed.
+
+Units without any beds in the inventory stay unmanaged: confirms there keep
+the old free-text behaviour. An unknown room in a managed unit is rejected.
+
+``GET /api/icu/beds/free`` is answered from an in-process occupancy index.
+Bed changes are applied to it when their transaction commits, and the index
+is reloaded every ICU_BED_RECONCILE_SECONDS to pick up other workers' changes.
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, event, or_, select, update
+from sqlalchemy.orm import Session
+
+from database import env_int
+from enhanced_models import ICUBed, ICUBedState, now_riyadh
+
+logger = logging.getLogger(__name__)
+
+ICU_BED_RECONCILE_SECONDS = env_int("ICU_BED_RECONCILE_SECONDS", 30)
+
+# ICU outcomes after which the reserved bed is no longer needed
+ICU_RELEASE_OUTCOMES = ("Back to Ward", "OR Cancelled")
+
+FREE = ICUBedState.FREE.value
+OCCUPIED = ICUBedState.OCCUPIED.value
+OUT_OF_SERVICE = ICUBedState.OUT_OF_SERVICE.value
+
+_PENDING_KEY = "icu_bed_changes"
+
+BED_COLUMNS = [ICUBed.id, ICUBed.unit, ICUBed.room, ICUBed.state, ICUBed.booking_id]
+
+ALL_BEDS = select(*BED_COLUMNS).order_by(ICUBed.unit, ICUBed.room)
+
+BED_BY_LOCATION = select(*BED_COLUMNS).where(
+    ICUBed.unit == bindparam("unit"), ICUBed.room == bindparam("room")
+)
+
+UNIT_HAS_BEDS = select(ICUBed.id).where(ICUBed.unit == bindparam("unit")).limit(1)
+
+BEDS_HELD_BY = select(ICUBed.id).where(ICUBed.booking_id == bindparam("occupant"))
+
+FREE_BEDS = (
+    select(ICUBed.id, ICUBed.unit, ICUBed.room)
+    .where(ICUBed.state == FREE)
+    .order_by(ICUBed.unit, ICUBed.room)
+)
+
+# Succeeds only if the bed is free (or already held by the same request)
+OCCUPY_BED = (
+    update(ICUBed)
+    .where(
+        ICUBed.id == bindparam("bed_id"),
+        or_(
+            ICUBed.state == FREE,
+            (ICUBed.state == OCCUPIED) & (ICUBed.booking_id == bindparam("occupant")),
+        ),
+    )
+    .values(
+        state=OCCUPIED,
+        booking_id=bindparam("occupant"),
+        occupied_since=bindparam("now"),
+        updated_at=bindparam("now"),
+    )
+    .execution_options(synchronize_session=False)
+)
+
+RELEASE_BEDS = (
+    update(ICUBed)
+    .where(ICUBed.id.in_(bindparam("bed_ids", expanding=True)))
+    .values(state=FREE, booking_id=None, occupied_since=None, updated_at=bindparam("now"))
+    .execution_options(synchronize_session=False)
+)
+
+# Out of service and back; never touches an occupied bed
+SET_SERVICE_STATE = (
+    update(ICUBed)
+    .where(ICUBed.id == bindparam("bed_id"), ICUBed.state != OCCUPIED)
+    .values(state=bindparam("new_state"), updated_at=bindparam("now"))
+    .execution_options(synchronize_session=False)
+)
+
+
+class UnknownBedError(LookupError):
+    """The room is not in the inventory of a managed unit."""
+
+
+class BedTakenError(Exception):
+    """The bed is occupied by another request or out of service."""
+
+    def __init__(self, bed):
+        super().__init__(f"Bed {bed['unit']} {bed['room']} is not free")
+        self.bed = bed
+
+
+# -- transactional helpers (the caller commits) -----------------------------
+
+
+def _queue(db, bed_id: int, state: str, booking_id: Optional[int], unit=None, room=None):
+    db.info.setdefault(_PENDING_KEY, []).append((bed_id, state, booking_id, unit, room))
+
+
+def occupy_bed(db, unit: str, room: str, booking_id: int) -> Optional[int]:
+    """Reserve the bed at unit/room for ``booking_id``.
+
+    Returns the bed id, or None for a unit that is not in the inventory.
+    Raises UnknownBedError or BedTakenError; other beds held by the request
+    are released.
+    """
+    bed = db.execute(BED_BY_LOCATION, {"unit": unit, "room": room}).mappings().first()
+    if bed is None:
+        if db.execute(UNIT_HAS_BEDS, {"unit": unit}).first() is not None:
+            raise UnknownBedError(f"No bed {room} in ICU unit {unit}")
+        return None
+
+    now = now_riyadh()
+    result = db.execute(OCCUPY_BED, {"bed_id": bed["id"], "occupant": booking_id, "now": now})
+    if result.rowcount != 1:
+        raise BedTakenError(bed)
+    _queue(db, bed["id"], OCCUPIED, booking_id)
+    release_beds(db, booking_id, keep=bed["id"])
+    return bed["id"]
+
+
+def release_beds(db, booking_id: int, keep: Optional[int] = None) -> List[int]:
+    """Free every bed held by ``booking_id`` (except ``keep``)."""
+    bed_ids = [
+        bed_id
+        for bed_id in db.execute(BEDS_HELD_BY, {"occupant": booking_id}).scalars()
+        if bed_id != keep
+    ]
+    if bed_ids:
+        db.execute(RELEASE_BEDS, {"bed_ids": bed_ids, "now": now_riyadh()})
+        for bed_id in bed_ids:
+            _queue(db, bed_id, FREE, None)
+    return bed_ids
+
+
+def set_service_state(db, bed_id: int, state: str) -> bool:
+    """Take a bed out of service or back; False if it is occupied."""
+    result = db.execute(
+        SET_SERVICE_STATE, {"bed_id": bed_id, "new_state": state, "now": now_riyadh()}
+    )
+    if result.rowcount != 1:
+        return False
+    _queue(db, bed_id, state, None)
+    return True
+
+
+def add_bed(db, unit: str, room: str) -> ICUBed:
+    bed = ICUBed(unit=unit, room=room, state=FREE)
+    db.add(bed)
+    db.flush()
+    _queue(db, bed.id, FREE, None, unit, room)
+    return bed
+
+
+# -- occupancy index ----------------------------------------------------------
+
+
+class BedOccupancy:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._beds: Dict[int, dict] = {}
+        self._free: Dict[str, Dict[int, str]] = {}  # unit -> {bed id: room}
+        self._loading = False
+        self._pending = []
+        self._freed_listeners = []
+        self.ready = False
+
+    def on_bed_freed(self, fn):
+        """Register ``fn(bed)`` to run when a committed change frees a bed."""
+        self._freed_listeners.append(fn)
+        return fn
+
+    def _set(self, beds, free, bed_id, state, booking_id, unit=None, room=None):
+        """Apply one bed change; returns the bed if it just became free."""
+        bed = beds.get(bed_id)
+        if bed is None:
+            if unit is None:
+                return None  # added by another worker; arrives with the next reload
+            bed = beds[bed_id] = {"id": bed_id, "unit": unit, "room": room}
+        freed = state == FREE and bed.get("state") != FREE
+        bed["state"] = state
+        bed["booking_id"] = booking_id
+        if state == FREE:
+            free.setdefault(bed["unit"], {})[bed_id] = bed["room"]
+        else:
+            unit_free = free.get(bed["unit"])
+            if unit_free is not None:
+                unit_free.pop(bed_id, None)
+        return {"id": bed_id, "unit": bed["unit"], "room": bed["room"]} if freed else None
+
+    def apply(self, bed_id, state, booking_id, unit=None, room=None):
+        with self._lock:
+            if self._loading:
+                self._pending.append((bed_id, state, booking_id, unit, room))
+            freed = self._set(self._beds, self._free, bed_id, state, booking_id, unit, room)
+        if freed is not None:
+            for listener in self._freed_listeners:
+                try:
+                    listener(freed)
+                except Exception:
+                    logger.exception("Bed freed listener %s failed", listener.__name__)
+
+    def free_beds(self, unit: Optional[str] = None) -> List[dict]:
+        """Free beds (of one unit), ordered by unit and room."""
+        with self._lock:
+            units = [unit] if unit is not None else sorted(self._free)
+            return [
+                {"id": bed_id, "unit": name, "room": room}
+                for name in units
+                for bed_id, room in sorted(
+                    self._free.get(name, {}).items(), key=lambda item: item[1]
+                )
+            ]
+
+    def load(self, session_factory):
+        """Rebuild from the database."""
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            with session_factory() as db:
+                rows = db.execute(ALL_BEDS).all()
+        except Exception:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+            raise
+
+        beds, free = {}, {}
+        for bed_id, unit, room, state, booking_id in rows:
+            self._set(beds, free, bed_id, state, booking_id, unit, room)
+        with self._lock:
+            # Changes committed while the snapshot was read win over it
+            for change in self._pending:
+                self._set(beds, free, *change)
+            self._beds, self._free = beds, free
+            self._loading = False
+            self._pending = []
+            self.ready = True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            states = {FREE: 0, OCCUPIED: 0, OUT_OF_SERVICE: 0}
+            for bed in self._beds.values():
+                states[bed["state"]] = states.get(bed["state"], 0) + 1
+            return {"ready": self.ready, "beds": len(self._beds), **states}
+
+
+bed_occupancy = BedOccupancy()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    for change in session.info.pop(_PENDING_KEY, None) or ():
+        bed_occupancy.apply(*change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(_PENDING_KEY, None)
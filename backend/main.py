@@ -5,8 +5,10 @@ from datetime import datetime
 from typing import List, Optional
 import uvicorn
 import uuid
+from contextlib import asynccontextmanager
 
 from database import get_db, engine
+from migrations import ensure_schema_current
 from models import ORBooking, ICUBedRequest, Comment, Base, ICUStatus
 from schemas import (
     ORBookingCreate, ORBookingResponse, ORBookingUpdate,
@@ -14,10 +16,15 @@ from schemas import (
     CommentCreate, CommentResponse
 )
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="VitalFlow API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tables are created by `python migrate.py --app v1`
+    ensure_schema_current(engine, "v1")
+    yield
+
+
+app = FastAPI(title="VitalFlow API", version="1.0.0", lifespan=lifespan)
 
 # CORS for Flutter web
 app.add_middleware(
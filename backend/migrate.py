@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Schema Migration Command
+Applies pending schema revisions (see migrations.py). Run it once per deploy,
+before starting the API workers.
+
+Usage:
+    python migrate.py                 # upgrade the enhanced schema
+    python migrate.py --status        # show current and head revisions
+    python migrate.py --app v1        # main.py schema
+    python migrate.py --app simple    # simple_main.py schema
+"""
+
+import argparse
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine
+from migrations import REVISIONS, current_version, head_version, migrate
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Apply VitalFlow schema migrations")
+    parser.add_argument(
+        "--app",
+        default="enhanced",
+        choices=sorted(REVISIONS),
+        help="schema component to migrate (default: enhanced)",
+    )
+    parser.add_argument(
+        "--status",
+        action="store_true",
+        help="only print the current and head revisions",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    current = current_version(engine, args.app)
+    head = head_version(args.app)
+    print(f"{args.app} schema: revision {current} (head {head})")
+
+    if args.status:
+        for rev in REVISIONS[args.app]:
+            marker = "✓" if rev.version <= current else " "
+            print(f"  [{marker}] {rev.version}: {rev.description}")
+        return 0 if current == head else 1
+
+    if current > head:
+        print("✗ Database is newer than this code; refusing to migrate")
+        return 1
+    if current == head:
+        print("✓ Already up to date")
+        return 0
+
+    version = migrate(engine, args.app)
+    print(f"✓ Migrated {args.app} schema to revision {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
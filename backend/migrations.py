@@ -0,0 +1,800 @@
+"""
+Versioned schema migrations.
+
+Each app's schema ("component") has an ordered list of revisions. The
+``schema_version`` table stores one row per component with the last applied
+revision, so a worker only has to read that single row at startup instead of
+reflecting every table. Schema changes are applied explicitly:
+
+    python migrate.py                 # upgrade the enhanced schema
+    python migrate.py --status        # show current and head revisions
+    python migrate.py --app v1        # schema used by main.py
+    python migrate.py --app simple    # schema used by simple_main.py
+
+Set DB_AUTO_MIGRATE=true to let a single-process deployment (SQLite, local
+development) apply pending revisions at startup instead of refusing to start.
+
+Adding a revision: write a function taking a Connection and decorate it with
+``@revision(component, version, description)`` using the next version number.
+Revisions must be safe to re-run on databases that already contain the change
+(checkfirst / IF NOT EXISTS), since older deployments were set up by hand from
+database_migration.sql.
+
+A revision must not build tables from the ORM models: those describe the head
+schema, so an old revision replayed on a new database would create columns
+and indexes that later revisions add again (or that no longer exist). Each
+revision declares the tables as they were when it was written, in its own
+MetaData, and is never edited afterwards.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+    inspect,
+    select,
+    text,
+    true,
+)
+from sqlalchemy.exc import DBAPIError
+
+from database import env_bool
+
+logger = logging.getLogger(__name__)
+
+DB_AUTO_MIGRATE = env_bool("DB_AUTO_MIGRATE", False)
+
+version_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("component", String(50), primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("description", String(200)),
+    Column("applied_at", DateTime),
+)
+
+
+class SchemaVersionError(RuntimeError):
+    """The database schema does not match the revision this code expects."""
+
+
+@dataclass(frozen=True)
+class Revision:
+    component: str
+    version: int
+    description: str
+    upgrade: Callable
+
+
+REVISIONS: Dict[str, List[Revision]] = {}
+
+
+def revision(component: str, version: int, description: str):
+    """Register ``fn(connection)`` as revision ``version`` of ``component``."""
+
+    def decorator(fn):
+        revisions = REVISIONS.setdefault(component, [])
+        expected = len(revisions) + 1
+        if version != expected:
+            raise ValueError(
+                f"{component} revision {version} registered out of order "
+                f"(expected {expected})"
+            )
+        revisions.append(Revision(component, version, description, fn))
+        return fn
+
+    return decorator
+
+
+def head_version(component: str) -> int:
+    return len(REVISIONS.get(component, []))
+
+
+def current_version(engine, component: str) -> int:
+    """Stored revision for ``component``; 0 when nothing was ever applied.
+
+    This is the only query the startup check runs.
+    """
+    try:
+        with engine.connect() as connection:
+            version = connection.execute(
+                select(schema_version.c.version).where(
+                    schema_version.c.component == component
+                )
+            ).scalar()
+    except DBAPIError:
+        # schema_version does not exist yet
+        return 0
+    return version or 0
+
+
+def migrate(engine, component: str = "enhanced") -> int:
+    """Apply every pending revision of ``component``; returns the new version.
+
+    Each revision runs in its own transaction together with the version bump,
+    so a failed revision leaves the stored version at the last good one.
+    """
+    version_metadata.create_all(engine)
+
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # Serialize concurrent migrate runs (e.g. several containers booting)
+            connection.execute(text("SELECT pg_advisory_lock(hashtext('vitalflow_migrate'))"))
+            connection.commit()
+        try:
+            version = connection.execute(
+                select(schema_version.c.version).where(
+                    schema_version.c.component == component
+                )
+            ).scalar()
+            connection.commit()
+            exists = version is not None
+            version = version or 0
+
+            for rev in REVISIONS.get(component, [])[version:]:
+                logger.info(
+                    "Applying %s revision %d: %s", component, rev.version, rev.description
+                )
+                with connection.begin():
+                    rev.upgrade(connection)
+                    values = {
+                        "version": rev.version,
+                        "description": rev.description,
+                        "applied_at": datetime.utcnow(),
+                    }
+                    if exists:
+                        connection.execute(
+                            schema_version.update()
+                            .where(schema_version.c.component == component)
+                            .values(**values)
+                        )
+                    else:
+                        connection.execute(
+                            schema_version.insert().values(component=component, **values)
+                        )
+                        exists = True
+                version = rev.version
+        finally:
+            if connection.dialect.name == "postgresql":
+                connection.execute(
+                    text("SELECT pg_advisory_unlock(hashtext('vitalflow_migrate'))")
+                )
+                connection.commit()
+
+    return version
+
+
+def ensure_schema_current(engine, component: str = "enhanced") -> int:
+    """Startup check: compare the stored revision with the code's head revision.
+
+    Raises SchemaVersionError when the database is behind (unless
+    DB_AUTO_MIGRATE is set) or ahead of this code.
+    """
+    head = head_version(component)
+    version = current_version(engine, component)
+    if version == head:
+        return version
+    if version > head:
+        raise SchemaVersionError(
+            f"Database {component} schema is at revision {version}, newer than "
+            f"this code ({head}). Deploy the matching backend version."
+        )
+    if DB_AUTO_MIGRATE:
+        logger.warning(
+            "Database %s schema at revision %d, migrating to %d (DB_AUTO_MIGRATE)",
+            component,
+            version,
+            head,
+        )
+        return migrate(engine, component)
+    raise SchemaVersionError(
+        f"Database {component} schema is at revision {version}, expected {head}. "
+        f"Run `python migrate.py --app {component}` before starting the server."
+    )
+
+
+# =============================================================================
+# Helpers for revisions
+# =============================================================================
+
+def _quote(connection, name: str) -> str:
+    return connection.dialect.identifier_preparer.quote(name)
+
+
+def add_missing_columns(connection, table):
+    """ALTER TABLE ... ADD COLUMN for model columns missing from the database."""
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.execute(
+            text(
+                f"ALTER TABLE {_quote(connection, table.name)} "
+                f"ADD COLUMN {_quote(connection, column.name)} {column_type}"
+            )
+        )
+        logger.info("Added %s.%s", table.name, column.name)
+
+
+def create_index_if_missing(connection, name, table_name, columns, where=None):
+    """Create a plain (optionally partial) index unless one with the name exists."""
+    existing = {index["name"] for index in inspect(connection).get_indexes(table_name)}
+    if name in existing:
+        return
+    column_sql = ", ".join(columns)
+    sql = f"CREATE INDEX {name} ON {_quote(connection, table_name)} ({column_sql})"
+    if where and connection.dialect.name in ("postgresql", "sqlite"):
+        sql += f" WHERE {where}"
+    connection.execute(text(sql))
+
+
+def create_tables(connection, metadata, table_names, add_columns=False):
+    """Create the named tables (if missing) and all of their declared indexes.
+
+    With ``add_columns``, tables that already exist also get any model columns
+    they lack before the indexes (which may reference them) are created.
+    """
+    tables = [metadata.tables[name] for name in table_names]
+    metadata.create_all(connection, tables=tables)
+    if add_columns:
+        for table in tables:
+            add_missing_columns(connection, table)
+    for table in tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+# =============================================================================
+# enhanced schema (enhanced_main.py / async_main.py)
+# =============================================================================
+
+# Indexes created by database_migration.sql before they were declared on models
+LEGACY_SQL_INDEXES = [
+    ("idx_bookings_mrn", "bookings", ["mrn"], None),
+    ("idx_bookings_type_status", "bookings", ["type_of_booking", "status"], None),
+    ("idx_bookings_created_at", "bookings", ["created_at DESC"], None),
+    ("idx_bookings_active", "bookings", ["is_active"], None),
+    ("idx_bookings_unit", "bookings", ["unit"], "unit IS NOT NULL"),
+    ("idx_bookings_room", "bookings", ["room"], "room IS NOT NULL"),
+    ("idx_comments_booking_id", "booking_comments", ["booking_id"], None),
+    ("idx_audit_logs_booking_id", "audit_logs", ["booking_id"], None),
+]
+
+# Columns database_migration.sql converts to TIMESTAMPTZ (Riyadh time)
+TIMESTAMPTZ_COLUMNS = [
+    ("bookings", "created_at"),
+    ("bookings", "last_updated_at"),
+    ("bookings", "requested_date"),
+    ("booking_comments", "created_at"),
+    ("user_sessions", "last_login"),
+    ("audit_logs", "timestamp"),
+    ("system_settings", "updated_at"),
+]
+
+
+def _enhanced_v1_tables() -> MetaData:
+    """bookings, booking_comments, user_sessions, audit_logs, system_settings."""
+    metadata = MetaData()
+    bookings = Table("bookings", metadata, *_booking_columns())
+    booking_comments = Table(
+        "booking_comments",
+        metadata,
+        *_booking_comment_columns(),
+    )
+    Table(
+        "user_sessions",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("user_name", String(100), nullable=False),
+        Column("user_role", String(50), nullable=False),
+        Column("last_login", DateTime),
+        Column("is_active", Boolean),
+    )
+    audit_logs = Table("audit_logs", metadata, *_audit_log_columns())
+    Table(
+        "system_settings",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("setting_key", String(100), unique=True, nullable=False),
+        Column("setting_value", Text, nullable=False),
+        Column("updated_at", DateTime),
+    )
+
+    Index(
+        "ix_bookings_active_mrn_type",
+        bookings.c.mrn,
+        bookings.c.type_of_booking,
+        postgresql_where=bookings.c.is_active == true(),
+        sqlite_where=bookings.c.is_active == true(),
+    )
+    Index(
+        "ix_bookings_active_type_created",
+        bookings.c.type_of_booking,
+        bookings.c.created_at,
+        postgresql_where=bookings.c.is_active == true(),
+        sqlite_where=bookings.c.is_active == true(),
+    )
+    Index("ix_bookings_type_created", bookings.c.type_of_booking, bookings.c.created_at)
+    Index(
+        "ix_booking_comments_booking_created",
+        booking_comments.c.booking_id,
+        booking_comments.c.created_at,
+    )
+    Index(
+        "ix_audit_logs_booking_timestamp",
+        audit_logs.c.booking_id,
+        audit_logs.c.timestamp,
+    )
+    return metadata
+
+
+def _booking_columns():
+    return [
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("mrn", String(50)),
+        Column("patient_name", String(200)),
+        Column("patient_ward", String(100)),
+        Column("procedure", String(200)),
+        Column("type_of_booking", String(20)),
+        Column("urgency", String(10)),
+        Column("status", String(50)),
+        Column("outcome", String(20)),
+        Column("consultant", String(200)),
+        Column("consultant_phone", String(50)),
+        Column("requesting_physician", String(200)),
+        Column("created_at", DateTime),
+        Column("requesting_physician_phone", String(50)),
+        Column("anesthesia_team_contact", String(50)),
+        Column("indication", Text),
+        Column("requested_date", DateTime),
+        Column("last_updated_at", DateTime),
+        Column("created_by_uid", String(100)),
+        Column("created_by_name", String(100)),
+        Column("created_by_role", String(50)),
+        Column("updated_by_uid", String(100)),
+        Column("updated_by_name", String(100)),
+        Column("updated_by_role", String(50)),
+        Column("priority_notes", Text),
+        Column("special_requirements", Text),
+        Column("is_active", Boolean),
+        Column("unit", String(100)),
+        Column("room", String(100)),
+        Column("outcome_changed_at", DateTime),
+    ]
+
+
+def _booking_comment_columns(foreign_keys=True):
+    booking_id = [ForeignKey("bookings.id")] if foreign_keys else []
+    return [
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("booking_id", Integer, *booking_id, nullable=False),
+        Column("message", Text, nullable=False),
+        Column("context", String(20)),
+        Column("author_name", String(100), nullable=False),
+        Column("author_role", String(50), nullable=False),
+        Column("author_uid", String(100)),
+        Column("created_at", DateTime),
+        Column("is_internal", Boolean),
+    ]
+
+
+def _audit_log_columns(foreign_keys=True):
+    booking_id = [ForeignKey("bookings.id")] if foreign_keys else []
+    return [
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("booking_id", Integer, *booking_id),
+        Column("action", String(50)),
+        Column("field_changed", String(50)),
+        Column("old_value", String(200)),
+        Column("new_value", String(200)),
+        Column("changed_by_name", String(100)),
+        Column("changed_by_role", String(50)),
+        Column("timestamp", DateTime),
+        Column("notes", Text),
+    ]
+
+
+@revision("enhanced", 1, "Baseline schema (database_migration.sql)")
+def _enhanced_baseline(connection):
+    table_names = [
+        "bookings",
+        "booking_comments",
+        "user_sessions",
+        "audit_logs",
+        "system_settings",
+    ]
+    # Databases created by older versions may lack the enhanced columns
+    create_tables(connection, _enhanced_v1_tables(), table_names, add_columns=True)
+
+    for name, table_name, columns, where in LEGACY_SQL_INDEXES:
+        create_index_if_missing(connection, name, table_name, columns, where)
+
+    if connection.dialect.name == "postgresql":
+        for table_name, column_name in TIMESTAMPTZ_COLUMNS:
+            data_type = connection.execute(
+                text(
+                    "SELECT data_type FROM information_schema.columns "
+                    "WHERE table_name = :table AND column_name = :column"
+                ),
+                {"table": table_name, "column": column_name},
+            ).scalar()
+            if data_type == "timestamp without time zone":
+                connection.execute(
+                    text(
+                        f'ALTER TABLE {table_name} ALTER COLUMN "{column_name}" '
+                        f"TYPE TIMESTAMPTZ USING \"{column_name}\" AT TIME ZONE 'Asia/Riyadh'"
+                    )
+                )
+
+    # The default staff password row is not seeded here: the API creates a
+    # bcrypt-hashed default on first use instead of storing plaintext.
+
+
+def _archive_table(metadata, name, columns):
+    # Hot-table columns without constraints (rows keep their ids) plus archived_at
+    return Table(
+        name,
+        metadata,
+        *(
+            Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False)
+            for column in columns
+        ),
+        Column("archived_at", DateTime),
+    )
+
+
+@revision("enhanced", 2, "Archive tables for closed bookings")
+def _enhanced_archive_tables(connection):
+    metadata = MetaData()
+    bookings = _archive_table(metadata, "bookings_archive", _booking_columns())
+    comments = _archive_table(
+        metadata, "booking_comments_archive", _booking_comment_columns(foreign_keys=False)
+    )
+    audit_logs = _archive_table(
+        metadata, "audit_logs_archive", _audit_log_columns(foreign_keys=False)
+    )
+    Index(
+        "ix_bookings_archive_type_created",
+        bookings.c.type_of_booking,
+        bookings.c.created_at,
+    )
+    Index(
+        "ix_booking_comments_archive_booking_created",
+        comments.c.booking_id,
+        comments.c.created_at,
+    )
+    Index(
+        "ix_audit_logs_archive_booking_timestamp",
+        audit_logs.c.booking_id,
+        audit_logs.c.timestamp,
+    )
+
+    create_tables(
+        connection,
+        metadata,
+        ["bookings_archive", "booking_comments_archive", "audit_logs_archive"],
+    )
+
+
+# PostgreSQL tsvector per table; weights rank patient names above free text
+POSTGRES_SEARCH_VECTORS = {
+    "bookings": (
+        "setweight(to_tsvector('simple', coalesce(patient_name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(procedure, '') || ' ' || "
+        "coalesce(indication, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(priority_notes, '') || ' ' || "
+        "coalesce(special_requirements, '')), 'C')"
+    ),
+    "booking_comments": "to_tsvector('simple', coalesce(message, ''))",
+}
+
+# SQLite FTS5 tables: (fts table, content table, indexed columns)
+SQLITE_FTS_TABLES = [
+    (
+        "bookings_fts",
+        "bookings",
+        ["patient_name", "procedure", "indication", "priority_notes", "special_requirements"],
+    ),
+    ("booking_comments_fts", "booking_comments", ["message"]),
+]
+
+
+def _create_sqlite_fts(connection, fts, content, columns):
+    """External-content FTS5 table plus the triggers that keep it in sync."""
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete_row = (
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_row = f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});"
+
+    connection.execute(
+        text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{column_list}, content='{content}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+    )
+    connection.execute(
+        text(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {content} BEGIN {insert_row} END")
+    )
+    connection.execute(
+        text(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {content} BEGIN {delete_row} END")
+    )
+    connection.execute(
+        text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {content} "
+            f"BEGIN {delete_row} {insert_row} END"
+        )
+    )
+    # Index the rows that already exist
+    connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+@revision("enhanced", 3, "Full-text search indexes for bookings and comments")
+def _enhanced_search(connection):
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        # Generated columns stay in sync on every write without triggers.
+        # Adding one rewrites the table: schedule this revision off-peak.
+        for table_name, expression in POSTGRES_SEARCH_VECTORS.items():
+            connection.execute(
+                text(
+                    f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS search_vector "
+                    f"tsvector GENERATED ALWAYS AS ({expression}) STORED"
+                )
+            )
+            connection.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table_name}_search "
+                    f"ON {table_name} USING GIN (search_vector)"
+                )
+            )
+    elif dialect == "sqlite":
+        for fts, content, columns in SQLITE_FTS_TABLES:
+            _create_sqlite_fts(connection, fts, content, columns)
+    # Other databases use the LIKE fallback in search.py
+
+
+
+# Booking columns served by /api/typeahead/{field}
+TYPEAHEAD_COLUMNS = ["mrn", "patient_name", "consultant", "patient_ward"]
+
+
+@revision("enhanced", 4, "Typeahead indexes")
+def _enhanced_typeahead(connection):
+    if connection.dialect.name != "postgresql":
+        # SQLite and others use typeahead.py's in-memory prefix index
+        return
+
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        trigram = True
+    except DBAPIError:
+        logger.warning(
+            "pg_trgm could not be installed (needs a privileged role); "
+            "typeahead falls back to prefix-only indexes"
+        )
+        trigram = False
+
+    for column in TYPEAHEAD_COLUMNS:
+        if trigram:
+            # Serves both LIKE 'prefix%' and the % similarity operator
+            sql = (
+                f"CREATE INDEX IF NOT EXISTS ix_bookings_{column}_trgm "
+                f"ON bookings USING GIN (lower({column}) gin_trgm_ops)"
+            )
+        else:
+            sql = (
+                f"CREATE INDEX IF NOT EXISTS ix_bookings_{column}_prefix "
+                f"ON bookings (lower({column}) text_pattern_ops)"
+            )
+        connection.execute(text(sql))
+
+
+@revision("enhanced", 5, "User session indexes")
+def _enhanced_session_indexes(connection):
+    metadata = MetaData()
+    user_sessions = Table(
+        "user_sessions",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("user_name", String(100)),
+        Column("is_active", Boolean),
+        Column("last_login", DateTime),
+    )
+    # The table itself is created by revision 1
+    Index("ix_user_sessions_user_active", user_sessions.c.user_name, user_sessions.c.is_active)
+    Index(
+        "ix_user_sessions_active_last_login",
+        user_sessions.c.is_active,
+        user_sessions.c.last_login,
+    )
+    for index in user_sessions.indexes:
+        index.create(connection, checkfirst=True)
+
+
+@revision("enhanced", 6, "ICU bed inventory")
+def _enhanced_icu_beds(connection):
+    metadata = MetaData()
+    # Target of the foreign key only; created by revision 1
+    Table("bookings", metadata, Column("id", Integer, primary_key=True))
+    icu_beds = Table(
+        "icu_beds",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("unit", String(100), nullable=False),
+        Column("room", String(100), nullable=False),
+        Column("state", String(20), nullable=False),
+        Column("booking_id", Integer, ForeignKey("bookings.id")),
+        Column("occupied_since", DateTime),
+        Column("updated_at", DateTime),
+        UniqueConstraint("unit", "room", name="uq_icu_beds_unit_room"),
+    )
+    Index("ix_icu_beds_booking", icu_beds.c.booking_id)
+
+    create_tables(connection, metadata, ["icu_beds"])
+
+
+@revision("enhanced", 7, "SLA breach log")
+def _enhanced_sla_breaches(connection):
+    metadata = MetaData()
+    sla_breaches = Table(
+        "sla_breaches",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("booking_id", Integer, nullable=False),
+        Column("booking_type", String(20), nullable=False),
+        Column("mrn", String(50)),
+        Column("urgency", String(10)),
+        Column("status", String(50)),
+        Column("booking_created_at", DateTime),
+        Column("deadline", DateTime, nullable=False),
+        Column("detected_at", DateTime),
+        UniqueConstraint("booking_id", name="uq_sla_breaches_booking"),
+    )
+    Index("ix_sla_breaches_detected", sla_breaches.c.detected_at)
+    Index(
+        "ix_sla_breaches_type_detected",
+        sla_breaches.c.booking_type,
+        sla_breaches.c.detected_at,
+    )
+
+    create_tables(connection, metadata, ["sla_breaches"])
+
+
+# =============================================================================
+# v1 schema (main.py)
+# =============================================================================
+
+@revision("v1", 1, "Baseline schema (models.py)")
+def _v1_baseline(connection):
+    metadata = MetaData()
+    # Enum columns store the member names of the models.py enums
+    Table(
+        "or_bookings",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("mrn", String, nullable=False),
+        Column("patient_name", String),
+        Column("patient_ward", String),
+        Column("procedure", Text, nullable=False),
+        Column("urgency", Enum("E1", "E2", "E3", name="orurgency"), nullable=False),
+        Column(
+            "status",
+            Enum(
+                "PENDING",
+                "SEEN_ACCEPTED",
+                "AWAITING_RESOURCES",
+                "OPERATION_DONE",
+                "POSTPONED",
+                "CANCELLED",
+                name="orstatus",
+            ),
+        ),
+        Column("outcome", String),
+        Column("outcome_changed_at", DateTime),
+        Column("consultant", String, nullable=False),
+        Column("consultant_phone", String, nullable=False),
+        Column("requesting_physician", String, nullable=False),
+        Column("requesting_physician_phone", String, nullable=False),
+        Column("created_by_uid", String, nullable=False),
+        Column("created_by_name", String, nullable=False),
+        Column("created_by_role", String, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("last_updated_at", DateTime),
+    )
+    Table(
+        "icu_requests",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("mrn", String, nullable=False),
+        Column("patient_name", String),
+        Column("patient_ward", String),
+        Column("indication", Text, nullable=False),
+        Column("urgency", Enum("CRITICAL", "ELECTIVE", name="icuurgency"), nullable=False),
+        Column(
+            "status",
+            Enum(
+                "PENDING",
+                "CONFIRMED",
+                "NO_BED_AVAILABLE",
+                "NOT_REQUESTED",
+                name="icustatus",
+            ),
+        ),
+        Column("unit", String),
+        Column("room", String),
+        Column("outcome", String),
+        Column("consultant", String, nullable=False),
+        Column("consultant_phone", String, nullable=False),
+        Column("requesting_physician", String, nullable=False),
+        Column("requesting_physician_phone", String, nullable=False),
+        Column("requested_date", DateTime),
+        Column("created_by_uid", String, nullable=False),
+        Column("created_by_name", String, nullable=False),
+        Column("created_by_role", String, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("last_updated_at", DateTime),
+    )
+    Table(
+        "comments",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("booking_id", String, nullable=False),
+        Column("context", String, nullable=False),
+        Column("message", Text, nullable=False),
+        Column("author_uid", String, nullable=False),
+        Column("author_name", String, nullable=False),
+        Column("author_role", String, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+    )
+
+    create_tables(connection, metadata, ["or_bookings", "icu_requests", "comments"])
+
+
+# =============================================================================
+# simple schema (simple_main.py)
+# =============================================================================
+
+@revision("simple", 1, "Baseline schema (simple_models.py)")
+def _simple_baseline(connection):
+    metadata = MetaData()
+    Table(
+        "bookings",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("mrn", String(50)),
+        Column("patient_name", String(200)),
+        Column("procedure", String(200)),
+        Column("type_of_booking", String(20)),
+        Column("urgency", String(10)),
+        Column("status", String(50)),
+        Column("outcome", String(20)),
+        Column("consultant", String(200)),
+        Column("consultant_phone", String(50)),
+        Column("requesting_physician", String(200)),
+        Column("created_at", DateTime),
+    )
+
+    create_tables(connection, metadata, ["bookings"])
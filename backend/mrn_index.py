@@ -0,0 +1,227 @@
+"""
+In-process index of active bookings by (MRN, type).
+
+Serves the check-mrn endpoints, which the create screens call on every MRN
+change, without a database round trip. The index is
+
+* loaded at startup from the primary database,
+* updated from committed ORM writes in this process (booking_events),
+* reconciled with the database every MRN_INDEX_RECONCILE_SECONDS, which
+  also picks up writes made by other worker processes.
+
+It answers the "is there already a booking?" hint only. Creating a booking
+still checks the database (has_active_booking), so a stale entry can never
+allow a duplicate.
+
+"Active" follows the check-mrn definitions in hot_queries.py:
+  OR:  active and outcome missing or not final (FINAL_OR_OUTCOMES)
+  ICU: active and status in ACTIVE_ICU_STATUSES
+"""
+
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import or_, select
+
+from booking_events import on_booking_committed
+from database import env_int
+from enhanced_models import RIYADH_TZ, Booking
+from hot_queries import ACTIVE_ICU_STATUSES, FINAL_OR_OUTCOMES
+
+logger = logging.getLogger(__name__)
+
+MRN_INDEX_RECONCILE_SECONDS = env_int("MRN_INDEX_RECONCILE_SECONDS", 60)
+
+SUMMARY_COLUMNS = [
+    Booking.id,
+    Booking.mrn,
+    Booking.type_of_booking,
+    Booking.is_active,
+    Booking.patient_name,
+    Booking.procedure,
+    Booking.indication,
+    Booking.status,
+    Booking.outcome,
+    Booking.urgency,
+    Booking.created_at,
+    Booking.requested_date,
+]
+
+# Everything the index may hold; the Python predicates below narrow it down
+INDEXED_BOOKINGS = select(*SUMMARY_COLUMNS).where(
+    Booking.is_active == True,
+    Booking.mrn.isnot(None),
+    or_(
+        (Booking.type_of_booking == "OR")
+        & (~Booking.outcome.in_(FINAL_OR_OUTCOMES) | Booking.outcome.is_(None)),
+        (Booking.type_of_booking == "ICU") & Booking.status.in_(ACTIVE_ICU_STATUSES),
+    ),
+)
+
+
+def _isoformat(value):
+    # Riyadh time with its offset, whether the value is zoned or naive Riyadh wall time
+    if not value:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=RIYADH_TZ).isoformat()
+    return value.astimezone(RIYADH_TZ).isoformat()
+
+
+def is_open_or(values) -> bool:
+    return (
+        values.get("type_of_booking") == "OR"
+        and bool(values.get("is_active"))
+        and values.get("outcome") not in FINAL_OR_OUTCOMES
+    )
+
+
+def is_active_icu(values) -> bool:
+    return (
+        values.get("type_of_booking") == "ICU"
+        and bool(values.get("is_active"))
+        and values.get("status") in ACTIVE_ICU_STATUSES
+    )
+
+
+def or_summary(values) -> dict:
+    """``active_booking`` body of /api/check-mrn/or/{mrn}"""
+    return {
+        "id": values["id"],
+        "patient_name": values.get("patient_name"),
+        "procedure": values.get("procedure"),
+        "status": values.get("status"),
+        "outcome": values.get("outcome"),
+        "urgency": values.get("urgency"),
+        "created_at": _isoformat(values.get("created_at")),
+        "requested_date": _isoformat(values.get("requested_date")),
+    }
+
+
+def icu_summary(values) -> dict:
+    """``active_booking`` body of /api/check-mrn/icu/{mrn}"""
+    return {
+        "id": values["id"],
+        "patient_name": values.get("patient_name"),
+        "indication": values.get("indication"),
+        "status": values.get("status"),
+        "urgency": values.get("urgency"),
+        "created_at": _isoformat(values.get("created_at")),
+        "requested_date": _isoformat(values.get("requested_date")),
+    }
+
+
+def _entry(values) -> Optional[Tuple[Tuple[str, str], dict]]:
+    """Index key and summary for a booking, or None if it is not active."""
+    mrn = values.get("mrn")
+    if not mrn:
+        return None
+    if is_open_or(values):
+        return (mrn, "OR"), or_summary(values)
+    if is_active_icu(values):
+        return (mrn, "ICU"), icu_summary(values)
+    return None
+
+
+class ActiveMRNIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (mrn, type) -> {booking_id: summary}; several only for legacy duplicates
+        self._by_key: Dict[Tuple[str, str], Dict[int, dict]] = {}
+        self._key_of: Dict[int, Tuple[str, str]] = {}
+        self._loading = False
+        self._pending = []
+        self.ready = False
+        self.loads = 0
+        self.last_drift = 0
+
+    def lookup(self, mrn: str, booking_type: str) -> Optional[dict]:
+        """Summary of the active booking, lowest id first (like the DB check)."""
+        with self._lock:
+            bookings = self._by_key.get((mrn, booking_type))
+            if not bookings:
+                return None
+            return bookings[min(bookings)]
+
+    def _put(self, by_key, key_of, booking_id, entry):
+        old_key = key_of.pop(booking_id, None)
+        if old_key is not None:
+            bookings = by_key.get(old_key)
+            if bookings is not None:
+                bookings.pop(booking_id, None)
+                if not bookings:
+                    del by_key[old_key]
+        if entry is not None:
+            key, summary = entry
+            by_key.setdefault(key, {})[booking_id] = summary
+            key_of[booking_id] = key
+
+    def apply(self, change):
+        """Update the index from a committed booking change."""
+        booking_id = change.values.get("id")
+        if booking_id is None:
+            return
+        entry = None if change.action == "delete" else _entry(change.values)
+        with self._lock:
+            if self._loading:
+                # Replayed on top of the snapshot being loaded
+                self._pending.append((booking_id, entry))
+            self._put(self._by_key, self._key_of, booking_id, entry)
+
+    def load(self, session_factory) -> int:
+        """Rebuild from the database; returns the number of drifted entries."""
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            with session_factory() as db:
+                rows = db.execute(INDEXED_BOOKINGS).mappings().all()
+        except Exception:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+            raise
+
+        by_key, key_of = {}, {}
+        for row in rows:
+            self._put(by_key, key_of, row["id"], _entry(row))
+
+        with self._lock:
+            # Changes committed while the snapshot was read win over it
+            for booking_id, entry in self._pending:
+                self._put(by_key, key_of, booking_id, entry)
+            drift = 0
+            if self.ready:
+                drift = sum(
+                    1
+                    for booking_id in key_of.keys() | self._key_of.keys()
+                    if key_of.get(booking_id) != self._key_of.get(booking_id)
+                )
+            self._by_key, self._key_of = by_key, key_of
+            self._loading = False
+            self._pending = []
+            self.ready = True
+            self.loads += 1
+            self.last_drift = drift
+
+        if drift:
+            logger.info("Active MRN index reconciled %d drifted booking(s)", drift)
+        return drift
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "active_bookings": len(self._key_of),
+                "loads": self.loads,
+                "last_drift": self.last_drift,
+            }
+
+
+active_mrn_index = ActiveMRNIndex()
+
+
+@on_booking_committed
+def _apply_booking_change(change):
+    active_mrn_index.apply(change)
@@ -0,0 +1,81 @@
+"""
+OR urgency work queue.
+
+Open OR cases (active, outcome missing or not final) are ordered by their
+deadline: ``created_at`` plus 1 hour for E1, 6 hours for E2 and 24 hours for
+E3 (also used for cases without a known urgency). Ties go to the older case.
+
+The queue is a BookingQueue (booking_queue.py): loaded at startup, updated
+from committed booking writes and reloaded every OR_QUEUE_RECONCILE_SECONDS.
+``GET /api/or-bookings/queue`` serves pages of the cached ordered list, so a
+poll costs O(page) between writes instead of re-sorting every open case.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from booking_events import on_booking_committed
+from booking_queue import BookingQueue
+from database import env_int
+from enhanced_models import Booking, UrgencyLevel, naive_riyadh
+from hot_queries import FINAL_OR_OUTCOMES
+from mrn_index import is_open_or
+
+OR_QUEUE_RECONCILE_SECONDS = env_int("OR_QUEUE_RECONCILE_SECONDS", 60)
+
+OR_DEADLINES = {
+    UrgencyLevel.E1.value: timedelta(hours=1),
+    UrgencyLevel.E2.value: timedelta(hours=6),
+    UrgencyLevel.E3.value: timedelta(hours=24),
+}
+DEFAULT_DEADLINE = OR_DEADLINES[UrgencyLevel.E3.value]
+
+OPEN_OR_CASES = select(
+    Booking.id,
+    Booking.type_of_booking,
+    Booking.is_active,
+    Booking.outcome,
+    Booking.status,
+    Booking.mrn,
+    Booking.patient_name,
+    Booking.procedure,
+    Booking.urgency,
+    Booking.consultant,
+    Booking.created_at,
+).where(
+    Booking.type_of_booking == "OR",
+    Booking.is_active == True,
+    ~Booking.outcome.in_(FINAL_OR_OUTCOMES) | Booking.outcome.is_(None),
+)
+
+
+def deadline(values) -> datetime:
+    created_at = naive_riyadh(values.get("created_at")) or datetime.max - DEFAULT_DEADLINE
+    return created_at + OR_DEADLINES.get((values.get("urgency") or "").upper(), DEFAULT_DEADLINE)
+
+
+def _key(values):
+    return (deadline(values), naive_riyadh(values.get("created_at")) or datetime.max, values["id"])
+
+
+def case_summary(values) -> dict:
+    return {
+        "id": values["id"],
+        "mrn": values.get("mrn"),
+        "patient_name": values.get("patient_name"),
+        "procedure": values.get("procedure"),
+        "urgency": values.get("urgency"),
+        "status": values.get("status"),
+        "consultant": values.get("consultant"),
+        "created_at": naive_riyadh(values.get("created_at")),
+        "deadline": deadline(values),
+    }
+
+
+or_queue = BookingQueue(OPEN_OR_CASES, is_open_or, _key, case_summary)
+
+
+@on_booking_committed
+def _track_case(change):
+    or_queue.apply(change)
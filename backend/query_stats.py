@@ -0,0 +1,190 @@
+"""
+Per-request SQL statistics.
+
+QueryStatsMiddleware opens a RequestQueryStats for each HTTP request in a
+context variable. Engine events (``instrument_engine``) add every statement executed
+while it is set: count, time spent in the driver and rows fetched. Context
+variables follow the request into threadpool calls and the async engine's
+greenlets, so sync and async endpoints are both covered. Background tasks run
+outside any request and are not counted.
+
+The totals go out in a ``Server-Timing`` header (shown in the browser's
+network panel):
+
+    Server-Timing: db;dur=3.2;desc="5 queries, 12 rows", app;dur=7.9
+
+The header is sent when the response starts. A streaming export keeps
+querying after that, but the warnings below still see its full total.
+
+A request is logged as a warning when it runs more than SQL_WARN_STATEMENTS
+statements, or the same statement more than SQL_WARN_REPEATS times, which is
+the usual N+1 pattern (one query per row of a previous result).
+"""
+
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+from database import env_bool, env_int
+from db_metrics import statement_key
+
+logger = logging.getLogger(__name__)
+
+SQL_STATS_ENABLED = env_bool("SQL_STATS_ENABLED", True)
+SQL_WARN_STATEMENTS = env_int("SQL_WARN_STATEMENTS", 20)
+SQL_WARN_REPEATS = env_int("SQL_WARN_REPEATS", 5)
+
+# Round trips, but not queries that could repeat per row
+TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class RequestQueryStats:
+    __slots__ = ("statements", "seconds", "rows", "shapes")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.shapes: Dict[str, int] = {}
+
+    def server_timing(self, total_seconds: float) -> str:
+        return (
+            f'db;dur={self.seconds * 1000:.1f};desc="{self.statements} queries, '
+            f'{self.rows} rows", app;dur={total_seconds * 1000:.1f}'
+        )
+
+    def repeated(self):
+        """(statement, count) of the most repeated statement."""
+        return max(self.shapes.items(), key=lambda item: item[1], default=(None, 0))
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+# -- engine hooks -------------------------------------------------------------
+
+
+class _CountingCursor:
+    """DBAPI cursor proxy adding fetched rows to the request's stats."""
+
+    __slots__ = ("_cursor", "_stats")
+
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._stats.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name in self.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_stats_started", None)
+    if stats is None or started is None:
+        return
+    stats.statements += 1
+    stats.seconds += time.perf_counter() - started
+    if not statement.lstrip().upper().startswith(TRANSACTION_CONTROL):
+        stats.shapes[statement] = stats.shapes.get(statement, 0) + 1
+    if cursor.description is not None:
+        # The result is built from context.cursor right after this event
+        context.cursor = _CountingCursor(cursor, stats)
+
+
+def instrument_engine(engine):
+    """Count ``engine``'s statements (sync engines, or an AsyncEngine.sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+# -- middleware -----------------------------------------------------------------
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware: Server-Timing header and query-count warnings."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                timing = stats.server_timing(time.perf_counter() - started)
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            _warn(scope, stats)
+
+
+def _warn(scope, stats: RequestQueryStats):
+    if not stats.statements:
+        return
+    route = scope.get("route")
+    path = route.path if route is not None else scope.get("path")
+    if stats.statements > SQL_WARN_STATEMENTS:
+        logger.warning(
+            "%s %s ran %d SQL statements (%.1f ms, %d rows)",
+            scope["method"],
+            path,
+            stats.statements,
+            stats.seconds * 1000,
+            stats.rows,
+        )
+    statement, count = stats.repeated()
+    if count > SQL_WARN_REPEATS:
+        logger.warning(
+            "%s %s ran the same statement %d times (possible N+1): %s",
+            scope["method"],
+            path,
+            count,
+            statement_key(statement),
+        )
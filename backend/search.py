@@ -0,0 +1,187 @@
+"""
+Full-text search over bookings and their comments.
+
+The indexes live in the database and are kept in sync on every write without
+application code (migration revision "enhanced" 3):
+
+* PostgreSQL: generated ``search_vector`` tsvector columns on bookings and
+  booking_comments, each with a GIN index.
+* SQLite: FTS5 tables (bookings_fts, booking_comments_fts) over the same
+  columns, maintained by insert/update/delete triggers.
+
+Other databases fall back to case-insensitive LIKE matching, which works but
+scans the tables.
+
+Every word of the query must match (prefix matching, so "appen" finds
+"appendectomy"). A booking matches through its own text or any of its
+comments and is ranked by its best-scoring hit. Only active bookings in the
+hot tables are searched.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, func, literal, or_, select, text, union_all
+
+from enhanced_models import Booking, BookingComment
+
+# Columns indexed for search, in weight order (PostgreSQL A, B, B, C, C)
+BOOKING_SEARCH_COLUMNS = [
+    "patient_name",
+    "procedure",
+    "indication",
+    "priority_notes",
+    "special_requirements",
+]
+
+MAX_QUERY_TERMS = 8
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(q: str) -> List[str]:
+    """Lowercased words of the query; punctuation and operators are dropped."""
+    return _TERM.findall(q.lower())[:MAX_QUERY_TERMS]
+
+
+def _postgres_query(terms):
+    # to_tsquery syntax: every term as a prefix, all required
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _sqlite_query(terms):
+    # FTS5 syntax: quoted prefix tokens are implicitly ANDed
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+# Each statement returns (booking_id, rank, in_booking, in_comments) for one
+# page of active bookings, best match first.
+_RANKED_PAGE = """
+SELECT hits.booking_id,
+       MAX(hits.rank) AS rank,
+       MAX(CASE WHEN hits.source = 'booking' THEN 1 ELSE 0 END) AS in_booking,
+       MAX(CASE WHEN hits.source = 'comment' THEN 1 ELSE 0 END) AS in_comments
+FROM ({hits}) AS hits
+JOIN bookings b ON b.id = hits.booking_id
+WHERE b.is_active = {true}
+  AND (CAST(:booking_type AS VARCHAR(20)) IS NULL OR b.type_of_booking = :booking_type)
+GROUP BY hits.booking_id
+ORDER BY rank DESC, hits.booking_id DESC
+LIMIT :limit OFFSET :offset
+"""
+
+POSTGRES_SEARCH = text(
+    _RANKED_PAGE.format(
+        true="true",
+        hits="""
+        SELECT id AS booking_id, ts_rank(search_vector, to_tsquery('simple', :q)) AS rank,
+               'booking' AS source
+        FROM bookings
+        WHERE search_vector @@ to_tsquery('simple', :q)
+        UNION ALL
+        SELECT booking_id, ts_rank(search_vector, to_tsquery('simple', :q)) AS rank,
+               'comment' AS source
+        FROM booking_comments
+        WHERE search_vector @@ to_tsquery('simple', :q)
+        """,
+    )
+)
+
+SQLITE_SEARCH = text(
+    _RANKED_PAGE.format(
+        true="1",
+        hits="""
+        SELECT rowid AS booking_id, -bm25(bookings_fts) AS rank, 'booking' AS source
+        FROM bookings_fts
+        WHERE bookings_fts MATCH :q
+        UNION ALL
+        SELECT c.booking_id, -bm25(booking_comments_fts) AS rank, 'comment' AS source
+        FROM booking_comments_fts
+        JOIN booking_comments c ON c.id = booking_comments_fts.rowid
+        WHERE booking_comments_fts MATCH :q
+        """,
+    )
+)
+
+BOOKINGS_BY_IDS = select(Booking).where(
+    Booking.id.in_(bindparam("booking_ids", expanding=True))
+)
+
+SEARCH_BACKENDS = {
+    "postgresql": (POSTGRES_SEARCH, _postgres_query),
+    "sqlite": (SQLITE_SEARCH, _sqlite_query),
+}
+
+
+def _like_search(terms):
+    """Portable fallback: every term must appear in the booking or a comment."""
+    booking_text = None
+    for name in BOOKING_SEARCH_COLUMNS:
+        # "+" renders as the dialect's string concatenation operator
+        part = func.coalesce(getattr(Booking, name), "")
+        booking_text = part if booking_text is None else booking_text + " " + part
+    booking_text = func.lower(booking_text)
+    comment_text = func.lower(BookingComment.message)
+    booking_hits = select(
+        Booking.id.label("booking_id"), literal("booking").label("source")
+    ).where(*[booking_text.contains(term, autoescape=True) for term in terms])
+    comment_hits = select(
+        BookingComment.booking_id, literal("comment").label("source")
+    ).where(*[comment_text.contains(term, autoescape=True) for term in terms])
+    hits = union_all(booking_hits, comment_hits).subquery()
+
+    booking_type = bindparam("booking_type")
+    return (
+        select(
+            hits.c.booking_id,
+            literal(0.0).label("rank"),
+            func.max(case((hits.c.source == "booking", 1), else_=0)),
+            func.max(case((hits.c.source == "comment", 1), else_=0)),
+        )
+        .join(Booking, Booking.id == hits.c.booking_id)
+        .where(
+            Booking.is_active == True,
+            or_(booking_type.is_(None), Booking.type_of_booking == booking_type),
+        )
+        .group_by(hits.c.booking_id)
+        .order_by(hits.c.booking_id.desc())
+        .limit(bindparam("limit"))
+        .offset(bindparam("offset"))
+    )
+
+
+def search_bookings(
+    db, q: str, booking_type: Optional[str], limit: int, offset: int
+) -> List[Tuple[Booking, float, List[str]]]:
+    """One page of (booking, rank, matched_in) for the query, best first."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+
+    params = {"booking_type": booking_type, "limit": limit, "offset": offset}
+    backend = SEARCH_BACKENDS.get(db.get_bind().dialect.name)
+    if backend is not None:
+        stmt, build_query = backend
+        params["q"] = build_query(terms)
+    else:
+        stmt = _like_search(terms)
+    page = db.execute(stmt, params).all()
+    if not page:
+        return []
+
+    bookings = {
+        booking.id: booking
+        for booking in db.execute(
+            BOOKINGS_BY_IDS, {"booking_ids": [row[0] for row in page]}
+        ).scalars()
+    }
+    results = []
+    for booking_id, rank, in_booking, in_comments in page:
+        booking = bookings.get(booking_id)
+        if booking is None:
+            continue
+        matched_in = [
+            name for name, hit in (("booking", in_booking), ("comments", in_comments)) if hit
+        ]
+        results.append((booking, float(rank or 0), matched_in))
+    return results
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator
+Fills the database in DATABASE_URL with production-sized booking data so that
+indexes and queries can be checked at scale. The output is deterministic for a
+given --seed and --now.
+
+  - arrivals spread over --years, with weekday and hour-of-day profiles and
+    about 5% more bookings per year
+  - OR:ICU about 2:1; urgency E1/E2/E3 10/30/60%, Critical/Elective 40/60%
+  - each booking walks its status lifecycle (pending, seen_accepted, ...,
+    operation_done / confirmed) to an outcome. Events that would lie in the
+    future are dropped, so the recent bookings are the open ones.
+  - MRNs repeat: a smaller patient pool with a few frequent patients
+  - comment threads (about --comments per booking) and one audit row per event,
+    as the API writes them
+  - closed bookings older than ARCHIVE_AFTER_DAYS go straight to the *_archive
+    tables, as after the archiver has run (--no-archive keeps them hot)
+
+Rows are written with explicit ids after the current maximum, in batches of
+--batch bookings per transaction. PostgreSQL (psycopg2) loads with COPY, other
+databases with executemany. The schema is migrated first; existing rows stay.
+
+Usage:
+    python seed_data.py --bookings 1000000
+    python seed_data.py --bookings 5000000 --years 5 --seed 7
+    python seed_data.py --bookings 200000 --comments 4 --no-archive
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, select, text
+
+from archive import ARCHIVE_AFTER_DAYS
+from enhanced_models import (
+    ArchivedAuditLog,
+    ArchivedBooking,
+    ArchivedBookingComment,
+    AuditLog,
+    Booking,
+    BookingComment,
+    now_riyadh,
+)
+from migrations import SQLITE_FTS_TABLES, _create_sqlite_fts, migrate
+
+BOOKING_COLUMNS = (
+    "id", "mrn", "patient_name", "patient_ward", "procedure", "indication",
+    "type_of_booking", "urgency", "status", "outcome", "consultant",
+    "consultant_phone", "requesting_physician", "requesting_physician_phone",
+    "created_at", "last_updated_at", "outcome_changed_at", "created_by_uid",
+    "created_by_name", "created_by_role", "is_active", "unit", "room",
+)
+COMMENT_COLUMNS = (
+    "id", "booking_id", "message", "context", "author_name", "author_role",
+    "author_uid", "created_at", "is_internal",
+)
+AUDIT_COLUMNS = (
+    "id", "booking_id", "action", "field_changed", "old_value", "new_value",
+    "changed_by_name", "changed_by_role", "timestamp", "notes",
+)
+
+# Hot and archive table per kind of row, children after bookings
+TABLES = {
+    "bookings": (Booking.__table__, ArchivedBooking.__table__, BOOKING_COLUMNS),
+    "comments": (BookingComment.__table__, ArchivedBookingComment.__table__, COMMENT_COLUMNS),
+    "audit": (AuditLog.__table__, ArchivedAuditLog.__table__, AUDIT_COLUMNS),
+}
+
+# Monday first; Friday and Saturday are the weekend
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 0.95, 0.45, 0.55)
+HOUR_WEIGHTS = (
+    1, 1, 1, 1, 1, 2, 3, 6, 9, 10, 10, 9,
+    8, 8, 8, 7, 6, 5, 4, 3, 3, 2, 2, 1,
+)
+YEARLY_GROWTH = 1.05
+
+FIRST_NAMES = (
+    "Ahmed", "Mohammed", "Abdullah", "Omar", "Khalid", "Yousef", "Faisal", "Saad",
+    "Sara", "Fatima", "Noura", "Mona", "Reem", "Huda", "Layla", "Aisha",
+)
+LAST_NAMES = (
+    "Al-Harbi", "Al-Qahtani", "Al-Otaibi", "Al-Ghamdi", "Al-Zahrani", "Al-Shehri",
+    "Al-Dosari", "Al-Mutairi", "Hassan", "Saleh", "Nasser", "Haddad",
+)
+WARDS = ("Ward 1", "Ward 2", "Ward 3", "Ward 4", "ER", "CCU", "Surgical Ward", "Medical Ward")
+PROCEDURES = (
+    "Appendectomy", "Laparoscopic cholecystectomy", "Inguinal hernia repair",
+    "ORIF femur", "Exploratory laparotomy", "Wound debridement", "Total knee replacement",
+    "C-section", "Craniotomy", "Amputation", "Incision and drainage",
+)
+INDICATIONS = (
+    "Post-op monitoring", "Septic shock", "Respiratory failure", "Post cardiac arrest",
+    "DKA", "GI bleed", "Trauma", "Stroke",
+)
+CONSULTANTS = tuple(f"Dr. {name}" for name in LAST_NAMES)
+ICU_UNITS = ("MICU", "SICU", "CCU", "NICU")
+COMMENTS = (
+    "Patient prepared and consented.",
+    "Awaiting labs before proceeding.",
+    "Anesthesia review done.",
+    "Please confirm theatre slot.",
+    "Family informed.",
+    "Bed requested, waiting for confirmation.",
+    "Case discussed with consultant.",
+    "NPO since midnight.",
+)
+
+OR_URGENCIES = (("E1", "E2", "E3"), (10, 40, 100))
+ICU_URGENCIES = (("Critical", "Elective"), (40, 100))
+# Mean minutes until the first response, per urgency
+RESPONSE_MINUTES = {"E1": 20, "E2": 60, "E3": 240, "Critical": 30, "Elective": 180}
+
+
+def _ts(value: datetime) -> str:
+    # SQLAlchemy's SQLite DateTime format; PostgreSQL parses it as well
+    return value.isoformat(" ", "microseconds")
+
+
+class Generator:
+    """Deterministic rows for ``bookings`` bookings ending at ``now``."""
+
+    def __init__(self, bookings, years, comments, seed, now, first_ids, archive_before):
+        self.rng = random.Random(seed)
+        self.bookings = bookings
+        self.comments = comments
+        self.now = now
+        self.archive_before = archive_before
+        self.ids = {name: itertools.count(start) for name, start in first_ids.items()}
+        # About 1.6 bookings per patient
+        self.patients = max(1, int(bookings / 1.6))
+        self.extra_mrns = itertools.count(self.patients)
+        self.open_cases = set()  # (mrn, type) of open bookings
+
+        # Day of each arrival from cumulative day weights
+        days = max(1, int(years * 365))
+        self.start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        weights = []
+        for day in range(days + 1):
+            weekday = (self.start + timedelta(days=day)).weekday()
+            weights.append(WEEKDAY_WEIGHTS[weekday] * YEARLY_GROWTH ** (day / 365))
+        self.day_weights = list(itertools.accumulate(weights))
+        self.hour_weights = list(itertools.accumulate(HOUR_WEIGHTS))
+
+    # -- values ---------------------------------------------------------------
+
+    def _created_at(self, index):
+        target = (index + self.rng.random()) / self.bookings * self.day_weights[-1]
+        day = bisect_left(self.day_weights, target)
+        hour = self._weighted(self.hour_weights)
+        created = self.start + timedelta(days=day, hours=hour, seconds=self.rng.random() * 3600)
+        return min(created, self.now - timedelta(seconds=1))
+
+    def _patient(self):
+        # Skewed towards low indices: a few patients come back often
+        index = int(self.patients * self.rng.random() ** 1.5)
+        return index
+
+    @staticmethod
+    def _mrn(index):
+        return f"{1_000_000 + index}"
+
+    @staticmethod
+    def _name(index):
+        return f"{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+
+    # random.choice/choices cost several times more per call
+
+    def _pick(self, values):
+        return values[int(self.rng.random() * len(values))]
+
+    def _weighted(self, cum_weights) -> int:
+        return bisect_left(cum_weights, self.rng.random() * cum_weights[-1])
+
+    def _after(self, moment, mean_minutes):
+        return moment + timedelta(minutes=self.rng.expovariate(1 / mean_minutes))
+
+    # -- lifecycles -------------------------------------------------------------
+
+    def _or_events(self, created, urgency):
+        """[(time, action, field, old, new)] of an OR booking, and its outcome."""
+        rng = self.rng
+        seen = self._after(created, RESPONSE_MINUTES[urgency])
+        events = [(seen, "status_updated", "status", "pending", "seen_accepted")]
+        status = "seen_accepted"
+        roll = rng.random()
+        if roll < 0.15:
+            outcome = "cancelled"
+            done = self._after(seen, 12 * 60)
+        else:
+            outcome = "executed" if roll < 0.95 else "completed"
+            if rng.random() < 0.4:
+                waiting = self._after(seen, 60)
+                events.append((waiting, "status_updated", "status", status, "awaiting_resources"))
+                status, seen = "awaiting_resources", waiting
+            done = self._after(seen, RESPONSE_MINUTES[urgency] * 3)
+            events.append((done, "status_updated", "status", status, "operation_done"))
+        events.append((self._after(done, 30), "outcome_updated", "outcome", "", outcome))
+        return events
+
+    def _icu_events(self, created, urgency):
+        rng = self.rng
+        seen = self._after(created, RESPONSE_MINUTES[urgency])
+        events = [(seen, "status_updated", "status", "pending", "seen_accepted")]
+        roll = rng.random()
+        if roll < 0.75:
+            unit = self._pick(ICU_UNITS)
+            room = str(1 + int(rng.random() * 20))
+            confirmed = self._after(seen, 90)
+            events.append((confirmed, "confirmed", "status,unit,room", "seen_accepted", f"confirmed,{unit},{room}"))
+            outcome = "Admitted" if roll < 0.65 else "Back to Ward"
+            events.append((self._after(confirmed, 60), "outcome_updated", "outcome", "", outcome))
+        else:
+            status = "no_bed_available" if roll < 0.9 else "rejected"
+            refused = self._after(seen, 60)
+            events.append((refused, "status_updated", "status", "seen_accepted", status))
+            events.append((self._after(refused, 240), "outcome_updated", "outcome", "", "OR Cancelled"))
+        return events
+
+    # -- rows -------------------------------------------------------------------
+
+    def _booking(self, index, out):
+        rng = self.rng
+        created = self._created_at(index)
+        kind = "OR" if rng.random() < 0.67 else "ICU"
+        urgencies, cum_weights = OR_URGENCIES if kind == "OR" else ICU_URGENCIES
+        urgency = urgencies[self._weighted(cum_weights)]
+        events = (self._or_events if kind == "OR" else self._icu_events)(created, urgency)
+        events = [event for event in events if event[0] < self.now]
+
+        status, outcome, outcome_at, unit, room = "pending", None, None, None, None
+        last_updated = created
+        for moment, action, field, old, new in events:
+            if action == "outcome_updated":
+                outcome, outcome_at = new, moment
+                if kind == "ICU":
+                    last_updated = moment
+                continue
+            if action == "confirmed":
+                status, unit, room = new.split(",")
+            else:
+                status = new
+            last_updated = moment
+
+        is_active = rng.random() >= 0.01
+        if not is_active:
+            deleted = self._after(last_updated, 60)
+            if deleted < self.now:
+                events.append((deleted, "soft_deleted", "is_active", "True", "False"))
+                last_updated = deleted
+            else:
+                is_active = True
+
+        patient = self._patient()
+        open_case = is_active and (
+            outcome is None if kind == "OR" else status in ("pending", "no_bed_available")
+        )
+        if open_case:
+            # At most one open booking per MRN and type, as the API enforces
+            while (patient, kind) in self.open_cases:
+                patient = next(self.extra_mrns)
+            self.open_cases.add((patient, kind))
+
+        booking_id = next(self.ids["bookings"])
+        consultant = int(rng.random() * len(CONSULTANTS))
+        requester = int(rng.random() * len(CONSULTANTS))
+        procedure = self._pick(PROCEDURES) if kind == "OR" else None
+        indication = self._pick(INDICATIONS) if kind == "ICU" else None
+        closed = not is_active or (
+            outcome is not None and (kind == "ICU" or outcome in ("cancelled", "executed", "completed"))
+        )
+        archived = closed and max(last_updated, outcome_at or created) < self.archive_before
+        target = out["archived" if archived else "hot"]
+
+        target["bookings"].append((
+            booking_id, self._mrn(patient), self._name(patient), self._pick(WARDS),
+            procedure or indication, indication, kind, urgency, status, outcome,
+            CONSULTANTS[consultant], f"05{consultant:08d}",
+            CONSULTANTS[requester], f"05{requester:08d}",
+            _ts(created), _ts(last_updated), _ts(outcome_at) if outcome_at else None,
+            f"user-{requester}", CONSULTANTS[requester], "applicant", is_active, unit, room,
+        ))
+
+        audit = target["audit"]
+        audit.append((
+            next(self.ids["audit"]), booking_id, "created", None, None, None,
+            CONSULTANTS[requester], "applicant", _ts(created), f"{kind} booking created",
+        ))
+        role = "anesthesia" if kind == "OR" else "icu_team"
+        for moment, action, field, old, new in events:
+            audit.append((
+                next(self.ids["audit"]), booking_id, action, field, old, new,
+                "Staff", role, _ts(moment), None,
+            ))
+
+        # Comment thread between creation and the last event (or now)
+        count = min(int(rng.expovariate(1 / self.comments)) if self.comments else 0, 40)
+        if count:
+            end = events[-1][0] if events else self.now
+            span = max((end - created).total_seconds(), 60)
+            for offset in sorted(rng.random() * span for _ in range(count)):
+                moment = _ts(created + timedelta(seconds=offset))
+                author_role = "applicant" if rng.random() < 0.5 else role
+                target["comments"].append((
+                    next(self.ids["comments"]), booking_id, self._pick(COMMENTS), kind.lower(),
+                    "Staff", author_role, f"user-{int(rng.random() * 200)}", moment, rng.random() < 0.1,
+                ))
+                audit.append((
+                    next(self.ids["audit"]), booking_id, "comment_added", None, None, None,
+                    "Staff", author_role, moment, "Comment added",
+                ))
+
+    def batches(self, size):
+        """Yield {"hot"|"archived": {table: [row tuples]}} per ``size`` bookings."""
+        for first in range(0, self.bookings, size):
+            out = {part: {name: [] for name in TABLES} for part in ("hot", "archived")}
+            for index in range(first, min(first + size, self.bookings)):
+                self._booking(index, out)
+            yield out
+
+
+# -- loading ------------------------------------------------------------------------
+
+
+def _insert_sql(connection, table, columns):
+    marker = "?" if connection.dialect.paramstyle == "qmark" else "%s"
+    return (
+        f"INSERT INTO {table.name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join([marker] * len(columns))})"
+    )
+
+
+def _copy(connection, table, columns, rows):
+    # COPY's CSV default reads an empty field as NULL, which would turn the
+    # audit rows' "" old values into NULLs; \N marks the real ones
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        tuple("\\N" if value is None else value for value in row) for row in rows
+    )
+    buffer.seek(0)
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def load_batch(connection, batch, archived_at):
+    use_copy = connection.dialect.driver == "psycopg2"
+    for part, tables in batch.items():
+        for name, rows in tables.items():
+            if not rows:
+                continue
+            hot, archive, columns = TABLES[name]
+            table = hot
+            if part == "archived":
+                table, columns = archive, columns + ("archived_at",)
+                rows = [row + (archived_at,) for row in rows]
+            if use_copy:
+                _copy(connection, table, columns, rows)
+            else:
+                connection.exec_driver_sql(_insert_sql(connection, table, columns), rows)
+
+
+def _first_ids(connection):
+    first = {}
+    for name, (hot, archive, _) in TABLES.items():
+        highest = max(
+            connection.execute(select(func.max(hot.c.id))).scalar() or 0,
+            connection.execute(select(func.max(archive.c.id))).scalar() or 0,
+        )
+        first[name] = highest + 1
+    return first
+
+
+def _finish(connection):
+    if connection.dialect.name == "postgresql":
+        # Explicit ids bypass the serial sequences
+        for hot, _, _ in TABLES.values():
+            connection.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{hot.name}', 'id'), "
+                    f"(SELECT max(id) FROM {hot.name}))"
+                )
+            )
+
+
+def _analyze(target_engine):
+    with target_engine.connect() as connection:
+        if target_engine.dialect.name == "postgresql":
+            connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            for hot, archive, _ in TABLES.values():
+                connection.exec_driver_sql(f"ANALYZE {hot.name}")
+                connection.exec_driver_sql(f"ANALYZE {archive.name}")
+        elif target_engine.dialect.name == "sqlite":
+            connection.exec_driver_sql("ANALYZE")
+            connection.commit()
+
+
+@contextmanager
+def _fts_deferred(target_engine):
+    """SQLite: index the FTS tables once after the load instead of per row.
+
+    The insert triggers more than halve the load rate of the hot tables.
+    """
+    if target_engine.dialect.name != "sqlite":
+        yield
+        return
+    with target_engine.begin() as connection:
+        for fts, _, _ in SQLITE_FTS_TABLES:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {fts}_ai")
+    try:
+        yield
+    finally:
+        # Recreates the trigger and rebuilds the index from the content table
+        with target_engine.begin() as connection:
+            for fts, content, columns in SQLITE_FTS_TABLES:
+                _create_sqlite_fts(connection, fts, content, columns)
+
+
+def _produce(generator_args, batch_size, batches):
+    """Generator process: put every batch on ``batches``, then None."""
+    for batch in Generator(*generator_args).batches(batch_size):
+        batches.put(batch)
+    batches.put(None)
+
+
+def _batches(generator_args, batch_size):
+    """Batches generated by a second process while this one loads.
+
+    Generating and inserting cost about the same CPU time and sqlite3 holds
+    the GIL for most of an insert, so a thread would not overlap them. With a
+    single CPU the batches are generated inline, saving the pickling.
+    """
+    if (os.cpu_count() or 1) < 2:
+        yield from Generator(*generator_args).batches(batch_size)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    batches = context.Queue(maxsize=2)
+    producer = context.Process(
+        target=_produce, args=(generator_args, batch_size, batches), daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            try:
+                batch = batches.get(timeout=5)
+            except queue.Empty:
+                if not producer.is_alive():
+                    raise RuntimeError("the generator process exited early")
+                continue
+            if batch is None:
+                return
+            yield batch
+    finally:
+        if producer.is_alive():
+            producer.terminate()
+        producer.join()
+
+
+def seed(target_engine, bookings, years=3.0, comments=2.0, seed=1, batch_size=10_000,
+         archive=True, now=None, progress=None) -> dict:
+    """Generate and load the data set; returns row counts per table."""
+    now = now or now_riyadh().replace(tzinfo=None)
+    archive_before = now - timedelta(days=ARCHIVE_AFTER_DAYS) if archive else datetime.min
+
+    with target_engine.begin() as connection:
+        first_ids = _first_ids(connection)
+    generator_args = (bookings, years, comments, seed, now, first_ids, archive_before)
+    archived_at = _ts(now)
+
+    counts = {}
+    done = 0
+    with _fts_deferred(target_engine):
+        for batch in _batches(generator_args, batch_size):
+            with target_engine.begin() as connection:
+                load_batch(connection, batch, archived_at)
+            for part, tables in batch.items():
+                for name, rows in tables.items():
+                    table = TABLES[name][1 if part == "archived" else 0].name
+                    counts[table] = counts.get(table, 0) + len(rows)
+            done += len(batch["hot"]["bookings"]) + len(batch["archived"]["bookings"])
+            if progress is not None:
+                progress(done, sum(counts.values()))
+
+    with target_engine.begin() as connection:
+        _finish(connection)
+    _analyze(target_engine)
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic booking data")
+    parser.add_argument("--bookings", type=int, default=100_000, help="bookings to add (default: 100000)")
+    parser.add_argument("--years", type=float, default=3, help="span of created_at (default: 3)")
+    parser.add_argument("--comments", type=float, default=2, help="mean comments per booking (default: 2)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--batch", type=int, default=10_000, help="bookings per transaction (default: 10000)")
+    parser.add_argument("--now", type=datetime.fromisoformat,
+                        help="end of the time span, e.g. 2025-06-30 (default: current time)")
+    parser.add_argument("--no-archive", dest="archive", action="store_false",
+                        help="keep old closed bookings in the hot tables")
+    args = parser.parse_args()
+
+    from database import engine
+
+    migrate(engine, "enhanced")
+    started = time.perf_counter()
+
+    def progress(bookings, rows):
+        elapsed = time.perf_counter() - started
+        print(f"  {bookings:>10,} bookings {rows:>12,} rows {rows / elapsed:>10,.0f} rows/s", flush=True)
+
+    print(f"Seeding {args.bookings:,} bookings over {args.years:g} years into {engine.dialect.name}")
+    counts = seed(engine, args.bookings, args.years, args.comments, args.seed, args.batch,
+                  args.archive, now=args.now, progress=progress)
+    elapsed = time.perf_counter() - started
+    print("=" * 50)
+    for table, count in counts.items():
+        print(f"{table:<30}{count:>15,}")
+    total = sum(counts.values())
+    print(f"{'total':<30}{total:>15,}  ({total / elapsed:,.0f} rows/s incl. ANALYZE)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
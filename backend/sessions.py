@@ -0,0 +1,97 @@
+"""
+User session lifecycle.
+
+A session row stays active while its device keeps checking in:
+``POST /sessions/`` at login and ``POST /sessions/heartbeat`` afterwards both
+set ``last_login`` to now. Sessions idle for more than SESSION_IDLE_SECONDS
+are deactivated by a sweeper that the enhanced API runs every
+SESSION_SWEEP_INTERVAL_SECONDS (0 disables it), SESSION_SWEEP_BATCH_SIZE rows
+per transaction. Both the sweeper and ``/sessions/active`` read the
+(is_active, last_login) index.
+"""
+
+from datetime import timedelta
+import logging
+
+from sqlalchemy import bindparam, func, or_, select, update
+
+from database import engine, env_int
+from enhanced_models import UserSession, now_riyadh
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_SECONDS = env_int("SESSION_IDLE_SECONDS", 12 * 3600)
+SESSION_SWEEP_INTERVAL_SECONDS = env_int("SESSION_SWEEP_INTERVAL_SECONDS", 300)
+SESSION_SWEEP_BATCH_SIZE = env_int("SESSION_SWEEP_BATCH_SIZE", 500)
+
+ACTIVE_SESSION_BY_USER = (
+    select(UserSession)
+    .where(UserSession.user_name == bindparam("user_name"), UserSession.is_active == True)
+    .limit(1)
+)
+
+ACTIVE_SESSIONS_PAGE = (
+    select(UserSession.user_name, UserSession.user_role, UserSession.last_login)
+    .where(UserSession.is_active == True)
+    .order_by(UserSession.last_login.desc(), UserSession.id.desc())
+    .limit(bindparam("limit"))
+    .offset(bindparam("offset"))
+)
+
+ACTIVE_SESSIONS_COUNT = select(func.count()).where(UserSession.is_active == True)
+
+STALE_SESSION_IDS = select(UserSession.id).where(
+    UserSession.is_active == True,
+    or_(UserSession.last_login < bindparam("cutoff"), UserSession.last_login.is_(None)),
+)
+
+DEACTIVATE_SESSIONS = (
+    update(UserSession)
+    .where(UserSession.id.in_(bindparam("ids", expanding=True)))
+    .values(is_active=False)
+)
+
+
+def touch_session(db, user_name: str, user_role: str) -> bool:
+    """Refresh the user's active session or open one; True if one existed.
+
+    The caller commits.
+    """
+    existing = db.execute(ACTIVE_SESSION_BY_USER, {"user_name": user_name}).scalars().first()
+    if existing:
+        existing.last_login = now_riyadh()
+        return True
+    db.add(UserSession(user_name=user_name, user_role=user_role))
+    return False
+
+
+def expire_batch(target_engine, cutoff, batch_size: int = SESSION_SWEEP_BATCH_SIZE) -> int:
+    """Deactivate one batch of idle sessions; returns how many."""
+    stmt = STALE_SESSION_IDS.limit(batch_size)
+    if target_engine.dialect.name == "postgresql":
+        # Sweepers in other workers take disjoint batches
+        stmt = stmt.with_for_update(skip_locked=True)
+
+    with target_engine.begin() as connection:
+        ids = connection.execute(stmt, {"cutoff": cutoff}).scalars().all()
+        if ids:
+            connection.execute(DEACTIVATE_SESSIONS, {"ids": ids})
+    return len(ids)
+
+
+def expire_idle_sessions(
+    target_engine=engine,
+    idle_seconds: int = SESSION_IDLE_SECONDS,
+    batch_size: int = SESSION_SWEEP_BATCH_SIZE,
+) -> int:
+    """Deactivate every session idle for longer than ``idle_seconds``."""
+    cutoff = now_riyadh() - timedelta(seconds=idle_seconds)
+    total = 0
+    while True:
+        expired = expire_batch(target_engine, cutoff, batch_size)
+        total += expired
+        if expired < batch_size:
+            break
+    if total:
+        logger.info("Expired %d idle session(s)", total)
+    return total
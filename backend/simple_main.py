@@ -4,15 +4,22 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import List, Optional
 import uvicorn
+from contextlib import asynccontextmanager
 
 from database import get_db, engine
+from migrations import ensure_schema_current
 from simple_models import Booking, Base
 from pydantic import BaseModel
 
-# Create tables (will use existing table if it exists)
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Medical Booking API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tables are created by `python migrate.py --app simple`
+    ensure_schema_current(engine, "simple")
+    yield
+
+
+app = FastAPI(title="Medical Booking API", version="1.0.0", lifespan=lifespan)
 
 # CORS for Flutter web
 app.add_middleware(
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+ICU Allocation Simulation
+Replays ICU requests through the allocation queue (icu_allocation.py) against
+a fixed number of beds and reports throughput and waiting times per urgency.
+
+Requests come from the database (hot and archive tables) or are generated
+with --synthetic. A request joins the queue when it was created. A free bed
+goes to the head of the queue, and the patient then stays for a random
+length of stay with mean --stay-hours. Historical rows have no discharge
+time, so the stay is always simulated.
+
+With --update-rate, waiting requests are also edited, as the API does on a
+name or MRN correction (same queue position) and now and then escalated from
+elective to critical (moves up). Each edit re-pushes the request.
+
+Usage:
+    python simulate_allocation.py --beds 12
+    python simulate_allocation.py --days 90 --beds 10 --stay-hours 48
+    python simulate_allocation.py --synthetic 2000 --per-day 8 --beds 16
+    python simulate_allocation.py --synthetic 2000 --update-rate 2
+"""
+
+import argparse
+import heapq
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DISCHARGE, ARRIVAL, UPDATE = 0, 1, 2  # discharges first when events coincide
+ESCALATE_SHARE = 0.2  # edits of elective requests that make them critical
+
+
+def load_history(days):
+    from sqlalchemy import select, union_all
+
+    from database import engine
+    from enhanced_models import ArchivedBooking, Booking, now_riyadh
+
+    cutoff = now_riyadh().replace(tzinfo=None) - timedelta(days=days)
+
+    def requests(table):
+        return select(
+            table.c.id, table.c.urgency, table.c.requested_date, table.c.created_at
+        ).where(
+            table.c.type_of_booking == "ICU",
+            table.c.created_at >= cutoff,
+        )
+
+    stmt = union_all(
+        requests(Booking.__table__), requests(ArchivedBooking.__table__)
+    ).order_by("created_at")
+    with engine.connect() as connection:
+        return [dict(row) for row in connection.execute(stmt).mappings()]
+
+
+def synthetic_requests(count, per_day, critical_share, rng):
+    """Poisson arrivals; a quarter of elective requests ask for a later date."""
+    now = datetime(2025, 1, 1)
+    requests = []
+    for booking_id in range(1, count + 1):
+        now += timedelta(days=rng.expovariate(per_day))
+        critical = rng.random() < critical_share
+        requested = None
+        if not critical and rng.random() < 0.25:
+            requested = now + timedelta(hours=rng.uniform(6, 72))
+        requests.append(
+            {
+                "id": booking_id,
+                "urgency": "critical" if critical else "elective",
+                "requested_date": requested,
+                "created_at": now,
+            }
+        )
+    return requests
+
+
+def simulate(requests, beds, stay_hours, rng, update_rate=0.0):
+    from booking_queue import BookingQueue
+    from icu_allocation import PENDING_ICU_REQUESTS, priority, request_summary
+
+    # Same ordering as the API's queue; requests are pushed directly
+    queue = BookingQueue(PENDING_ICU_REQUESTS, lambda values: True, priority, request_summary)
+    events = []
+    order = itertools.count()  # events never compare their payloads
+    for request in requests:
+        if request["created_at"] is None:
+            continue
+        heapq.heappush(events, (request["created_at"], ARRIVAL, next(order), request))
+        # Edits while waiting: Poisson, update_rate per request over its first day
+        at = request["created_at"]
+        while update_rate:
+            at += timedelta(days=rng.expovariate(update_rate))
+            if at - request["created_at"] > timedelta(days=1):
+                break
+            heapq.heappush(events, (at, UPDATE, next(order), request["id"]))
+
+    free_beds = beds
+    waiting = {}  # id -> values of requests in the queue
+    updates = escalations = 0
+    waits = defaultdict(list)
+    peak_queue = 0
+    busy_hours = 0.0
+    allocations = 0
+    allocation_seconds = 0.0
+    start = events[0][0] if events else None
+    end = start
+
+    while events:
+        now, kind, _, payload = heapq.heappop(events)
+        end = now
+        if kind == ARRIVAL:
+            waiting[payload["id"]] = payload
+            queue.push(payload)
+            peak_queue = max(peak_queue, len(queue))
+        elif kind == UPDATE:
+            values = waiting.get(payload)
+            if values is None:
+                continue  # admitted already
+            values = dict(values, patient_name=f"Patient {payload} (corrected)")
+            if (values["urgency"] or "").lower() == "elective" and rng.random() < ESCALATE_SHARE:
+                values["urgency"] = "critical"
+                escalations += 1
+            waiting[payload] = values
+            queue.push(values)
+            updates += 1
+        else:
+            free_beds += 1
+
+        while free_beds and len(queue):
+            started = time.perf_counter()
+            chosen = queue.pop()
+            allocation_seconds += time.perf_counter() - started
+            del waiting[chosen["id"]]
+            allocations += 1
+            free_beds -= 1
+            waits[(chosen["urgency"] or "unknown").lower()].append(
+                (now - chosen["created_at"]).total_seconds() / 60
+            )
+            stay = timedelta(hours=rng.expovariate(1 / stay_hours))
+            busy_hours += stay.total_seconds() / 3600
+            heapq.heappush(events, (now + stay, DISCHARGE, next(order), None))
+
+    span_days = max((end - start).total_seconds() / 86400, 1e-9) if start else 0
+    return {
+        "requests": len(requests),
+        "admitted": allocations,
+        "span_days": span_days,
+        "waits": waits,
+        "peak_queue": peak_queue,
+        "updates": updates,
+        "escalations": escalations,
+        "utilisation": busy_hours / (beds * span_days * 24) if span_days else 0,
+        "allocation_us": allocation_seconds / allocations * 1e6 if allocations else 0,
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(result, beds, stay_hours):
+    print("=" * 72)
+    print(f"ICU allocation: {beds} bed(s), mean stay {stay_hours:g} h")
+    print("=" * 72)
+    print(f"  requests          {result['requests']}")
+    print(f"  admitted          {result['admitted']}")
+    if result["span_days"]:
+        print(f"  throughput        {result['admitted'] / result['span_days']:.2f} admissions/day")
+    print(f"  peak queue        {result['peak_queue']}")
+    if result["updates"]:
+        print(f"  edits in queue    {result['updates']} ({result['escalations']} escalated)")
+    print(f"  bed utilisation   {min(result['utilisation'], 1):.1%}")
+    print(f"  allocation cost   {result['allocation_us']:.1f} us per decision")
+    print()
+    print(f"  {'urgency':<12}{'n':>7}{'mean min':>12}{'p50 min':>10}{'p95 min':>10}{'max min':>10}")
+    all_waits = []
+    for urgency, waits in sorted(result["waits"].items()):
+        all_waits.extend(waits)
+        print(
+            f"  {urgency:<12}{len(waits):>7}{statistics.mean(waits):>12.1f}"
+            f"{percentile(waits, 0.5):>10.1f}{percentile(waits, 0.95):>10.1f}{max(waits):>10.1f}"
+        )
+    if all_waits:
+        print(
+            f"  {'all':<12}{len(all_waits):>7}{statistics.mean(all_waits):>12.1f}"
+            f"{percentile(all_waits, 0.5):>10.1f}{percentile(all_waits, 0.95):>10.1f}"
+            f"{max(all_waits):>10.1f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay ICU requests through the allocation queue")
+    parser.add_argument("--beds", type=int, default=12, help="ICU beds (default: 12)")
+    parser.add_argument("--stay-hours", type=float, default=72, help="mean length of stay (default: 72)")
+    parser.add_argument("--days", type=int, default=365, help="history window in days (default: 365)")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="simulate N generated requests instead of history")
+    parser.add_argument("--per-day", type=float, default=4, help="synthetic arrivals per day (default: 4)")
+    parser.add_argument("--critical-share", type=float, default=0.4, help="synthetic share of critical requests (default: 0.4)")
+    parser.add_argument("--update-rate", type=float, default=0.0, help="edits per waiting request and day (default: 0)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.synthetic:
+        # The queue module imports database.py, which only needs a URL here
+        os.environ.setdefault("DATABASE_URL", "sqlite://")
+        requests = synthetic_requests(args.synthetic, args.per_day, args.critical_share, rng)
+    else:
+        requests = load_history(args.days)
+        if not requests:
+            print(f"No ICU requests in the last {args.days} days; try --synthetic 1000")
+            return 1
+
+    result = simulate(requests, args.beds, args.stay_hours, rng, args.update_rate)
+    report(result, args.beds, args.stay_hours)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
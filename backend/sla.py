@@ -0,0 +1,268 @@
+"""
+SLA breach detection.
+
+Watched cases are bookings that nobody has acted on yet (status "pending"):
+
+  OR:  open cases; deadline as in or_queue.py (E1 1 h, E2 6 h, E3 24 h)
+  ICU: Critical requests; deadline created_at + SLA_ICU_CRITICAL_MINUTES
+
+A case still pending at its deadline is a breach. It is logged and recorded
+once in ``sla_breaches`` (unique per booking, so every worker may run the
+detector), and ``GET /api/sla/breaches`` lists the records.
+
+The detector keeps the watched cases in a BookingQueue ordered by deadline and
+sleeps until the earliest one; any change to the queue wakes it to look at the
+head again. Nothing scans the bookings table between deadlines. At startup and
+every SLA_RECONCILE_SECONDS the queue is rebuilt from the database without the
+cases that already have a breach, so deadlines that passed while the API was
+down are recorded right after it comes back.
+
+Bookings with a recorded breach are remembered so later edits do not queue
+them again, but only while they are still watched: a committed change that
+ends the case forgets it, and every reload drops the ones the database no
+longer shows as watched (archived, or changed by another worker).
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, func, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from booking_events import on_booking_committed
+from booking_queue import BookingQueue
+from database import env_bool, env_int
+from enhanced_models import (
+    Booking,
+    BookingStatus,
+    SLABreach,
+    UrgencyLevel,
+    naive_riyadh,
+    now_riyadh,
+)
+from hot_queries import FINAL_OR_OUTCOMES
+from mrn_index import is_open_or
+from or_queue import deadline as or_deadline
+
+logger = logging.getLogger(__name__)
+
+SLA_DETECTION = env_bool("SLA_DETECTION", True)
+SLA_ICU_CRITICAL_MINUTES = env_int("SLA_ICU_CRITICAL_MINUTES", 60)
+SLA_RECONCILE_SECONDS = env_int("SLA_RECONCILE_SECONDS", 300)
+
+PENDING = BookingStatus.PENDING.value
+ICU_CRITICAL = UrgencyLevel.CRITICAL.value.lower()
+
+WATCHED_COLUMNS = [
+    Booking.id,
+    Booking.type_of_booking,
+    Booking.is_active,
+    Booking.status,
+    Booking.outcome,
+    Booking.mrn,
+    Booking.urgency,
+    Booking.created_at,
+]
+
+IS_WATCHED = (
+    (Booking.is_active == True)
+    & (Booking.status == PENDING)
+    & or_(
+        (Booking.type_of_booking == "OR")
+        & (~Booking.outcome.in_(FINAL_OR_OUTCOMES) | Booking.outcome.is_(None)),
+        (Booking.type_of_booking == "ICU") & (func.lower(Booking.urgency) == ICU_CRITICAL),
+    )
+)
+
+WATCHED_CASES = (
+    select(*WATCHED_COLUMNS)
+    .outerjoin(SLABreach, SLABreach.booking_id == Booking.id)
+    .where(IS_WATCHED, SLABreach.id.is_(None))
+)
+
+STILL_WATCHED = select(Booking.id).where(
+    Booking.id.in_(bindparam("ids", expanding=True)), IS_WATCHED
+)
+
+CASES_BY_ID = select(*WATCHED_COLUMNS).where(Booking.id.in_(bindparam("ids", expanding=True)))
+
+BREACHES = select(SLABreach).order_by(SLABreach.detected_at.desc(), SLABreach.id.desc())
+
+BREACH_COUNT = select(func.count()).select_from(SLABreach)
+
+
+def _now() -> datetime:
+    return now_riyadh().replace(tzinfo=None)
+
+
+def is_watched(values) -> bool:
+    if not values.get("is_active") or values.get("status") != PENDING:
+        return False
+    if values.get("type_of_booking") == "OR":
+        return is_open_or(values)
+    return (
+        values.get("type_of_booking") == "ICU"
+        and (values.get("urgency") or "").lower() == ICU_CRITICAL
+    )
+
+
+def sla_deadline(values) -> datetime:
+    if values.get("type_of_booking") == "OR":
+        return or_deadline(values)
+    limit = timedelta(minutes=SLA_ICU_CRITICAL_MINUTES)
+    return (naive_riyadh(values.get("created_at")) or datetime.max - limit) + limit
+
+
+def _key(values):
+    return (sla_deadline(values), values["id"])
+
+
+def _summary(values) -> dict:
+    return {"id": values["id"], "deadline": sla_deadline(values)}
+
+
+class BreachDetector:
+    def __init__(self):
+        # Watched bookings with a recorded breach; at most one breach per booking
+        self._recorded = set()
+        self.queue = BookingQueue(WATCHED_CASES, self._accepts, _key, _summary)
+        self.queue.on_change(self._wake_up)
+        self._loop = None
+        self._wake = None
+        self._task = None
+        self.breaches = 0  # recorded by this worker
+
+    def _accepts(self, values) -> bool:
+        return is_watched(values) and values["id"] not in self._recorded
+
+    def track(self, change):
+        """Apply a committed booking change."""
+        booking_id = change.values.get("id")
+        if change.action == "delete" or not is_watched(change.values):
+            self._recorded.discard(booking_id)
+        self.queue.apply(change)
+
+    def load(self, session_factory):
+        """Rebuild the queue; forget breached bookings that are no longer watched."""
+        recorded = set(self._recorded)
+        if recorded:
+            with session_factory() as db:
+                still = set(db.execute(STILL_WATCHED, {"ids": list(recorded)}).scalars())
+            self._recorded.difference_update(recorded - still)
+        self.queue.load(session_factory)
+
+    def _wake_up(self):
+        # Queue changes arrive from request threads
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def start(self, session_factory):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(session_factory), name="sla_breaches")
+        return self
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    async def _run(self, session_factory):
+        while True:
+            self._wake.clear()
+            head = self.queue.peek()
+            delay = None if head is None else (head["deadline"] - _now()).total_seconds()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await run_in_threadpool(self.record_due, session_factory)
+            except Exception:
+                # The popped cases come back with the next reload
+                logger.exception("SLA breach check failed")
+
+    def record_due(self, session_factory) -> int:
+        """Record a breach for every watched case past its deadline."""
+        now = _now()
+        due = self.queue.pop_before((now,))
+        if not due:
+            return 0
+        # The queue may lag behind other workers' writes; decide on the database
+        with session_factory() as db:
+            rows = db.execute(CASES_BY_ID, {"ids": [case["id"] for case in due]}).mappings()
+            current = {row["id"]: dict(row) for row in rows}
+
+        recorded = 0
+        for case in due:
+            values = current.get(case["id"])
+            if values is None or not is_watched(values):
+                continue
+            deadline = sla_deadline(values)
+            if deadline > now:
+                self.queue.push(values)
+                continue
+            if self._record(session_factory, values, deadline, now):
+                recorded += 1
+            self._recorded.add(values["id"])
+        self.breaches += recorded
+        return recorded
+
+    @staticmethod
+    def _record(session_factory, values, deadline, now) -> bool:
+        with session_factory() as db:
+            db.add(
+                SLABreach(
+                    booking_id=values["id"],
+                    booking_type=values["type_of_booking"],
+                    mrn=values["mrn"],
+                    urgency=values["urgency"],
+                    status=values["status"],
+                    booking_created_at=naive_riyadh(values["created_at"]),
+                    deadline=deadline,
+                    detected_at=now,
+                )
+            )
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return False  # recorded by another worker
+        logger.warning(
+            "SLA breach: %s booking #%s (%s) still %s at its deadline %s",
+            values["type_of_booking"],
+            values["id"],
+            values["urgency"] or "no urgency",
+            values["status"],
+            deadline.isoformat(timespec="minutes"),
+        )
+        return True
+
+    def snapshot(self) -> dict:
+        head = self.queue.peek()
+        return {
+            "ready": self.queue.ready,
+            "watched": len(self.queue),
+            "next_deadline": head["deadline"] if head else None,
+            "breaches": self.breaches,
+        }
+
+
+sla_detector = BreachDetector()
+
+
+@on_booking_committed
+def _track_case(change):
+    if SLA_DETECTION:
+        sla_detector.track(change)
@@ -0,0 +1,318 @@
+"""
+Slow-query log.
+
+Every statement that takes at least SLOW_QUERY_MS in the driver is recorded
+with its parameters (PHI redacted), the endpoint that ran it (route template,
+or "background" for periodic jobs) and its plan.
+
+Plans come from ``EXPLAIN QUERY PLAN`` on SQLite and ``EXPLAIN`` on
+PostgreSQL, run on the same connection right after the slow statement so they
+see the same transaction. SLOW_QUERY_ANALYZE_PERCENT of slow SELECTs on
+PostgreSQL use ``EXPLAIN (ANALYZE, BUFFERS)`` instead for actual row counts and
+timings; that runs the query a second time, so writes are never analyzed.
+A statement is explained at most once every SLOW_QUERY_EXPLAIN_SECONDS and
+entries in between reuse that plan, so a burst of one slow query does not add
+a burst of EXPLAINs.
+
+Entries go to a ring buffer of the last SLOW_QUERY_BUFFER entries
+(``GET /api/admin/slow-queries``) and, one JSON object per line, to
+SLOW_QUERY_LOG_FILE (rotated at 10 MB; empty for no file).
+
+Parameters are redacted by type: numbers, booleans, dates and known
+vocabulary (booking types, statuses, urgencies, outcomes) are kept, any other
+string becomes ``<str:N>`` with its length. That covers MRNs, names, phone
+numbers and free text. Plans are explained with the real values, and
+PostgreSQL quotes them in Filter and Index Cond lines, so every quoted
+literal in a plan is redacted by the same rules before it is stored or
+written. The endpoint still requires a staff token.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import date, datetime, time as time_of_day, timedelta
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from database import env_bool, env_int
+from db_metrics import statement_key
+from enhanced_models import BookingStatus, UrgencyLevel, now_riyadh
+from hot_queries import FINAL_OR_OUTCOMES
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_LOG = env_bool("SLOW_QUERY_LOG", True)
+SLOW_QUERY_MS = env_int("SLOW_QUERY_MS", 250)
+SLOW_QUERY_BUFFER = env_int("SLOW_QUERY_BUFFER", 200)
+SLOW_QUERY_EXPLAIN = env_bool("SLOW_QUERY_EXPLAIN", True)
+SLOW_QUERY_EXPLAIN_SECONDS = env_int("SLOW_QUERY_EXPLAIN_SECONDS", 60)
+SLOW_QUERY_ANALYZE_PERCENT = env_int("SLOW_QUERY_ANALYZE_PERCENT", 10)
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", "slow_queries.log")
+
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# Parameter values that are vocabulary, not patient data
+SAFE_STRINGS = frozenset(
+    value.lower()
+    for value in (
+        "OR",
+        "ICU",
+        *(status.value for status in BookingStatus),
+        *(urgency.value for urgency in UrgencyLevel),
+        *FINAL_OR_OUTCOMES,
+    )
+)
+
+# Timestamps bound as text (SQLite) or quoted in plans (with an offset on PostgreSQL)
+ISO_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}:\d{2}(\.\d+)?([+-]\d{2}(:?\d{2})?)?)?$")
+
+# A string constant in a plan, e.g. '1000123'::text ('' escapes a quote)
+PLAN_LITERAL = re.compile(r"'((?:[^']|'')*)'")
+
+_request_scope: ContextVar[Optional[dict]] = ContextVar("slow_query_scope", default=None)
+
+
+def current_endpoint() -> str:
+    scope = _request_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else scope.get('path')}"
+
+
+# -- redaction ------------------------------------------------------------------
+
+
+def redact_value(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date, time_of_day)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, str):
+        if value.lower() in SAFE_STRINGS or ISO_TIMESTAMP.match(value):
+            return value
+        return f"<str:{len(value)}>"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes:{len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return [redact_value(item) for item in value]
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters, executemany: bool = False):
+    """DBAPI parameters (dict, sequence, or a list of them) with PHI redacted."""
+    if executemany:
+        return {
+            "rows": len(parameters),
+            "first": redact_parameters(parameters[0]) if parameters else None,
+        }
+    if not parameters:
+        return None
+    if isinstance(parameters, dict):
+        return {name: redact_value(value) for name, value in parameters.items()}
+    return [redact_value(value) for value in parameters]
+
+
+def _redact_literal(match) -> str:
+    value = match.group(1).replace("''", "'")
+    redacted = redact_value(value)
+    return match.group(0) if redacted == value else f"'{redacted}'"
+
+
+def redact_plan(plan: List[str]) -> List[str]:
+    """Plan lines with their quoted literals redacted like parameters."""
+    return [PLAN_LITERAL.sub(_redact_literal, line) for line in plan]
+
+
+# -- plans ----------------------------------------------------------------------
+
+
+def _sqlite_plan(dbapi_connection, statement, parameters, analyze) -> List[str]:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    # Rows are (id, parent, notused, detail); indent children under parents
+    depth = {0: -1}
+    plan = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        plan.append("  " * depth[node] + detail)
+    return plan
+
+
+def _postgres_plan(dbapi_connection, statement, parameters, analyze) -> List[str]:
+    explain = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    cursor = dbapi_connection.cursor()
+    try:
+        # A failed EXPLAIN must not abort the request's transaction
+        cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(explain + statement, parameters)
+            plan = [row[0] for row in cursor.fetchall()]
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+        cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        cursor.close()
+    return plan
+
+
+EXPLAINERS = {
+    "sqlite": _sqlite_plan,
+    "postgresql": _postgres_plan,
+}
+
+
+# -- log ------------------------------------------------------------------------
+
+
+def _json_file_logger(path: str) -> logging.Logger:
+    file_logger = logging.getLogger("slow_queries.file")
+    file_logger.propagate = False
+    file_logger.setLevel(logging.INFO)
+    handler = RotatingFileHandler(
+        path, maxBytes=10_000_000, backupCount=5, encoding="utf-8", delay=True
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    file_logger.addHandler(handler)
+    return file_logger
+
+
+class SlowQueryLog:
+    MAX_CACHED_PLANS = 200
+
+    def __init__(self, threshold_ms: int, size: int, log_file: Optional[str] = None):
+        self.threshold = threshold_ms / 1000
+        self.entries = deque(maxlen=size)
+        self.recorded = 0
+        self._lock = threading.Lock()
+        # statement -> (captured at, plan, analyzed)
+        self._plans: Dict[str, Tuple[float, List[str], bool]] = {}
+        self._file = _json_file_logger(log_file) if log_file else None
+
+    def attach(self, engine):
+        """Watch ``engine``'s statements (sync engines, or an AsyncEngine.sync_engine)."""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed >= self.threshold:
+            self.record(conn, statement, parameters, executemany, elapsed)
+
+    def record(self, conn, statement, parameters, executemany, elapsed) -> dict:
+        plan, analyzed, plan_age = None, False, None
+        if not executemany:
+            captured = self._plan(conn, statement, parameters)
+            if captured is not None:
+                captured_at, plan, analyzed = captured
+                plan_age = round(time.time() - captured_at, 1)
+
+        endpoint = current_endpoint()
+        entry = {
+            "at": now_riyadh().isoformat(timespec="milliseconds"),
+            "duration_ms": round(elapsed * 1000, 1),
+            "endpoint": endpoint,
+            "statement": " ".join(statement.split()),
+            "parameters": redact_parameters(parameters, executemany),
+            "plan": plan,
+            "plan_analyzed": analyzed,
+            "plan_age_seconds": plan_age,
+        }
+        with self._lock:
+            self.recorded += 1
+            self.entries.append(entry)
+        logger.warning(
+            "Slow query (%.0f ms) in %s: %s", elapsed * 1000, endpoint, statement_key(statement)
+        )
+        if self._file is not None:
+            self._file.info(json.dumps(entry, default=str))
+        return entry
+
+    def _plan(self, conn, statement, parameters):
+        explain = EXPLAINERS.get(conn.dialect.name)
+        keyword = statement.lstrip()[:6].upper()
+        if not SLOW_QUERY_EXPLAIN or explain is None or not keyword.startswith(EXPLAINABLE):
+            return None
+
+        now = time.time()
+        with self._lock:
+            cached = self._plans.get(statement)
+        if cached is not None and now - cached[0] < SLOW_QUERY_EXPLAIN_SECONDS:
+            return cached
+
+        analyze = (
+            conn.dialect.name == "postgresql"
+            and keyword == "SELECT"
+            and random.randrange(100) < SLOW_QUERY_ANALYZE_PERCENT
+        )
+        try:
+            # The raw DBAPI connection: the EXPLAIN itself is not timed or logged
+            plan = redact_plan(explain(conn.connection, statement, parameters, analyze))
+        except Exception:
+            logger.warning("EXPLAIN of a slow query failed", exc_info=True)
+            return None
+
+        captured = (now, plan, analyze)
+        with self._lock:
+            if statement not in self._plans and len(self._plans) >= self.MAX_CACHED_PLANS:
+                self._plans.pop(next(iter(self._plans)))
+            self._plans[statement] = captured
+        return captured
+
+    def snapshot(self, limit: int) -> dict:
+        with self._lock:
+            entries = list(self.entries)
+            recorded = self.recorded
+        return {
+            "threshold_ms": round(self.threshold * 1000),
+            "recorded": recorded,
+            "buffered": len(entries),
+            "entries": entries[::-1][:limit],
+        }
+
+
+class SlowQueryMiddleware:
+    """Pure ASGI middleware: tells the slow-query log which endpoint is running."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # The router adds the matched route to this same scope later
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+slow_query_log = SlowQueryLog(
+    SLOW_QUERY_MS, SLOW_QUERY_BUFFER, SLOW_QUERY_LOG_FILE if SLOW_QUERY_LOG else None
+)
@@ -0,0 +1,84 @@
+"""
+SQLite deployment profile.
+
+For file databases, database.py builds two engines over the same file:
+
+* a writer engine with exactly one pooled connection. Write requests queue on
+  the pool (bounded by DB_POOL_TIMEOUT) instead of racing for the file lock,
+  and every transaction starts with BEGIN IMMEDIATE. A transaction therefore
+  never has to upgrade from a read lock, which is what raises
+  "database is locked" without waiting for busy_timeout.
+* a reader engine with a normal pool (DB_POOL_SIZE / DB_MAX_OVERFLOW) whose
+  connections are query_only. With WAL journaling, readers and the writer
+  don't block each other.
+
+Every connection gets the pragmas below. Tune them with SQLITE_* variables
+(see database.py); run bench_sqlite.py to compare against SQLite's defaults.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def is_file_sqlite(url: str) -> bool:
+    """True for SQLite URLs that point at a file (not :memory:)."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return False
+    return parsed.database not in (None, "", ":memory:") and not parsed.database.startswith(
+        "file::memory:"
+    )
+
+
+def sqlite_pragmas(busy_timeout_ms: int, synchronous: str, mmap_size: int, cache_size: int):
+    """Ordered (name, value) pragmas applied to every connection."""
+    return [
+        ("journal_mode", "WAL"),
+        ("busy_timeout", busy_timeout_ms),
+        ("synchronous", synchronous),
+        ("mmap_size", mmap_size),
+        ("cache_size", cache_size),
+    ]
+
+
+def sqlite_pool_options(url: str, writer: bool, pool_size: int, max_overflow: int, timeout: int) -> dict:
+    """Pool arguments for the writer (one connection) or reader engine."""
+    # aiosqlite defaults to NullPool and pysqlite's default pool has no sizing
+    async_driver = make_url(url).get_driver_name() == "aiosqlite"
+    return {
+        "poolclass": AsyncAdaptedQueuePool if async_driver else QueuePool,
+        "pool_size": 1 if writer else pool_size,
+        "max_overflow": 0 if writer else max_overflow,
+        "pool_timeout": timeout,
+    }
+
+
+def apply_sqlite_profile(engine, pragmas, writer: bool):
+    """Set pragmas on each new connection; writers also BEGIN IMMEDIATE.
+
+    ``engine`` may be an AsyncEngine; listeners go on its sync engine.
+    """
+    target = getattr(engine, "sync_engine", engine)
+    statements = [f"PRAGMA {name} = {value}" for name, value in pragmas]
+    if not writer:
+        statements.append("PRAGMA query_only = ON")
+
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        if writer:
+            # Let SQLAlchemy emit BEGIN itself (the driver would emit a
+            # deferred BEGIN lazily before the first write)
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    if writer:
+
+        @event.listens_for(target, "begin")
+        def _on_begin(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
@@ -0,0 +1,293 @@
+"""
+Staff password checks and short-lived staff tokens.
+
+bcrypt is deliberately slow (100-300 ms of CPU per check), so:
+
+* hashing and checking run on a small dedicated thread pool
+  (BCRYPT_WORKERS). bcrypt releases the GIL, so a burst of logins uses at
+  most that many cores and never occupies the request threadpool;
+* a successful check issues a token valid for STAFF_TOKEN_TTL_SECONDS.
+  Presenting the token again is a single HMAC comparison;
+* the stored hash is cached for SETTINGS_CACHE_SECONDS and dropped when the
+  password is changed in this worker.
+
+Admission control keeps password guessing from starving clinical endpoints:
+each client gets a token bucket of STAFF_AUTH_BURST password attempts,
+refilled at STAFF_AUTH_RATE_PER_MINUTE, and at most BCRYPT_MAX_PENDING bcrypt
+jobs may be queued or running per worker. Beyond either limit the request
+fails fast with 429 (StaffAuthRejected) instead of queueing.
+
+There is one shared staff password and no username, so the client is the
+only key. Behind a reverse proxy every request comes from the proxy, which
+would let one guesser lock out all staff; requests from TRUSTED_PROXIES are
+therefore charged to the address the proxy appended to X-Forwarded-For
+(see client_address).
+
+Tokens are bound to the current password hash, so changing the password
+revokes them. Set STAFF_TOKEN_SECRET to the same value on every worker;
+without it each process signs with its own random key and tokens only work
+on the worker that issued them (clients then fall back to the password).
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+from cache import TTLCache
+from database import env_int
+
+logger = logging.getLogger(__name__)
+
+STAFF_TOKEN_TTL_SECONDS = env_int("STAFF_TOKEN_TTL_SECONDS", 900)
+BCRYPT_WORKERS = env_int("BCRYPT_WORKERS", 2)
+SETTINGS_CACHE_SECONDS = env_int("SETTINGS_CACHE_SECONDS", 300)
+BCRYPT_MAX_PENDING = env_int("BCRYPT_MAX_PENDING", BCRYPT_WORKERS * 4)
+STAFF_AUTH_RATE_PER_MINUTE = env_int("STAFF_AUTH_RATE_PER_MINUTE", 10)
+STAFF_AUTH_BURST = env_int("STAFF_AUTH_BURST", 5)
+
+# Peers whose X-Forwarded-For is believed: comma-separated addresses or networks
+TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(item.strip(), strict=False)
+    for item in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",")
+    if item.strip()
+)
+
+STAFF_PASSWORD_KEY = "staff_password"
+
+_secret = os.getenv("STAFF_TOKEN_SECRET")
+if not _secret:
+    logger.warning(
+        "STAFF_TOKEN_SECRET is not set; staff tokens are only valid on the worker that issued them"
+    )
+STAFF_TOKEN_SECRET = (_secret or secrets.token_hex(32)).encode("utf-8")
+
+_bcrypt_pool = ThreadPoolExecutor(max_workers=max(BCRYPT_WORKERS, 1), thread_name_prefix="bcrypt")
+
+# setting_key -> setting_value
+settings_cache = TTLCache(SETTINGS_CACHE_SECONDS, max_entries=64)
+
+
+class LegacyPasswordError(ValueError):
+    """The stored staff password is not a bcrypt hash (pre-hashing installs)."""
+
+
+class StaffAuthRejected(Exception):
+    """Request refused by admission control; answer 429 with Retry-After."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason  # "rate_limited" or "busy"
+        self.retry_after = retry_after
+
+
+class StaffAuthMetrics:
+    """Counters for admission decisions and bcrypt queue/run times."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rate_limited = 0
+        self.busy = 0
+        self.in_flight = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.bcrypt_seconds_total = 0.0
+        self.bcrypt_jobs = 0
+
+    def reject(self, reason: str):
+        with self._lock:
+            if reason == "busy":
+                self.busy += 1
+            else:
+                self.rate_limited += 1
+
+    def record_job(self, queued: float, ran: float):
+        with self._lock:
+            self.bcrypt_jobs += 1
+            self.queue_seconds_total += queued
+            self.queue_seconds_max = max(self.queue_seconds_max, queued)
+            self.bcrypt_seconds_total += ran
+
+    def snapshot(self):
+        with self._lock:
+            jobs = self.bcrypt_jobs
+            return {
+                "admitted": self.admitted,
+                "rejected": {"rate_limited": self.rate_limited, "busy": self.busy},
+                "bcrypt": {
+                    "workers": BCRYPT_WORKERS,
+                    "max_pending": BCRYPT_MAX_PENDING,
+                    "in_flight": self.in_flight,
+                    "jobs": jobs,
+                    "avg_queue_ms": round(self.queue_seconds_total / jobs * 1000, 3) if jobs else None,
+                    "max_queue_ms": round(self.queue_seconds_max * 1000, 3),
+                    "avg_run_ms": round(self.bcrypt_seconds_total / jobs * 1000, 3) if jobs else None,
+                },
+            }
+
+
+metrics = StaffAuthMetrics()
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets holding up to ``burst`` tokens.
+
+    Only the ``max_clients`` most recently seen clients are tracked; a client
+    evicted from the table starts again with a full bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = 10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # client -> [tokens, last refill]
+
+    def acquire(self, client: str, now: Optional[float] = None) -> float:
+        """Take one token; returns 0 on success, else seconds until one is free."""
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(client, None)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            self._buckets[client] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate if self.rate > 0 else 60.0
+
+
+limiter = TokenBucketLimiter(STAFF_AUTH_RATE_PER_MINUTE, STAFF_AUTH_BURST)
+
+
+def _trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_address(peer: Optional[str], forwarded_for: Optional[str] = None) -> str:
+    """The address password attempts are charged to.
+
+    X-Forwarded-For is only read when ``peer`` is a trusted proxy. It is
+    walked from the right, past further trusted hops, to the first address a
+    trusted proxy saw; entries left of that are supplied by the client and
+    could be forged to dodge the limit.
+    """
+    if not peer:
+        return "unknown"
+    if not forwarded_for or not _trusted(peer):
+        return peer
+    address = peer
+    for hop in reversed(forwarded_for.split(",")):
+        hop = hop.strip()
+        if not hop:
+            continue
+        address = hop
+        if not _trusted(hop):
+            break
+    return address
+
+
+def admit(client: str):
+    """Charge one password attempt to ``client``; StaffAuthRejected when over."""
+    if STAFF_AUTH_RATE_PER_MINUTE <= 0:
+        return
+    retry_after = limiter.acquire(client)
+    if retry_after:
+        metrics.reject("rate_limited")
+        raise StaffAuthRejected("rate_limited", retry_after)
+
+
+def _check(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    except ValueError as exc:
+        raise LegacyPasswordError(str(exc)) from exc
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+
+def _timed(fn, submitted, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        metrics.record_job(started - submitted, time.perf_counter() - started)
+
+
+async def _run_bcrypt(fn, *args):
+    # Checked and updated on the event loop thread only, so no lock is needed
+    if metrics.in_flight >= BCRYPT_MAX_PENDING:
+        metrics.reject("busy")
+        raise StaffAuthRejected("busy", 1)
+    metrics.in_flight += 1
+    metrics.admitted += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _bcrypt_pool, _timed, fn, time.perf_counter(), *args
+        )
+    finally:
+        metrics.in_flight -= 1
+
+
+async def check_password(password: str, hashed: str) -> bool:
+    """bcrypt.checkpw on the bcrypt pool; LegacyPasswordError for plain text."""
+    return await _run_bcrypt(_check, password, hashed)
+
+
+async def hash_password(password: str) -> str:
+    return await _run_bcrypt(_hash, password)
+
+
+# -- tokens ----------------------------------------------------------------
+
+
+def _signature(expires: int, password_hash: str) -> str:
+    message = f"{expires}.{password_hash}".encode("utf-8")
+    digest = hmac.new(STAFF_TOKEN_SECRET, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def issue_token(password_hash: str, now: Optional[float] = None) -> dict:
+    """Token for a verified staff login, as returned to the client."""
+    expires = int(now if now is not None else time.time()) + STAFF_TOKEN_TTL_SECONDS
+    return {
+        "token": f"{expires}.{_signature(expires, password_hash)}",
+        "expires_at": expires,
+    }
+
+
+def check_token(token: Optional[str], password_hash: str, now: Optional[float] = None) -> bool:
+    """True if ``token`` is unexpired and was issued for ``password_hash``."""
+    if not token or not isinstance(token, str):
+        return False
+    expires, _, signature = token.partition(".")
+    if not (expires.isascii() and expires.isdigit()):
+        return False
+    if int(expires) < (now if now is not None else time.time()):
+        return False
+    # Compare bytes: compare_digest rejects non-ASCII str arguments
+    expected = _signature(int(expires), password_hash).encode()
+    return hmac.compare_digest(signature.encode(), expected)
@@ -28,6 +28,9 @@ REM Install dependencies
 echo Installing Python dependencies...
 pip install -r requirements.txt
 
+REM Apply pending schema revisions
+python migrate.py --app v1
+
 REM Start the server
 echo.
 echo Starting FastAPI server on http://localhost:8000
@@ -5,5 +5,14 @@ echo "Starting Railway deployment..."
 echo "PORT=${PORT}"
 echo "DATABASE_URL is set: $([ -n "$DATABASE_URL" ] && echo 'yes' || echo 'no')"
 
+# DB_ASYNC=true serves the async endpoint implementations (async_main.py)
+APP_MODULE=enhanced_main
+if [ "${DB_ASYNC:-false}" = "true" ]; then
+    APP_MODULE=async_main
+fi
+echo "APP_MODULE=${APP_MODULE}"
+
 cd /app/backend
-exec uvicorn enhanced_main:app --host 0.0.0.0 --port ${PORT:-8000}
\ No newline at end of file
+# Apply pending schema revisions once, before any worker starts
+python migrate.py --app enhanced
+exec uvicorn ${APP_MODULE}:app --host 0.0.0.0 --port ${PORT:-8000}
\ No newline at end of file
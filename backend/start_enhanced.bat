@@ -25,11 +25,8 @@ call venv\Scripts\activate
 pip install -r requirements.txt
 
 echo.
-echo Step 4: Database setup options:
-echo   Option A: Run enhanced_migration.sql in pgAdmin 4 (recommended)
-echo   Option B: Let the API create tables automatically
-echo.
-echo Choose option A for full database schema with constraints and indexes.
+echo Step 4: Applying database migrations...
+python migrate.py
 
 echo.
 echo Step 5: Testing database connection...
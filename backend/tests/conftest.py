@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Modules read their settings from the environment at import
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SLOW_QUERY_LOG_FILE", "")
+os.environ.setdefault("STAFF_TOKEN_SECRET", "test-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def session_factory():
+    """Sessions on a migrated in-memory SQLite database."""
+    from migrations import migrate
+
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    migrate(engine, "enhanced")
+    yield sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    engine.dispose()
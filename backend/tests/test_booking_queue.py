@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+
+from booking_events import BookingChange
+from booking_queue import BookingQueue
+from icu_allocation import priority, request_summary
+from or_queue import OPEN_OR_CASES, _key, case_summary, deadline
+from mrn_index import is_open_or
+
+NOW = datetime(2025, 6, 1, 8, 0)
+
+
+def or_case(booking_id, urgency="E2", minutes_ago=0, **values):
+    return {
+        "id": booking_id,
+        "type_of_booking": "OR",
+        "is_active": True,
+        "outcome": None,
+        "status": "pending",
+        "mrn": f"{1000 + booking_id}",
+        "urgency": urgency,
+        "created_at": NOW - timedelta(minutes=minutes_ago),
+        **values,
+    }
+
+
+def make_queue():
+    return BookingQueue(OPEN_OR_CASES, is_open_or, _key, case_summary)
+
+
+def ids(cases):
+    return [case["id"] for case in cases]
+
+
+def test_orders_by_deadline_then_age():
+    queue = make_queue()
+    queue.push(or_case(1, "E3"))
+    queue.push(or_case(2, "E1"))
+    queue.push(or_case(3, "E2", minutes_ago=10))
+    queue.push(or_case(4, "E2"))
+
+    assert ids(queue.ordered()) == [2, 3, 4, 1]
+    assert ids(queue.top(2)) == [2, 3]
+    assert queue.peek()["id"] == 2
+
+
+def test_repush_with_unchanged_key():
+    # A status change keeps the deadline: the live and the removed entry tie
+    queue = make_queue()
+    queue.push(or_case(1))
+    queue.push(or_case(1, status="seen_accepted"))
+    queue.push(or_case(1, status="awaiting_resources"))
+
+    assert len(queue) == 1
+    assert queue.ordered()[0]["status"] == "awaiting_resources"
+    assert queue.pop()["status"] == "awaiting_resources"
+    assert queue.pop() is None
+
+
+def test_update_moves_case():
+    queue = make_queue()
+    queue.push(or_case(1, "E3"))
+    queue.push(or_case(2, "E2"))
+    queue.apply(BookingChange("update", or_case(1, "E1")))
+
+    assert ids(queue.ordered()) == [1, 2]
+    assert len(queue) == 2
+
+
+def test_changes_that_leave_the_queue_remove_the_case():
+    queue = make_queue()
+    for booking_id in (1, 2, 3):
+        queue.push(or_case(booking_id, minutes_ago=booking_id))
+    queue.apply(BookingChange("update", or_case(1, outcome="executed")))
+    queue.apply(BookingChange("delete", or_case(2)))
+
+    assert ids(queue.ordered()) == [3]
+    assert queue.pop()["id"] == 3
+    assert queue.pop() is None
+
+
+def test_ordered_is_cached_per_version():
+    queue = make_queue()
+    queue.push(or_case(1))
+    version = queue.version
+    first = queue.ordered()
+
+    assert queue.ordered() is first
+    queue.push(or_case(2))
+    assert queue.version > version
+    assert ids(queue.ordered()) == [1, 2]
+
+
+def test_pop_before():
+    queue = make_queue()
+    queue.push(or_case(1, "E1"))
+    queue.push(or_case(2, "E2"))
+    queue.push(or_case(3, "E3"))
+
+    popped = queue.pop_before(_key(or_case(0, "E2", minutes_ago=-1)))
+    assert ids(popped) == [1, 2]
+    assert ids(queue.ordered()) == [3]
+
+
+def test_listeners_run_after_changes():
+    queue = make_queue()
+    calls = []
+    queue.on_change(lambda: calls.append(queue.version))
+    queue.push(or_case(1))
+    queue.remove(1)
+    queue.remove(1)  # not queued: no change
+
+    assert len(calls) == 2
+
+
+def test_zoned_created_at_is_converted_to_riyadh_time():
+    # A UTC session on PostgreSQL: 05:00 UTC is 08:00 in Riyadh
+    utc = or_case(1, "E1", created_at=datetime(2025, 6, 1, 5, 0, tzinfo=timezone.utc))
+    assert deadline(utc) == NOW + timedelta(hours=1)
+    assert case_summary(utc)["created_at"] == NOW
+
+
+def test_zoned_icu_request_times_are_converted_to_riyadh_time():
+    utc = datetime(2025, 6, 1, 5, 0, tzinfo=timezone.utc)
+    zoned = {"id": 1, "urgency": "high", "created_at": utc, "requested_date": utc}
+    naive = {"id": 1, "urgency": "high", "created_at": NOW, "requested_date": NOW}
+    assert priority(zoned) == priority(naive)
+    assert request_summary(zoned)["requested_date"] == NOW
@@ -0,0 +1,125 @@
+import pytest
+
+import icu_beds
+from enhanced_models import Booking, ICUBed
+from icu_beds import (
+    FREE,
+    OCCUPIED,
+    OUT_OF_SERVICE,
+    BedOccupancy,
+    BedTakenError,
+    UnknownBedError,
+    add_bed,
+    occupy_bed,
+    release_beds,
+    set_service_state,
+)
+
+
+@pytest.fixture
+def occupancy(session_factory, monkeypatch):
+    occupancy = BedOccupancy()
+    monkeypatch.setattr(icu_beds, "bed_occupancy", occupancy)
+    with session_factory() as db:
+        add_bed(db, "MICU", "1")
+        add_bed(db, "MICU", "2")
+        db.commit()
+    occupancy.load(session_factory)
+    return occupancy
+
+
+def icu_request(db):
+    booking = Booking(type_of_booking="ICU", status="pending", is_active=True)
+    db.add(booking)
+    db.flush()
+    return booking.id
+
+
+def bed(db, room):
+    return db.query(ICUBed).filter_by(unit="MICU", room=room).one()
+
+
+def free_rooms(occupancy):
+    return [free["room"] for free in occupancy.free_beds("MICU")]
+
+
+def test_occupy_and_release(session_factory, occupancy):
+    with session_factory() as db:
+        booking_id = icu_request(db)
+        occupy_bed(db, "MICU", "1", booking_id)
+        db.commit()
+        db.expire_all()
+        assert (bed(db, "1").state, bed(db, "1").booking_id) == (OCCUPIED, booking_id)
+        assert free_rooms(occupancy) == ["2"]
+
+        assert release_beds(db, booking_id) == [bed(db, "1").id]
+        db.commit()
+        db.expire_all()
+        assert (bed(db, "1").state, bed(db, "1").booking_id) == (FREE, None)
+        assert free_rooms(occupancy) == ["1", "2"]
+        assert release_beds(db, booking_id) == []
+
+
+def test_bed_held_by_another_request_is_taken(session_factory, occupancy):
+    with session_factory() as db:
+        first, second = icu_request(db), icu_request(db)
+        occupy_bed(db, "MICU", "1", first)
+        with pytest.raises(BedTakenError) as taken:
+            occupy_bed(db, "MICU", "1", second)
+        assert taken.value.bed["room"] == "1"
+        # Confirming the same request again is fine
+        occupy_bed(db, "MICU", "1", first)
+
+
+def test_moving_to_another_bed_releases_the_first(session_factory, occupancy):
+    with session_factory() as db:
+        booking_id = icu_request(db)
+        occupy_bed(db, "MICU", "1", booking_id)
+        occupy_bed(db, "MICU", "2", booking_id)
+        db.commit()
+        db.expire_all()
+        assert bed(db, "1").state == FREE
+        assert bed(db, "2").booking_id == booking_id
+    assert free_rooms(occupancy) == ["1"]
+
+
+def test_rollback_does_not_touch_the_occupancy_index(session_factory, occupancy):
+    with session_factory() as db:
+        occupy_bed(db, "MICU", "1", icu_request(db))
+        db.rollback()
+        assert bed(db, "1").state == FREE
+    assert free_rooms(occupancy) == ["1", "2"]
+
+
+def test_out_of_service(session_factory, occupancy):
+    with session_factory() as db:
+        booking_id = icu_request(db)
+        assert set_service_state(db, bed(db, "2").id, OUT_OF_SERVICE)
+        with pytest.raises(BedTakenError):
+            occupy_bed(db, "MICU", "2", booking_id)
+        occupy_bed(db, "MICU", "1", booking_id)
+        # An occupied bed cannot be taken out of service
+        assert not set_service_state(db, bed(db, "1").id, OUT_OF_SERVICE)
+        db.commit()
+    assert free_rooms(occupancy) == []
+
+
+def test_unknown_room_and_unmanaged_unit(session_factory, occupancy):
+    with session_factory() as db:
+        booking_id = icu_request(db)
+        with pytest.raises(UnknownBedError):
+            occupy_bed(db, "MICU", "99", booking_id)
+        # Units without inventory keep the free-text behaviour
+        assert occupy_bed(db, "CCU", "5", booking_id) is None
+
+
+def test_freed_listener(session_factory, occupancy):
+    freed = []
+    occupancy.on_bed_freed(freed.append)
+    with session_factory() as db:
+        booking_id = icu_request(db)
+        occupy_bed(db, "MICU", "1", booking_id)
+        db.commit()
+        release_beds(db, booking_id)
+        db.commit()
+    assert [bed["room"] for bed in freed] == ["1"]
@@ -0,0 +1,30 @@
+from sqlalchemy import create_engine, inspect
+
+import enhanced_models
+from migrations import head_version, migrate
+
+
+def _model_tables():
+    return [
+        mapper.local_table
+        for mapper in enhanced_models.Base.registry.mappers
+        if mapper.class_.__module__ == "enhanced_models"
+    ]
+
+
+def test_head_schema_matches_the_models():
+    # A model change without a revision (revisions never read the models) fails here
+    engine = create_engine("sqlite://")
+    assert migrate(engine, "enhanced") == head_version("enhanced")
+    inspector = inspect(engine)
+    for table in _model_tables():
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert columns == {column.name for column in table.columns}, table.name
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+
+def test_migrate_is_idempotent():
+    engine = create_engine("sqlite://")
+    version = migrate(engine, "enhanced")
+    assert migrate(engine, "enhanced") == version
@@ -0,0 +1,135 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import booking_events
+from enhanced_models import Booking
+from mrn_index import ActiveMRNIndex, or_summary
+
+
+@pytest.fixture
+def index(session_factory, monkeypatch):
+    # Only this index hears the commits of the test
+    index = ActiveMRNIndex()
+    monkeypatch.setattr(booking_events, "_listeners", [index.apply])
+    index.load(session_factory)
+    return index
+
+
+def add_booking(db, mrn, booking_type="OR", **values):
+    booking = Booking(
+        mrn=mrn,
+        type_of_booking=booking_type,
+        status="pending",
+        is_active=True,
+        patient_name="Test Patient",
+        **values,
+    )
+    db.add(booking)
+    return booking
+
+
+def test_insert_is_indexed_on_commit(session_factory, index):
+    with session_factory() as db:
+        booking = add_booking(db, "100")
+        db.flush()
+        # Flushed but not committed
+        assert index.lookup("100", "OR") is None
+        db.commit()
+
+    assert index.lookup("100", "OR")["id"] == booking.id
+    assert index.lookup("100", "ICU") is None
+
+
+def test_rollback_leaves_the_index_unchanged(session_factory, index):
+    with session_factory() as db:
+        add_booking(db, "101")
+        db.flush()
+        db.rollback()
+
+    assert index.lookup("101", "OR") is None
+    assert index.snapshot()["active_bookings"] == 0
+
+
+def test_final_outcome_removes_the_booking(session_factory, index):
+    with session_factory() as db:
+        booking = add_booking(db, "102")
+        db.commit()
+        booking.outcome = "OR Done"
+        db.commit()
+
+    assert index.lookup("102", "OR") is None
+
+
+def test_soft_delete_removes_the_booking(session_factory, index):
+    with session_factory() as db:
+        booking = add_booking(db, "103", "ICU")
+        db.commit()
+        assert index.lookup("103", "ICU") is not None
+        booking.is_active = False
+        db.commit()
+
+    assert index.lookup("103", "ICU") is None
+
+
+def test_mrn_change_transfers_the_entry(session_factory, index):
+    with session_factory() as db:
+        booking = add_booking(db, "104")
+        db.commit()
+        booking.mrn = "105"
+        db.commit()
+
+    assert index.lookup("104", "OR") is None
+    assert index.lookup("105", "OR")["id"] == booking.id
+
+
+def test_rolled_back_update_keeps_the_old_entry(session_factory, index):
+    with session_factory() as db:
+        booking = add_booking(db, "106")
+        db.commit()
+        booking_id = booking.id
+        booking.mrn = "107"
+        db.flush()
+        db.rollback()
+
+    assert index.lookup("106", "OR")["id"] == booking_id
+    assert index.lookup("107", "OR") is None
+
+
+def test_delete_removes_the_booking(session_factory, index):
+    with session_factory() as db:
+        booking = add_booking(db, "108")
+        db.commit()
+        db.delete(booking)
+        db.commit()
+
+    assert index.lookup("108", "OR") is None
+
+
+def test_lowest_id_wins_for_duplicates(session_factory, index):
+    with session_factory() as db:
+        first = add_booking(db, "109")
+        db.commit()
+        add_booking(db, "109")
+        db.commit()
+
+    assert index.lookup("109", "OR")["id"] == first.id
+
+
+def test_reload_counts_drift(session_factory, index):
+    with session_factory() as db:
+        add_booking(db, "110")
+        db.commit()
+
+    # Another worker's write: not seen until the next reload
+    fresh = ActiveMRNIndex()
+    fresh.load(session_factory)
+    assert fresh.lookup("110", "OR") is not None
+    assert index.load(session_factory) == 0
+
+
+def test_summary_times_carry_the_riyadh_offset():
+    utc = datetime(2025, 6, 1, 5, 0, tzinfo=timezone.utc)
+    summary = or_summary({"id": 1, "created_at": utc, "requested_date": datetime(2025, 6, 1, 8, 0)})
+    assert summary["created_at"] == "2025-06-01T08:00:00+03:00"
+    assert summary["requested_date"] == "2025-06-01T08:00:00+03:00"
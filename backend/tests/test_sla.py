@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import booking_events
+from enhanced_models import Booking, SLABreach
+from sla import SLA_ICU_CRITICAL_MINUTES, BreachDetector, _now, sla_deadline
+
+
+@pytest.fixture
+def detector(session_factory, monkeypatch):
+    detector = BreachDetector()
+    monkeypatch.setattr(booking_events, "_listeners", [detector.track])
+    return detector
+
+
+def add_booking(session_factory, minutes_ago, booking_type="ICU", urgency="Critical", **values):
+    with session_factory() as db:
+        booking = Booking(
+            mrn="2000",
+            type_of_booking=booking_type,
+            urgency=urgency,
+            status="pending",
+            is_active=True,
+            created_at=_now() - timedelta(minutes=minutes_ago),
+            **values,
+        )
+        db.add(booking)
+        db.commit()
+        return booking.id
+
+
+def breaches(session_factory):
+    with session_factory() as db:
+        return [breach.booking_id for breach in db.query(SLABreach).order_by(SLABreach.id)]
+
+
+def test_overdue_critical_icu_request_is_recorded_once(session_factory, detector):
+    overdue = add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES + 5)
+    add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES - 5)
+    detector.load(session_factory)
+
+    assert detector.record_due(session_factory) == 1
+    assert breaches(session_factory) == [overdue]
+    assert detector.record_due(session_factory) == 0
+    # A reload skips cases that already have a breach
+    detector.load(session_factory)
+    assert len(detector.queue) == 1
+    assert detector.record_due(session_factory) == 0
+
+
+def test_or_deadline_follows_urgency(session_factory, detector):
+    e1 = add_booking(session_factory, 61, "OR", "E1")
+    add_booking(session_factory, 61, "OR", "E2")
+    detector.load(session_factory)
+
+    assert detector.record_due(session_factory) == 1
+    assert breaches(session_factory) == [e1]
+
+
+def test_unwatched_cases_are_ignored(session_factory, detector):
+    add_booking(session_factory, 600, urgency="Elective")
+    with session_factory() as db:
+        db.add(
+            Booking(
+                type_of_booking="ICU",
+                urgency="Critical",
+                status="confirmed",
+                is_active=True,
+                created_at=_now() - timedelta(hours=10),
+            )
+        )
+        db.commit()
+    detector.load(session_factory)
+
+    assert len(detector.queue) == 0
+    assert detector.record_due(session_factory) == 0
+
+
+def test_acted_on_before_the_check(session_factory, detector):
+    booking_id = add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES + 5)
+    detector.load(session_factory)
+    with session_factory() as db:
+        db.get(Booking, booking_id).status = "confirmed"
+        db.commit()
+
+    assert len(detector.queue) == 0
+    assert detector.record_due(session_factory) == 0
+    assert breaches(session_factory) == []
+
+
+def test_database_decides_when_the_queue_is_stale(session_factory, detector, monkeypatch):
+    booking_id = add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES + 5)
+    detector.load(session_factory)
+    # Another worker's update: this queue does not hear about it
+    monkeypatch.setattr(booking_events, "_listeners", [])
+    with session_factory() as db:
+        db.get(Booking, booking_id).status = "confirmed"
+        db.commit()
+
+    assert detector.record_due(session_factory) == 0
+    assert breaches(session_factory) == []
+
+
+def test_breach_recorded_by_another_worker(session_factory, detector):
+    add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES + 5)
+    detector.load(session_factory)
+    other = BreachDetector()
+    other.load(session_factory)
+
+    assert other.record_due(session_factory) == 1
+    # The unique booking_id makes the second insert a no-op
+    assert detector.record_due(session_factory) == 0
+    assert len(breaches(session_factory)) == 1
+
+
+def test_breached_case_is_not_queued_again_while_watched(session_factory, detector):
+    booking_id = add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES + 5)
+    detector.load(session_factory)
+    detector.record_due(session_factory)
+    with session_factory() as db:
+        db.get(Booking, booking_id).patient_name = "Corrected Name"
+        db.commit()
+
+    assert len(detector.queue) == 0
+    assert detector._recorded == {booking_id}
+
+
+def test_recorded_cases_are_forgotten_when_they_leave(session_factory, detector, monkeypatch):
+    acted_on = add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES + 5)
+    archived = add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES + 5)
+    waiting = add_booking(session_factory, SLA_ICU_CRITICAL_MINUTES + 5)
+    detector.load(session_factory)
+    assert detector.record_due(session_factory) == 3
+
+    with session_factory() as db:
+        db.get(Booking, acted_on).status = "confirmed"
+        db.commit()
+    assert detector._recorded == {archived, waiting}
+
+    # Archived (or changed by another worker) without an event: the reload prunes it
+    monkeypatch.setattr(booking_events, "_listeners", [])
+    with session_factory() as db:
+        db.get(Booking, archived).is_active = False
+        db.commit()
+    detector.load(session_factory)
+    assert detector._recorded == {waiting}
+    assert len(detector.queue) == 0
+
+
+def test_zoned_created_at_is_converted_to_riyadh_time():
+    utc = {"type_of_booking": "ICU", "created_at": datetime(2025, 6, 1, 5, 0, tzinfo=timezone.utc)}
+    naive = {"type_of_booking": "ICU", "created_at": datetime(2025, 6, 1, 8, 0)}
+    # 05:00 UTC is 08:00 in Riyadh (UTC+3)
+    assert sla_deadline(utc) == sla_deadline(naive)
@@ -0,0 +1,85 @@
+import json
+import logging
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import slow_queries
+from slow_queries import SlowQueryLog, redact_parameters, redact_plan
+
+MRN = "1000123"
+NAME = "Jane O'Neil"
+
+
+def test_parameters_keep_vocabulary_numbers_and_dates():
+    created = datetime(2025, 6, 1, 8, 30)
+    assert redact_parameters({"type": "ICU", "status": "pending", "id": 7, "since": created}) == {
+        "type": "ICU",
+        "status": "pending",
+        "id": 7,
+        "since": "2025-06-01T08:30:00",
+    }
+
+
+def test_parameters_redact_patient_strings():
+    assert redact_parameters({"mrn": MRN, "name": NAME}) == {"mrn": "<str:7>", "name": "<str:11>"}
+    assert redact_parameters((MRN, b"\x00\x01", [NAME, 3])) == [
+        "<str:7>",
+        "<bytes:2>",
+        ["<str:11>", 3],
+    ]
+
+
+def test_executemany_keeps_the_first_row_only():
+    assert redact_parameters([(MRN,), ("2",)], executemany=True) == {
+        "rows": 2,
+        "first": ["<str:7>"],
+    }
+
+
+def test_plan_literals_are_redacted():
+    plan = [
+        "Index Scan using ix_bookings_active_mrn_type on bookings",
+        f"  Index Cond: (((mrn)::text = '{MRN}'::text) AND ((type_of_booking)::text = 'OR'::text))",
+        "  Filter: ((patient_name)::text = 'Jane O''Neil'::text)",
+        "  Filter: (created_at >= '2025-06-01 08:30:00+03'::timestamp with time zone)",
+    ]
+    assert redact_plan(plan) == [
+        plan[0],
+        "  Index Cond: (((mrn)::text = '<str:7>'::text) AND ((type_of_booking)::text = 'OR'::text))",
+        "  Filter: ((patient_name)::text = '<str:11>'::text)",
+        plan[3],
+    ]
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "slow.log"
+    yield path
+    file_logger = logging.getLogger("slow_queries.file")
+    for handler in list(file_logger.handlers):
+        handler.close()
+        file_logger.removeHandler(handler)
+
+
+def test_recorded_entry_and_log_file_hold_no_phi(log_file, monkeypatch):
+    # Stand in for a PostgreSQL plan, which quotes the bound values
+    monkeypatch.setitem(
+        slow_queries.EXPLAINERS,
+        "sqlite",
+        lambda connection, statement, parameters, analyze: [f"Filter: (mrn = '{parameters[0]}')"],
+    )
+    engine = create_engine("sqlite://")
+    log = SlowQueryLog(threshold_ms=0, size=10, log_file=str(log_file))
+    log.attach(engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT :mrn AS mrn, :name AS name"), {"mrn": MRN, "name": NAME})
+
+    entry = log.snapshot(1)["entries"][0]
+    assert entry["parameters"] == ["<str:7>", "<str:11>"]
+    assert entry["plan"] == ["Filter: (mrn = '<str:7>')"]
+
+    written = log_file.read_text(encoding="utf-8")
+    assert MRN not in written and "Neil" not in written
+    assert json.loads(written.splitlines()[-1])["parameters"] == ["<str:7>", "<str:11>"]
@@ -0,0 +1,109 @@
+import staff_auth
+from staff_auth import (
+    STAFF_TOKEN_TTL_SECONDS,
+    TokenBucketLimiter,
+    check_token,
+    client_address,
+    issue_token,
+)
+
+HASH = "$2b$12$storedhashstoredhashstoredhashstoredhashstoredhashstore"
+NOW = 1_750_000_000
+
+
+def test_token_bucket_allows_a_burst_then_refills():
+    limiter = TokenBucketLimiter(rate_per_minute=6, burst=3)
+    assert [limiter.acquire("a", now=0) for _ in range(3)] == [0, 0, 0]
+    # One token every 10 s
+    assert limiter.acquire("a", now=0) == 10
+    assert limiter.acquire("a", now=5) == 5
+    assert limiter.acquire("a", now=10) == 0
+    assert limiter.acquire("a", now=10) > 0
+
+
+def test_token_bucket_is_per_client():
+    limiter = TokenBucketLimiter(rate_per_minute=6, burst=1)
+    assert limiter.acquire("a", now=0) == 0
+    assert limiter.acquire("a", now=0) > 0
+    assert limiter.acquire("b", now=0) == 0
+
+
+def test_token_bucket_never_exceeds_the_burst():
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=2)
+    limiter.acquire("a", now=0)
+    results = [limiter.acquire("a", now=3600) for _ in range(3)]
+    assert results[:2] == [0, 0] and results[2] > 0
+
+
+def test_token_bucket_forgets_the_oldest_clients():
+    limiter = TokenBucketLimiter(rate_per_minute=6, burst=1, max_clients=2)
+    limiter.acquire("a", now=0)
+    limiter.acquire("b", now=0)
+    limiter.acquire("c", now=0)
+    # "a" was evicted and starts again with a full bucket
+    assert limiter.acquire("a", now=0) == 0
+
+
+def test_token_is_valid_until_it_expires():
+    token = issue_token(HASH, now=NOW)
+    assert token["expires_at"] == NOW + STAFF_TOKEN_TTL_SECONDS
+    assert check_token(token["token"], HASH, now=NOW)
+    assert check_token(token["token"], HASH, now=token["expires_at"])
+    assert not check_token(token["token"], HASH, now=token["expires_at"] + 1)
+
+
+def test_token_is_bound_to_the_password_hash():
+    token = issue_token(HASH, now=NOW)["token"]
+    assert not check_token(token, HASH.replace("stored", "change"), now=NOW)
+
+
+def test_tampered_tokens_are_rejected():
+    token = issue_token(HASH, now=NOW)["token"]
+    expires, _, signature = token.partition(".")
+    # Extending the expiry invalidates the signature
+    assert not check_token(f"{int(expires) + 3600}.{signature}", HASH, now=NOW)
+    flipped = signature[:-1] + ("A" if signature[-1] != "A" else "B")
+    assert not check_token(f"{expires}.{flipped}", HASH, now=NOW)
+    for broken in (None, "", signature, f"x{expires}.{signature}", f"{expires}."):
+        assert not check_token(broken, HASH, now=NOW)
+
+
+def test_malformed_tokens_are_rejected_not_raised():
+    token = issue_token(HASH, now=NOW)["token"]
+    expires, _, signature = token.partition(".")
+    for broken in (f"{expires}.{signature[:-1]}é", "²." + signature, 12345, b"token", ["x"]):
+        assert not check_token(broken, HASH, now=NOW)
+
+
+def test_tokens_from_another_secret_are_rejected(monkeypatch):
+    token = issue_token(HASH, now=NOW)["token"]
+    monkeypatch.setattr(staff_auth, "STAFF_TOKEN_SECRET", b"another-worker")
+    assert not check_token(token, HASH, now=NOW)
+
+
+def test_direct_client_ignores_forwarded_for():
+    # A client talking to the app directly cannot pick its own bucket
+    assert client_address("203.0.113.7", "198.51.100.1") == "203.0.113.7"
+
+
+def test_trusted_proxy_uses_forwarded_client():
+    assert client_address("127.0.0.1", "198.51.100.1") == "198.51.100.1"
+    assert client_address("127.0.0.1", "198.51.100.2") == "198.51.100.2"
+
+
+def test_forged_entries_left_of_the_proxy_hop_are_ignored():
+    assert client_address("127.0.0.1", "10.9.9.9, 198.51.100.1") == "198.51.100.1"
+
+
+def test_chained_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(
+        staff_auth,
+        "TRUSTED_PROXIES",
+        staff_auth.TRUSTED_PROXIES + (staff_auth.ipaddress.ip_network("10.0.0.0/8"),),
+    )
+    assert client_address("10.0.0.5", "198.51.100.1, 10.0.0.9") == "198.51.100.1"
+
+
+def test_missing_peer():
+    assert client_address(None, "198.51.100.1") == "unknown"
+    assert client_address("127.0.0.1", None) == "127.0.0.1"
@@ -0,0 +1,116 @@
+import pytest
+
+import booking_events
+from booking_events import BookingChange
+from enhanced_models import Booking
+from typeahead import PrefixIndex, TypeaheadField, TypeaheadService
+
+NAME = TypeaheadField.PATIENT_NAME
+
+
+def test_prefix_index_counts_and_drops_unused_values():
+    index = PrefixIndex({"Ahmed": 2, "Aisha": 1})
+    index.add("ahmed")
+    assert index.top("a", 5) == [("Ahmed", 3), ("Aisha", 1)]
+
+    index.remove("Aisha")
+    index.remove("AHMED")
+    assert index.top("a", 5) == [("Ahmed", 2)]
+    assert len(index) == 1
+    # Unknown and empty values are ignored
+    index.remove("Omar")
+    index.remove(None)
+    assert len(index) == 1
+
+
+@pytest.fixture
+def service(session_factory, monkeypatch):
+    service = TypeaheadService()
+    monkeypatch.setattr(booking_events, "_listeners", [service.record])
+    service.rebuild(session_factory)
+    return service
+
+
+def suggestions(service, prefix="", field=NAME):
+    return service._indexes[field].top(prefix, 10)
+
+
+def test_committed_changes_update_the_counts(session_factory, service):
+    with session_factory() as db:
+        first = Booking(patient_name="Ahmed Ali", consultant="Dr Saleh")
+        second = Booking(patient_name="Ahmed Ali", consultant="Dr Saleh")
+        db.add_all([first, second])
+        db.commit()
+        assert suggestions(service, "ahm") == [("Ahmed Ali", 2)]
+
+        # A corrected name moves one use
+        first.patient_name = "Ahmad Ali"
+        db.commit()
+        assert suggestions(service, "ahm") == [("Ahmad Ali", 1), ("Ahmed Ali", 1)]
+        # Other fields are untouched by the edit
+        assert suggestions(service, "dr", TypeaheadField.CONSULTANT) == [("Dr Saleh", 2)]
+
+        db.delete(second)
+        db.commit()
+        assert suggestions(service, "ahm") == [("Ahmad Ali", 1)]
+        assert suggestions(service, "dr", TypeaheadField.CONSULTANT) == [("Dr Saleh", 1)]
+
+
+def test_counts_match_a_rebuild(session_factory, service):
+    with session_factory() as db:
+        bookings = [Booking(patient_name=name) for name in ("Sara", "Sara", "Samir")]
+        db.add_all(bookings)
+        db.commit()
+        bookings[0].patient_name = "Samir"
+        bookings[2].patient_name = None
+        db.delete(bookings[1])
+        db.commit()
+
+    live = suggestions(service)
+    service.rebuild(session_factory)
+    assert live == suggestions(service) == [("Samir", 1)]
+
+
+def test_rolled_back_changes_are_ignored(session_factory, service):
+    with session_factory() as db:
+        db.add(Booking(patient_name="Omar"))
+        db.flush()
+        db.rollback()
+    assert suggestions(service) == []
+
+
+def test_changes_before_the_first_build_are_skipped():
+    service = TypeaheadService()
+    service.record(BookingChange("insert", {"patient_name": "Omar"}))
+    assert service._indexes == {}
+
+
+def test_edits_from_none_are_counted(session_factory, service):
+    with session_factory() as db:
+        booking = Booking(patient_name="Sara")
+        db.add(booking)
+        db.commit()
+        booking.consultant = "Dr Huda"
+        db.commit()
+
+    live = suggestions(service, "dr", TypeaheadField.CONSULTANT)
+    service.rebuild(session_factory)
+    assert live == suggestions(service, "dr", TypeaheadField.CONSULTANT) == [("Dr Huda", 1)]
+
+
+def test_writes_clear_cached_short_prefixes(session_factory, service):
+    with session_factory() as db:
+        db.add(Booking(patient_name="Sara"))
+        db.commit()
+        assert service.suggest(db, session_factory, NAME, "sa", 10) == [("Sara", 1)]
+
+        db.add(Booking(patient_name="Samir"))
+        db.commit()
+        assert service.suggest(db, session_factory, NAME, "sa", 10) == [("Samir", 1), ("Sara", 1)]
+
+
+def test_blank_prefixes_suggest_nothing(session_factory, service):
+    with session_factory() as db:
+        db.add(Booking(patient_name="Sara"))
+        db.commit()
+        assert service.suggest(db, session_factory, NAME, "  ", 10) == []
@@ -0,0 +1,232 @@
+"""
+Typeahead suggestions for the booking forms.
+
+``GET /api/typeahead/{field}?q=`` returns the most used values of a booking
+field that start with the typed prefix. On PostgreSQL these are queried
+through trigram indexes (migration revision "enhanced" 4). When fewer than
+``limit`` values share the prefix and the query has at least three
+characters, similar spellings fill the rest ("fuzzy" matches). When pg_trgm
+could not be installed, plain prefix indexes are used and fuzzy matches are
+skipped.
+
+Other databases (SQLite) use an in-memory sorted index per field instead.
+It is rebuilt every TYPEAHEAD_REFRESH_SECONDS and follows committed booking
+inserts, edits and deletes in between (an edit moves one use from the old
+value to the new one; values nobody uses any more are dropped). Prefixes of
+up to TYPEAHEAD_CACHE_PREFIX_LEN characters, which match the most rows, are
+cached for TYPEAHEAD_CACHE_SECONDS or until the next booking write.
+"""
+
+import bisect
+import enum
+import heapq
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, text
+
+from booking_events import on_booking_committed
+from cache import TTLCache
+from database import env_int
+from enhanced_models import Booking
+
+TYPEAHEAD_REFRESH_SECONDS = env_int("TYPEAHEAD_REFRESH_SECONDS", 300)
+TYPEAHEAD_CACHE_SECONDS = env_int("TYPEAHEAD_CACHE_SECONDS", 30)
+TYPEAHEAD_CACHE_PREFIX_LEN = env_int("TYPEAHEAD_CACHE_PREFIX_LEN", 2)
+
+FUZZY_MIN_LENGTH = 3
+
+
+class TypeaheadField(str, enum.Enum):
+    MRN = "mrn"
+    PATIENT_NAME = "patient_name"
+    CONSULTANT = "consultant"
+    WARD = "ward"
+
+
+# URL field name -> Booking column
+FIELD_COLUMNS = {
+    TypeaheadField.MRN: Booking.mrn,
+    TypeaheadField.PATIENT_NAME: Booking.patient_name,
+    TypeaheadField.CONSULTANT: Booking.consultant,
+    TypeaheadField.WARD: Booking.patient_ward,
+}
+
+Suggestion = Tuple[str, int]  # (value, number of bookings using it)
+
+
+class PrefixIndex:
+    """Distinct values of one field, sorted case-insensitively for bisect."""
+
+    def __init__(self, counts: Dict[str, int]):
+        self._lock = threading.Lock()
+        self._entries = {}  # lowercased value -> [display value, count]
+        for value, count in counts.items():
+            self._add(value, count)
+        self._keys = sorted(self._entries)
+
+    def _add(self, value: str, count: int) -> bool:
+        key = value.lower()
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = [value, count]
+            return True
+        entry[1] += count
+        return False
+
+    def add(self, value: Optional[str]):
+        value = (value or "").strip()
+        if not value:
+            return
+        with self._lock:
+            if self._add(value, 1):
+                bisect.insort(self._keys, value.lower())
+
+    def remove(self, value: Optional[str]):
+        value = (value or "").strip()
+        if not value:
+            return
+        key = value.lower()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._entries[key]
+                del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def top(self, prefix: str, limit: int) -> List[Suggestion]:
+        prefix = prefix.lower()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, prefix)
+            end = bisect.bisect_left(self._keys, prefix + "\U0010ffff", lo=start)
+            candidates = (self._entries[key] for key in self._keys[start:end])
+            best = heapq.nsmallest(limit, candidates, key=lambda e: (-e[1], e[0].lower()))
+        return [(value, count) for value, count in best]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class TypeaheadService:
+    def __init__(self):
+        self._indexes: Dict[TypeaheadField, PrefixIndex] = {}
+        self._build_lock = threading.Lock()
+        self._trigram = None
+        self.cache = TTLCache(TYPEAHEAD_CACHE_SECONDS, max_entries=4096)
+
+    # -- in-memory indexes (SQLite and other non-PostgreSQL databases) -----
+
+    def rebuild(self, session_factory):
+        """Reload every field's index from the database."""
+        indexes = {}
+        with session_factory() as db:
+            for field, column in FIELD_COLUMNS.items():
+                rows = db.execute(
+                    select(column, func.count()).where(column.isnot(None)).group_by(column)
+                ).all()
+                indexes[field] = PrefixIndex(
+                    {value.strip(): count for value, count in rows if value and value.strip()}
+                )
+        self._indexes = indexes
+        self.cache.clear()
+
+    def _index(self, field, session_factory) -> PrefixIndex:
+        if field not in self._indexes:
+            with self._build_lock:
+                if field not in self._indexes:
+                    self.rebuild(session_factory)
+        return self._indexes[field]
+
+    def record(self, change):
+        """Apply a committed booking change to the counts (same rows as rebuild)."""
+        self.cache.clear()
+        if not self._indexes:
+            return
+        for field, column in FIELD_COLUMNS.items():
+            index = self._indexes.get(field)
+            if index is None:
+                continue
+            if change.action == "insert":
+                index.add(change.values.get(column.key))
+            elif change.action == "delete":
+                index.remove(change.values.get(column.key))
+            elif column.key in change.previous:
+                index.remove(change.previous[column.key])
+                index.add(change.values.get(column.key))
+
+    # -- PostgreSQL ---------------------------------------------------------
+
+    def _has_trigram(self, db) -> bool:
+        if self._trigram is None:
+            self._trigram = bool(
+                db.execute(
+                    text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                ).scalar()
+            )
+        return self._trigram
+
+    def _query_postgres(self, db, field, prefix: str, limit: int) -> List[Suggestion]:
+        column = FIELD_COLUMNS[field]
+        lowered = func.lower(column)
+        uses = func.count().label("uses")
+        # One row per case-insensitive value, like the in-memory index
+        display = func.min(column)
+        rows = db.execute(
+            select(display, uses)
+            .where(lowered.startswith(prefix.lower(), autoescape=True))
+            .group_by(lowered)
+            .order_by(uses.desc(), lowered)
+            .limit(limit)
+        ).all()
+        suggestions = [(value, count) for value, count in rows]
+
+        wants_fuzzy = len(suggestions) < limit and len(prefix) >= FUZZY_MIN_LENGTH
+        if wants_fuzzy and self._has_trigram(db):
+            seen = {value.lower() for value, _ in suggestions}
+            similarity = func.max(func.similarity(lowered, prefix.lower()))
+            similarity = similarity.label("similarity")
+            fuzzy = db.execute(
+                select(display, uses, similarity)
+                .where(lowered.op("%")(prefix.lower()))
+                .group_by(lowered)
+                .order_by(similarity.desc(), uses.desc())
+                .limit(limit)
+            ).all()
+            for value, count, _ in fuzzy:
+                if value.lower() not in seen and len(suggestions) < limit:
+                    suggestions.append((value, count))
+        return suggestions
+
+    # -- entry point --------------------------------------------------------
+
+    def suggest(
+        self, db, session_factory, field, prefix: str, limit: int
+    ) -> List[Suggestion]:
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        cache_key = None
+        if len(prefix) <= TYPEAHEAD_CACHE_PREFIX_LEN:
+            cache_key = (field, prefix.lower(), limit)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if db.get_bind().dialect.name == "postgresql":
+            suggestions = self._query_postgres(db, field, prefix, limit)
+        else:
+            suggestions = self._index(field, session_factory).top(prefix, limit)
+
+        if cache_key is not None:
+            self.cache.set(cache_key, suggestions)
+        return suggestions
+
+
+typeahead = TypeaheadService()
+
+
+@on_booking_committed
+def _record_booking(change):
+    typeahead.record(change)